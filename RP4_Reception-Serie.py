@@ -1,40 +1,160 @@
-import serial
-import threading
+"""
+Moniteur de réception série (banc de test du flux RPM).
+
+Le port est lu par un SerialTransport : lecture bloquante dans un thread (aucune
+attente active quand le port est muet) et réouverture automatique. Les lignes
+reçues passent par un tampon circulaire borné (JournalSerie) que la boucle Tk
+vide en un seul insert tous les INTERVALLE_AFFICHAGE ; seul le thread Tk touche
+aux widgets. Avec --json, les mesures sont aussi décodées par un RPMReceiver et
+affichées dans un tableau par cellule.
+
+    python RP4_Reception-Serie.py --port /dev/ttyUSB0 --baud 9600 --json
+"""
+
+import argparse
 import tkinter as tk
-from tkinter import scrolledtext
-
-# Configuration du port série
-SERIAL_PORT = "COM3"  # Remplace par ton port (ex: "COM3" sur Windows ou "/dev/ttyUSB0" sur Linux)
-BAUD_RATE = 9600      # Doit correspondre à la vitesse de l'émetteur série
-
-def read_serial():
-    """Lit les données du port série et les affiche dans la fenêtre texte."""
-    while True:
-        if ser.in_waiting:
-            line = ser.readline().decode('utf-8', errors='ignore').strip()
-            text_box.insert(tk.END, line + '\n')
-            text_box.see(tk.END)
-
-# Initialisation du port série
-try:
-    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-except serial.SerialException:
-    print(f"Erreur : impossible d’ouvrir le port {SERIAL_PORT}")
-    exit()
-
-# Création de l’interface Tkinter
-root = tk.Tk()
-root.title("Lecture Série")
-
-text_box = scrolledtext.ScrolledText(root, wrap=tk.WORD, width=60, height=20)
-text_box.pack(padx=10, pady=10)
-
-# Démarrage du thread de lecture série
-thread = threading.Thread(target=read_serial, daemon=True)
-thread.start()
-
-# Boucle principale de la GUI
-root.mainloop()
-
-# Fermeture du port série quand la fenêtre est fermée
-ser.close()
+from tkinter import ttk, scrolledtext
+
+from gvm_address import trier
+from gvm_journal import JournalSerie
+from gvm_protocol import SYNC, StreamSplitter
+from gvm_serial import BAUDRATE, PORT_SERIE, RPMReceiver, SerialTransport
+
+INTERVALLE_AFFICHAGE = 100  # ms entre deux vidages du tampon dans la fenêtre
+LIGNES_MAX = 1000           # lignes gardées dans la fenêtre
+
+
+class MoniteurSerie:
+    def __init__(self, root, port=PORT_SERIE, baudrate=BAUDRATE, lignes_max=LIGNES_MAX, json_rpm=False):
+        self.root = root
+        self.lignes_max = lignes_max
+        self.journal = JournalSerie(capacite=lignes_max)
+        self.splitter = StreamSplitter()
+        self.transport = SerialTransport(port, baudrate)
+        self.transport.ajouter_recepteur(self.recevoir)
+        self.receiver = None
+        self.lignes_tableau = {}  # {cell_id: identifiant de ligne du Treeview}
+        if json_rpm:
+            self.receiver = RPMReceiver(port, baudrate)
+            self.receiver.attacher(self.transport)
+
+        self.root.title(f"Lecture Série — {port} à {baudrate} bauds")
+        self.creer_interface()
+        self.root.protocol("WM_DELETE_WINDOW", self.fermer)
+        self.transport.start()
+        self.root.after(INTERVALLE_AFFICHAGE, self.rafraichir)
+
+    def creer_interface(self):
+        panneau = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
+        panneau.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.text_box = scrolledtext.ScrolledText(panneau, wrap=tk.WORD, width=60, height=20, state='disabled')
+        panneau.add(self.text_box, weight=1)
+
+        if self.receiver is not None:
+            colonnes = ["cellule"] + [f"v{i}" for i in range(1, 10)] + ["age"]
+            self.tableau = ttk.Treeview(panneau, columns=colonnes, show="headings", height=20)
+            self.tableau.heading("cellule", text="Cellule")
+            self.tableau.column("cellule", width=60, anchor=tk.CENTER)
+            for i in range(1, 10):
+                self.tableau.heading(f"v{i}", text=f"V{i}")
+                self.tableau.column(f"v{i}", width=55, anchor=tk.E)
+            self.tableau.heading("age", text="Âge (s)")
+            self.tableau.column("age", width=60, anchor=tk.E)
+            panneau.add(self.tableau, weight=1)
+
+        bas = ttk.Frame(self.root)
+        bas.pack(fill=tk.X, padx=10, pady=(0, 10))
+        self.statut_var = tk.StringVar(value="")
+        ttk.Label(bas, textvariable=self.statut_var).pack(side=tk.LEFT)
+        ttk.Button(bas, text="Effacer", command=self.effacer).pack(side=tk.RIGHT)
+
+    # --- Thread de lecture -----------------------------------------------------
+
+    def recevoir(self, data):
+        """Appelé par le thread de lecture : ne touche jamais à Tk."""
+        for message in self.splitter.feed(data):
+            if message.startswith(SYNC):
+                self.journal.ecrire(message.hex(' '))
+            else:
+                self.journal.ecrire(message.decode('utf-8', errors='replace').strip())
+
+    # --- Thread Tk -------------------------------------------------------------
+
+    def rafraichir(self):
+        lignes = self.journal.extraire()
+        if lignes:
+            self.ajouter_lignes(lignes)
+        if self.receiver is not None:
+            self.mettre_a_jour_tableau()
+        self.mettre_a_jour_statut()
+        self.root.after(INTERVALLE_AFFICHAGE, self.rafraichir)
+
+    def ajouter_lignes(self, lignes):
+        # Un seul insert par rafraîchissement, puis les plus anciennes lignes sont retirées
+        self.text_box.configure(state='normal')
+        self.text_box.insert(tk.END, "\n".join(lignes) + "\n")
+        excedent = int(self.text_box.index('end-1c').split('.')[0]) - 1 - self.lignes_max
+        if excedent > 0:
+            self.text_box.delete('1.0', f'{excedent + 1}.0')
+        self.text_box.configure(state='disabled')
+        self.text_box.see(tk.END)
+
+    def mettre_a_jour_tableau(self):
+        _, modifiees = self.receiver.collecter_modifications()
+        ages = self.receiver.ages()
+        nouvelles = False
+        for cell_id in trier(set(self.lignes_tableau) | set(modifiees)):
+            age = f"{ages[cell_id]:.1f}" if cell_id in ages else ""
+            if cell_id in modifiees:
+                valeurs = [cell_id, *modifiees[cell_id], age]
+            else:
+                valeurs = list(self.tableau.item(self.lignes_tableau[cell_id], "values"))
+                valeurs[-1] = age
+            if cell_id in self.lignes_tableau:
+                self.tableau.item(self.lignes_tableau[cell_id], values=valeurs)
+            else:
+                self.lignes_tableau[cell_id] = self.tableau.insert("", tk.END, values=valeurs)
+                nouvelles = True
+        if nouvelles:
+            # Nouvelles cellules insérées en fin : on rétablit l'ordre ligne/colonne
+            for position, cell_id in enumerate(trier(self.lignes_tableau)):
+                self.tableau.move(self.lignes_tableau[cell_id], "", position)
+
+    def mettre_a_jour_statut(self):
+        etat = "connecté" if self.transport.connecte else "déconnecté (reconnexion…)"
+        statut = f"Port {self.transport.port} : {etat}"
+        if self.journal.perdues:
+            statut += f" | lignes non affichées : {self.journal.perdues}"
+        if self.receiver is not None:
+            statut += f" | {self.receiver.resume()}"
+        self.statut_var.set(statut)
+
+    def effacer(self):
+        self.text_box.configure(state='normal')
+        self.text_box.delete('1.0', tk.END)
+        self.text_box.configure(state='disabled')
+
+    def fermer(self):
+        self.transport.stop()
+        self.root.destroy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Affichage du flux série reçu (RPM des cellules)")
+    parser.add_argument("--port", default=PORT_SERIE, help=f"Port série, défaut {PORT_SERIE} (ex. COM3 sous Windows)")
+    parser.add_argument("--baud", type=int, default=BAUDRATE, help="Doit correspondre à la vitesse de l'émetteur")
+    parser.add_argument("--lignes", type=int, default=LIGNES_MAX, help="Lignes gardées dans la fenêtre")
+    parser.add_argument("--json", action="store_true", help="Décode les mesures RPM dans un tableau par cellule")
+    args = parser.parse_args(argv)
+    if args.lignes <= 0:
+        parser.error("--lignes doit être positif.")
+
+    root = tk.Tk()
+    MoniteurSerie(root, args.port, args.baud, args.lignes, args.json)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,799 @@
+"""
+Mesures de performance des chemins critiques, sans matériel.
+
+Usage :
+    python benchmarks.py trames [--max 20]
+    python benchmarks.py debit [--baud 9600] [--max 20]
+    python benchmarks.py courbe [--lignes 5000]
+    python benchmarks.py reception [--baud 9600] [--duree 5] [--cellules 25] [--fichier trafic.log]
+    python benchmarks.py rendu [--tailles 3 5 10 15]      (affichage requis, Xvfb lancé s'il manque)
+    python benchmarks.py analyse [--messages 20000]
+    python benchmarks.py profils [--sequences 10 50] [--taille 20]
+    python benchmarks.py grille [--tailles 3 5 10 20]      (affichage requis, Xvfb lancé s'il manque)
+    python benchmarks.py tout [--rapide]
+
+Toute commande accepte, après son nom, --json FICHIER (résultats et contexte de
+la mesure) et --comparer REFERENCE.json : les durées plus longues et les débits
+plus faibles que la référence au-delà de --seuil sont signalés, code de sortie 1.
+Une référence produite par 'tout' sert aussi à une commande seule ; sans aucune
+mesure commune avec la référence, code de sortie 2.
+
+    python benchmarks.py tout --json reference.json
+    python benchmarks.py trames --comparer reference.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+from gvm_address import CellAddress, cle_cellule, publish_id
+from gvm_curve import POURCENTAGES, FanCurve
+from gvm_engine import CSV_VENTILATEUR
+from gvm_protocol import (BITS_PAR_OCTET, PROTOCOLES, BinaryFrameEncoder, DeltaTracker, FrameEncoder,
+                          capacite_liaison, creer_encodeur, encoder_trame_rpm, mur_max)
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+
+
+def airflow_reduit_lineaire(airflow_values):
+    """Ancien generer_airflow_reduit : min(...) sur toute la liste pour chaque point."""
+    step = (airflow_values[-1] - airflow_values[0]) / 19
+    airflow_percentage = [0.0, airflow_values[0]]
+    for i in range(1, 19):
+        v = airflow_values[0] + i * step
+        airflow_percentage.append(min(airflow_values, key=lambda x: abs(x - v)))
+    airflow_percentage.append(airflow_values[-1])
+    return airflow_percentage
+
+
+def indice_lineaire(airflow_values, airflow_percentage):
+    """Reproduit l'ancien obtenir_indice_depuis_pourcentage (recherche linéaire)."""
+    airflow_values = list(airflow_values)
+
+    def conv(pourcentage):
+        if pourcentage % 5 != 0 or not (0 <= pourcentage <= 100):
+            raise ValueError("Le pourcentage doit être un multiple de 5 entre 0 et 100.")
+        valeur_airflow = airflow_percentage[pourcentage // 5]
+        if valeur_airflow == 0:
+            return -1
+        return airflow_values.index(valeur_airflow)
+    return conv
+
+
+def grille_puissances(rows, cols):
+    return {
+        cle_cellule(r, c): [((r + c + k) * 5) % 105 for k in range(9)]
+        for r in range(1, rows + 1) for c in range(1, cols + 1)
+    }
+
+
+def chronometrer(fn, repetitions):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fn()
+    return (time.perf_counter() - debut) / repetitions
+
+
+def tick_reconstruit(powers, conv):
+    """Ancienne boucle : le dict complet est reconstruit pour chaque cellule publiée."""
+    cell_ids = sorted(powers.keys())
+    total = 0
+    for publish_cell in cell_ids:
+        json_message = {cell_id: [conv(p) for p in powers[cell_id]] for cell_id in cell_ids}
+        json_message["Publish"] = publish_id(publish_cell)
+        total += len((json.dumps(json_message) + '\n').encode('utf-8'))
+    return total
+
+
+def tick_compile(compiled):
+    total = 0
+    for _, frame in compiled:
+        total += len(frame)
+    return total
+
+
+def bench_trames(taille_max=20):
+    courbe = FanCurve.from_csv(CSV_VENTILATEUR)
+    conv = indice_lineaire(courbe.airflow_values, courbe.airflow_percentage)
+    encoder = FrameEncoder(courbe.indice_pwm)
+    encoder_binaire = BinaryFrameEncoder(courbe.indice_pwm)
+
+    resultats = []
+    print(f"{'grille':>7} {'cellules':>8} {'reconstruit (ms)':>17} {'compilation (ms)':>17} "
+          f"{'binaire (ms)':>13} {'tick compilé (ms)':>18} {'octets/tick':>12}")
+    for n in range(3, taille_max + 1):
+        powers = grille_puissances(n, n)
+        repetitions = max(1, 200 // (n * n))
+        t_ancien = chronometrer(lambda: tick_reconstruit(powers, conv), repetitions)
+        t_compil = chronometrer(lambda: encoder.compile(powers), repetitions)
+        t_binaire = chronometrer(lambda: encoder_binaire.compile(powers), repetitions)
+        compiled = encoder.compile(powers)
+        t_tick = chronometrer(lambda: tick_compile(compiled), repetitions * 10)
+        resultats.append({
+            "grille": f"{n}x{n}",
+            "cellules": n * n,
+            "tick_reconstruit_ms": t_ancien * 1e3,
+            "compilation_ms": t_compil * 1e3,
+            "compilation_binaire_ms": t_binaire * 1e3,
+            "tick_compile_ms": t_tick * 1e3,
+            "octets_tick": compiled.nb_octets,
+        })
+        print(f"{n}x{n:<5} {n * n:>8} {t_ancien * 1e3:>17.3f} {t_compil * 1e3:>17.3f} "
+              f"{t_binaire * 1e3:>13.3f} {t_tick * 1e3:>18.4f} {compiled.nb_octets:>12}")
+    return resultats
+
+
+def octets_tick_delta(courbe, n, protocole, ticks=60, changement=10, part=0.2):
+    """
+    Octets envoyés par tick en envoi différentiel (DeltaTracker du moteur), sur un profil où
+    `part` des cellules changent de consigne tous les `changement` ticks. Chaque cellule
+    répond avant le tick suivant ; le rafraîchissement tournant est compris.
+    """
+    encoder = creer_encodeur(protocole, courbe.indice_pwm)
+    suivi = DeltaTracker(periode=1.0)
+    powers = grille_puissances(n, n)
+    cellules = sorted(powers)
+    pas = max(1, round(1 / part))
+    compiled = encoder.compile(powers)
+    vus = {}
+    total = 0
+    for k in range(ticks):
+        if k and k % changement == 0:
+            decalage = k // changement
+            powers = {cell_id: ([(p + 5) % 105 for p in valeurs] if (i + decalage) % pas == 0 else valeurs)
+                      for i, (cell_id, valeurs) in enumerate(zip(cellules, (powers[c] for c in cellules)))}
+            compiled = encoder.compile(powers)
+        frames = encoder.frames_delta(compiled)
+        suivi.acquitter(vus)
+        for cell_id in suivi.selectionner(compiled, float(k)):
+            total += len(frames[cell_id])
+            suivi.marquer_envoye(cell_id, compiled.indices[cell_id], float(k))
+            vus[cell_id] = k + 0.5
+    return total / ticks
+
+
+def bench_debit(baud=9600, taille_max=20):
+    """
+    Capacité de la liaison série pour chaque protocole, de 3x3 à taille_max x taille_max,
+    envoi complet et envoi différentiel (20 % des cellules changent toutes les 10 s).
+    """
+    courbe = FanCurve.from_csv(CSV_VENTILATEUR)
+    resultats = []
+    print(f"Liaison {baud} bauds (8N1)")
+    for protocole in PROTOCOLES:
+        print(f"  {protocole}: mur max tenant dans 1 s = {mur_max(baud, protocole)} cellules")
+    print(f"{'grille':>7} {'protocole':>9} {'octets/trame':>13} {'cellules/s':>11} {'durée tick (s)':>15} "
+          f"{'différentiel (s)':>17} {'gain':>6}")
+    for n in range(3, taille_max + 1):
+        for protocole in PROTOCOLES:
+            capa = capacite_liaison(baud, n * n, protocole)
+            octets_delta = octets_tick_delta(courbe, n, protocole)
+            capa["octets_tick_delta"] = octets_delta
+            capa["duree_tick_delta_s"] = octets_delta * BITS_PAR_OCTET / baud
+            resultats.append(capa)
+            print(f"{n}x{n:<5} {protocole:>9} {capa['octets_trame']:>13} "
+                  f"{capa['cellules_par_seconde']:>11.1f} {capa['duree_tick_s']:>15.2f} "
+                  f"{capa['duree_tick_delta_s']:>17.2f} {1 - octets_delta / capa['octets_tick']:>6.0%}")
+    return resultats
+
+
+def courbe_haute_resolution(lignes):
+    """Courbe synthétique de `lignes` points, interpolée sur data_value_fan.csv."""
+    base = FanCurve.from_csv(CSV_VENTILATEUR)
+    n = len(base.airflow_values)
+    pwm, rpm, debit = [], [], []
+    for i in range(lignes):
+        x = i * (n - 1) / (lignes - 1)
+        j = min(int(x), n - 2)
+        f = x - j
+        pwm.append(i)
+        rpm.append(round(base.rpm_values[j] * (1 - f) + base.rpm_values[j + 1] * f))
+        debit.append(round(base.airflow_values[j] * (1 - f) + base.airflow_values[j + 1] * f, 4))
+    return pwm, rpm, debit
+
+
+def bench_courbe(lignes=5000):
+    """Chargement de la courbe et conversion pourcentage -> indice PWM, ancien vs tables."""
+    resultats = []
+    t_csv = chronometrer(lambda: FanCurve.from_csv(CSV_VENTILATEUR), 50)
+    print(f"Chargement data_value_fan.csv + tables : {t_csv * 1e3:.3f} ms")
+    resultats.append({"mesure": "chargement_csv", "ms": t_csv * 1e3})
+
+    for taille in (101, lignes):
+        pwm, rpm, debit = courbe_haute_resolution(taille)
+        t_ancien = chronometrer(lambda: airflow_reduit_lineaire(debit), 5)
+        t_tables = chronometrer(lambda: FanCurve(pwm, rpm, debit), 5)
+        courbe = FanCurve(pwm, rpm, debit)
+        assert list(courbe.airflow_percentage) == airflow_reduit_lineaire(debit)
+
+        conv = indice_lineaire(courbe.airflow_values, courbe.airflow_percentage)
+        appels = POURCENTAGES * 200
+        t_conv_ancien = chronometrer(lambda: [conv(p) for p in appels], 3) / len(appels)
+        t_conv_table = chronometrer(lambda: [courbe.indice_pwm(p) for p in appels], 3) / len(appels)
+        resultats.append({
+            "lignes": taille,
+            "airflow_reduit_ancien_ms": t_ancien * 1e3,
+            "tables_ms": t_tables * 1e3,
+            "conversion_ancienne_us": t_conv_ancien * 1e6,
+            "conversion_table_us": t_conv_table * 1e6,
+        })
+        print(f"{taille:>6} lignes : airflow réduit {t_ancien * 1e3:8.3f} ms -> tables {t_tables * 1e3:8.3f} ms | "
+              f"conversion {t_conv_ancien * 1e6:8.3f} µs -> {t_conv_table * 1e6:6.3f} µs")
+    return resultats
+
+
+def trafic_rpm(nb_cellules, nb_lignes):
+    """Trafic RPM synthétique : une ligne {"cell", "RPM"} par cellule, à tour de rôle."""
+    cellules = [CellAddress(1 + i // 9, 1 + i % 9).publish for i in range(nb_cellules)]
+    return [
+        (json.dumps({"cell": cellules[i % nb_cellules],
+                     "RPM": [3000 + (i * 37 + k * 101) % 6000 for k in range(9)]}) + "\n").encode()
+        for i in range(nb_lignes)
+    ]
+
+
+def ouvrir_pty():
+    """Paire pseudo-terminal en mode brut : (fd maître, chemin de l'esclave)."""
+    maitre, esclave = os.openpty()
+    tty.setraw(maitre)
+    tty.setraw(esclave)
+    return maitre, esclave, os.ttyname(esclave)
+
+
+def rejouer(maitre, lignes, baud, arret):
+    """
+    Écrit le trafic sur le maître au rythme de la liaison (baud/10 octets/s), 0 = sans limite.
+    Si le maître est non bloquant, les lignes que le lecteur n'absorbe pas sont perdues.
+    """
+    octets_par_seconde = baud / 10 if baud else None
+    debut = time.monotonic()
+    envoyes = 0
+    for ligne in lignes:
+        if arret.is_set():
+            break
+        if octets_par_seconde:
+            echeance = debut + envoyes / octets_par_seconde
+            attente = echeance - time.monotonic()
+            if attente > 0:
+                time.sleep(attente)
+        try:
+            os.write(maitre, ligne)
+        except BlockingIOError:
+            continue
+        envoyes += len(ligne)
+    return time.monotonic() - debut
+
+
+def lecture_historique(chemin, duree):
+    """Ancienne boucle RPMReceiver.listen_loop : readline() puis sleep(0.05)."""
+    import serial
+    conn = serial.Serial(chemin, 9600, timeout=1)
+    lues = 0
+    fin = time.monotonic() + duree
+    while time.monotonic() < fin:
+        line = conn.readline().decode('utf-8').strip()
+        if line:
+            json.loads(line)
+            lues += 1
+        time.sleep(0.05)
+    conn.close()
+    return lues
+
+
+def bench_reception(baud=9600, duree=5.0, nb_cellules=25, fichier=None):
+    """Rejoue du trafic RPM dans un pseudo-terminal et mesure ce que le récepteur absorbe."""
+    from gvm_serial import RPMReceiver, SerialTransport
+
+    if fichier:
+        with open(fichier, 'rb') as f:
+            lignes = [l if l.endswith(b'\n') else l + b'\n' for l in f if l.strip()]
+    else:
+        taille_ligne = len(trafic_rpm(nb_cellules, 1)[0])
+        nb = int((baud / 10 * duree) / taille_ligne) if baud else 20000
+        lignes = trafic_rpm(nb_cellules, nb)
+    attendues = len(lignes)
+    resultats = {"baud": baud, "lignes_emises": attendues}
+
+    maitre, esclave, chemin = ouvrir_pty()
+    transport = SerialTransport(chemin, baud or 9600)
+    recepteur = RPMReceiver(chemin, baud or 9600)
+    recepteur.attacher(transport)
+    transport.start()
+    while not transport.connecte:
+        time.sleep(0.01)
+
+    arret = threading.Event()
+    t_emission = rejouer(maitre, lignes, baud, arret)
+    limite = time.monotonic() + 5.0
+    while recepteur.messages_recus < attendues and time.monotonic() < limite:
+        time.sleep(0.01)
+    retard = time.monotonic() - (limite - 5.0)
+    transport.stop()
+    os.close(maitre)
+    os.close(esclave)
+
+    resultats.update({
+        "duree_emission_s": t_emission,
+        "lignes_recues": recepteur.messages_recus,
+        "erreurs": recepteur.erreurs_analyse + recepteur.splitter.erreurs,
+        "lignes_par_seconde": recepteur.messages_recus / t_emission if t_emission else None,
+        "retard_fin_s": retard,
+        "cellules_vues": len(recepteur.get_all_rpms()),
+    })
+    print(f"Émis : {attendues} lignes en {t_emission:.2f} s ({attendues / t_emission:.0f} lignes/s)")
+    print(f"Reçu : {recepteur.messages_recus} lignes, {resultats['erreurs']} erreurs, "
+          f"{resultats['cellules_vues']} cellules, retard en fin de rejeu {retard * 1e3:.0f} ms")
+
+    # Ancienne boucle readline + sleep(0.05), même trafic pendant la même durée
+    maitre, esclave, chemin = ouvrir_pty()
+    os.set_blocking(maitre, False)
+    arret = threading.Event()
+    emetteur = threading.Thread(target=rejouer, args=(maitre, lignes, baud, arret), daemon=True)
+    emetteur.start()
+    lues = lecture_historique(chemin, min(duree, t_emission or duree))
+    arret.set()
+    emetteur.join()
+    os.close(maitre)
+    os.close(esclave)
+    resultats["lignes_par_seconde_historique"] = lues / min(duree, t_emission or duree)
+    print(f"Ancienne boucle readline + sleep(0.05) : {resultats['lignes_par_seconde_historique']:.1f} lignes/s")
+    return resultats
+
+
+def bench_rendu(tailles=(3, 5, 10, 15)):
+    """Mise à jour complète de la grille : config() sur chaque bouton vs GridRenderer."""
+    import tkinter as tk
+    from double_interface import GridRenderer
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Pas d'affichage disponible ({e}) : benchmark de rendu ignoré.")
+        return []
+
+    resultats = []
+    print(f"{'grille':>7} {'boutons':>8} {'direct (ms)':>12} {'rendu (ms)':>11} "
+          f"{'inchangé (ms)':>14} {'10 % (ms)':>10}")
+    for n in tailles:
+        frame = tk.Frame(root)
+        frame.pack()
+        boutons = {}
+        for r in range(n):
+            for c in range(n):
+                for k in range(9):
+                    btn = tk.Button(frame, text="0%")
+                    btn.grid(row=r * 3 + k // 3, column=c * 3 + k % 3)
+                    boutons[(f"{r}-{c}", k)] = btn
+        root.update()
+
+        def direct(power):
+            for btn in boutons.values():
+                btn.config(text=f"{power}%", bg="green" if power > 0 else "lightgrey",
+                           fg="white" if power > 0 else "black")
+            root.update_idletasks()
+
+        renderer = GridRenderer(root, lambda mode, cell_id, fan_idx: boutons[(cell_id, fan_idx)])
+
+        def rendu(puissances):
+            for (cell_id, fan_idx), power in puissances.items():
+                renderer.demander_puissance("execute", cell_id, fan_idx, power)
+            renderer.appliquer()
+            root.update_idletasks()
+
+        t_direct = chronometrer(lambda: (direct(50), direct(0)), 3) / 2
+        toutes = {cle: 50 for cle in boutons}
+        t_rendu = chronometrer(lambda: (rendu({cle: 0 for cle in boutons}), rendu(toutes)), 3) / 2
+        t_inchange = chronometrer(lambda: rendu(toutes), 3)
+        partiel = {cle: (75 if i % 10 == 0 else 50) for i, cle in enumerate(boutons)}
+        t_partiel = chronometrer(lambda: (rendu(partiel), rendu(toutes)), 3) / 2
+
+        resultats.append({
+            "grille": f"{n}x{n}", "boutons": len(boutons),
+            "direct_ms": t_direct * 1e3, "rendu_ms": t_rendu * 1e3,
+            "inchange_ms": t_inchange * 1e3, "partiel_10pct_ms": t_partiel * 1e3,
+        })
+        print(f"{n}x{n:<5} {len(boutons):>8} {t_direct * 1e3:>12.2f} {t_rendu * 1e3:>11.2f} "
+              f"{t_inchange * 1e3:>14.2f} {t_partiel * 1e3:>10.2f}")
+        frame.destroy()
+    root.destroy()
+    return resultats
+
+
+def bench_multibus(taille=12, nb_bus=(1, 2, 4), protocole="json", baud=9600, ticks=5):
+    """
+    Mur taille x taille réparti en bandes de lignes sur 1, 2, 4... pseudo-terminaux.
+    Vérifie que chaque port ne reçoit que ses cellules et que les RPM reviennent par le bon
+    bus, puis compare la durée de transmission d'un tick (port le plus chargé) au débit donné.
+    """
+    import select
+
+    from gvm_bus import BusCoordinator, repartir_par_lignes
+    from gvm_protocol import StreamSplitter, creer_encodeur, decoder_trame_binaire
+    from gvm_scheduler import SequenceScheduler
+
+    courbe = FanCurve.from_csv(CSV_VENTILATEUR)
+    encoder = creer_encodeur(protocole, courbe.indice_pwm)
+    powers = grille_puissances(taille, taille)
+
+    def lire(maitre, tampon, arret):
+        while not arret.is_set():
+            pret, _, _ = select.select([maitre], [], [], 0.05)
+            if pret:
+                tampon.extend(os.read(maitre, 65536))
+
+    def cellule_publiee(message):
+        if message.startswith(b'\xA5\x5A'):
+            return CellAddress.depuis_publish(decoder_trame_binaire(message)[1]).key
+        return CellAddress.depuis_publish(json.loads(message)["Publish"]).key
+
+    resultats = []
+    print(f"Mur {taille}x{taille}, protocole {protocole}, {baud} bauds")
+    print(f"{'bus':>4} {'octets/tick (max bus)':>22} {'durée tick (s)':>15} {'hors bus':>9} {'RPM reçus':>10}")
+    for n in nb_bus:
+        ptys = [ouvrir_pty() for _ in range(n)]
+        coordinateur = BusCoordinator(repartir_par_lignes(taille, taille, [p[2] for p in ptys]))
+        coordinateur.start()
+        limite = time.monotonic() + 5.0
+        while not coordinateur.connecte and time.monotonic() < limite:
+            time.sleep(0.01)
+
+        arret = threading.Event()
+        tampons = [bytearray() for _ in ptys]
+        lecteurs = [threading.Thread(target=lire, args=(p[0], t, arret), daemon=True)
+                    for p, t in zip(ptys, tampons)]
+        for lecteur in lecteurs:
+            lecteur.start()
+
+        compiled = coordinateur.compiler(encoder, powers)
+        scheduler = SequenceScheduler(0.05)
+        for tick in scheduler.ticks([("mur", ticks * 0.05)]):
+            for publish_cell, frame in compiled:
+                coordinateur.write(frame, publish_cell)
+        time.sleep(0.3)
+        arret.set()
+        for lecteur in lecteurs:
+            lecteur.join()
+
+        # Chaque port ne doit recevoir que les trames de ses propres cellules
+        hors_bus = 0
+        for bus, tampon in zip(coordinateur.bus, tampons):
+            cellules = set(bus.cell_ids)
+            hors_bus += sum(cellule_publiee(m) not in cellules for m in StreamSplitter().feed(bytes(tampon)))
+        octets_max = max(len(t) for t in tampons) / ticks
+
+        # Réponses RPM : chaque contrôleur répond sur son propre port
+        for (maitre, _, _), bus in zip(ptys, coordinateur.bus):
+            for cell_id in bus.cell_ids:
+                os.write(maitre, (json.dumps({"cell": publish_id(cell_id), "RPM": [1000] * 9}) + "\n").encode())
+        limite = time.monotonic() + 5.0
+        while len(coordinateur.get_all_rpms()) < taille * taille and time.monotonic() < limite:
+            time.sleep(0.01)
+        recus = len(coordinateur.get_all_rpms())
+
+        coordinateur.stop()
+        for maitre, esclave, _ in ptys:
+            os.close(maitre)
+            os.close(esclave)
+
+        duree_tick = octets_max * BITS_PAR_OCTET / baud
+        resultats.append({"bus": n, "octets_tick_bus_max": octets_max, "duree_tick_s": duree_tick,
+                          "trames_hors_bus": hors_bus, "cellules_rpm_recues": recus})
+        print(f"{n:>4} {octets_max:>22.0f} {duree_tick:>15.2f} {hors_bus:>9} {recus:>10}/{taille * taille}")
+    return resultats
+
+
+def bench_analyse(nb_messages=20000, nb_cellules=100):
+    """Décodage des mesures RPM par RPMReceiver : message par message et par blocs lus."""
+    from gvm_serial import RPMReceiver
+
+    resultats = []
+    lignes = trafic_rpm(nb_cellules, nb_messages)
+    binaires = [encoder_trame_rpm(cle_cellule(1 + i // 9 % 9, 1 + i % 9), [3000 + i % 6000] * 9)
+                for i in range(nb_messages)]
+    print(f"{'protocole':>9} {'handle_message (msg/s)':>23} {'feed par blocs (msg/s)':>23}")
+    for protocole, messages in (("json", lignes), ("binaire", binaires)):
+        recepteur = RPMReceiver("bench", 9600)
+        debut = time.perf_counter()
+        for message in messages:
+            recepteur.handle_message(message)
+        t_message = time.perf_counter() - debut
+
+        # Blocs de 4 Kio, comme une lecture série qui a pris du retard
+        flux = b"".join(messages)
+        blocs = [flux[i:i + 4096] for i in range(0, len(flux), 4096)]
+        recepteur = RPMReceiver("bench", 9600)
+        debut = time.perf_counter()
+        for bloc in blocs:
+            recepteur.feed(bloc)
+        t_blocs = time.perf_counter() - debut
+        assert recepteur.messages_recus == len(messages)
+
+        resultats.append({
+            "protocole": protocole, "messages": len(messages),
+            "handle_message_par_seconde": len(messages) / t_message,
+            "feed_par_seconde": len(messages) / t_blocs,
+        })
+        print(f"{protocole:>9} {len(messages) / t_message:>23.0f} {len(messages) / t_blocs:>23.0f}")
+    return resultats
+
+
+def profil_multisequence(nb_sequences, taille):
+    from gvm_engine import Profile
+
+    return Profile(sequences={
+        f"seq{i}": {"powers": {cell_id: [(v + 5 * i) % 105 for v in valeurs]
+                               for cell_id, valeurs in grille_puissances(taille, taille).items()},
+                    "duration": 10}
+        for i in range(nb_sequences)
+    })
+
+
+def bench_profils(nb_sequences=(10, 50), taille=20):
+    """Sauvegarde et chargement (avec normalisation des clés) de grands profils dynamiques."""
+    from gvm_engine import Profile
+
+    resultats = []
+    print(f"Mur {taille}x{taille}")
+    print(f"{'séquences':>10} {'taille (Mo)':>12} {'sauvegarde (ms)':>16} {'chargement (ms)':>16}")
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "profil.json")
+        for n in nb_sequences:
+            profil = profil_multisequence(n, taille)
+            t_sauvegarde = chronometrer(lambda: profil.sauvegarder(chemin), 3)
+            t_chargement = chronometrer(lambda: Profile.charger(chemin), 3)
+            assert Profile.charger(chemin).cell_ids() == profil.cell_ids()
+            mo = os.path.getsize(chemin) / 1e6
+            resultats.append({"sequences": n, "cellules": taille * taille, "mo": mo,
+                              "sauvegarde_ms": t_sauvegarde * 1e3, "chargement_ms": t_chargement * 1e3})
+            print(f"{n:>10} {mo:>12.2f} {t_sauvegarde * 1e3:>16.1f} {t_chargement * 1e3:>16.1f}")
+    return resultats
+
+
+def bench_grille(tailles=(3, 5, 10, 20)):
+    """
+    Construction de la grille par GVMControlApp.create_fan_grid, dans les deux vues.
+    Seuls les attributs dont create_fan_grid a besoin sont initialisés : ni port série
+    ni boîte de dialogue.
+    """
+    import tkinter as tk
+    from double_interface import GridRenderer, GVMControlApp, TooltipManager
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Pas d'affichage disponible ({e}) : benchmark de grille ignoré.")
+        return []
+
+    resultats = []
+    print(f"{'grille':>7} {'ventilateurs':>13} {'boutons (ms)':>13} {'canvas (ms)':>12}")
+    for n in tailles:
+        mesure = {"grille": f"{n}x{n}", "ventilateurs": n * n * 9}
+        for vue in ("boutons", "canvas"):
+            app = GVMControlApp.__new__(GVMControlApp)
+            app.root = root
+            app.grid_rows = app.grid_cols = n
+            app.vue_grille = vue
+            app.canvas_grids = {}
+            app.fan_status = {cle_cellule(r, c): {} for r in range(1, n + 1) for c in range(1, n + 1)}
+            app.grid_renderer = GridRenderer(root, app.obtenir_bouton)
+            app.tooltip = TooltipManager(root, lambda cell_id, fan_idx: "")
+            parent = tk.Frame(root)
+            parent.pack(fill=tk.BOTH, expand=True)
+            debut = time.perf_counter()
+            app.create_fan_grid(parent, "execute")
+            root.update()  # géométrie et premier affichage compris
+            mesure[f"{vue}_ms"] = (time.perf_counter() - debut) * 1e3
+            parent.destroy()
+            root.update()
+        resultats.append(mesure)
+        print(f"{n}x{n:<5} {n * n * 9:>13} {mesure['boutons_ms']:>13.1f} {mesure['canvas_ms']:>12.1f}")
+    root.destroy()
+    return resultats
+
+
+@contextlib.contextmanager
+def affichage_virtuel():
+    """Sans $DISPLAY, lance un Xvfb le temps du benchmark (s'il est installé)."""
+    if os.environ.get("DISPLAY") or os.name != "posix" or not shutil.which("Xvfb"):
+        yield
+        return
+    numero = f":{90 + os.getpid() % 100}"
+    serveur = subprocess.Popen(["Xvfb", numero, "-screen", "0", "1920x1080x24", "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = numero
+    time.sleep(0.5)
+    try:
+        yield
+    finally:
+        del os.environ["DISPLAY"]
+        serveur.terminate()
+        serveur.wait()
+
+
+def tout(rapide=False):
+    """Toute la suite avec ses paramètres par défaut (réduits avec `rapide`) : {commande: résultats}."""
+    resultats = {
+        "courbe": bench_courbe(1000 if rapide else 5000),
+        "trames": bench_trames(10 if rapide else 20),
+        "analyse": bench_analyse(5000 if rapide else 20000),
+        "profils": bench_profils((5,) if rapide else (10, 50), 10 if rapide else 20),
+        "reception": bench_reception(0, 2.0 if rapide else 5.0),
+        "multibus": bench_multibus(6 if rapide else 12, (1, 2)),
+    }
+    with affichage_virtuel():
+        resultats["rendu"] = bench_rendu((3, 5) if rapide else (3, 5, 10, 15))
+        resultats["grille"] = bench_grille((3, 5) if rapide else (3, 5, 10, 20))
+    return resultats
+
+
+# --- Export JSON et comparaison -------------------------------------------------
+
+IDENTIFIANTS = ("grille", "lignes", "protocole", "sequences", "bus", "baud", "mesure")
+
+
+def contexte():
+    """Ce qu'il faut savoir pour comparer deux fichiers de résultats."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DOSSIER, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "processeur": platform.processor() or platform.machine(),
+    }
+
+
+def aplatir(resultats, prefixe=""):
+    """{"trames/grille=5x5/compilation_ms": 0.12, ...} : une clé stable par mesure numérique."""
+    valeurs = {}
+    if isinstance(resultats, dict):
+        for cle, valeur in resultats.items():
+            valeurs.update(aplatir(valeur, f"{prefixe}{cle}/" if isinstance(valeur, (dict, list)) else prefixe + cle))
+    elif isinstance(resultats, list):
+        for i, element in enumerate(resultats):
+            etiquette = str(i)
+            if isinstance(element, dict):
+                etiquette = ",".join(f"{cle}={element[cle]}" for cle in IDENTIFIANTS if cle in element) or etiquette
+            valeurs.update(aplatir(element, f"{prefixe}{etiquette}/"))
+    elif isinstance(resultats, (int, float)) and not isinstance(resultats, bool):
+        valeurs[prefixe.rstrip("/")] = resultats
+    return valeurs
+
+
+def comparer(reference, actuels, seuil=0.2):
+    """
+    Régressions de `actuels` par rapport à `reference` : durées (_ms, _us, _s) plus longues
+    et débits (par_seconde) plus faibles de plus de `seuil`.
+    Retourne ([(clé, avant, après)], nombre de mesures présentes des deux côtés).
+    """
+    avant, apres = aplatir(reference), aplatir(actuels)
+    regressions = []
+    communes = sorted(avant.keys() & apres.keys())
+    for cle in communes:
+        a, b = avant[cle], apres[cle]
+        if a <= 0:
+            continue
+        nom = cle.rsplit("/", 1)[-1]
+        if (nom == "ms" or nom.endswith(("_ms", "_us", "_s"))) and b > a * (1 + seuil):
+            regressions.append((cle, a, b))
+        elif nom.endswith("par_seconde") and b < a * (1 - seuil):
+            regressions.append((cle, a, b))
+    return regressions, len(communes)
+
+
+def main():
+    # Options communes, acceptées après le nom de chaque commande
+    commun = argparse.ArgumentParser(add_help=False)
+    commun.add_argument("--json", metavar="FICHIER", help="Écrit les résultats et leur contexte en JSON")
+    commun.add_argument("--comparer", metavar="REFERENCE", help="Fichier JSON d'une mesure précédente")
+    commun.add_argument("--seuil", type=float, default=0.2, help="Écart relatif toléré par --comparer")
+
+    parser = argparse.ArgumentParser(description="Benchmarks du contrôle GVM")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_trames = sous.add_parser("trames", parents=[commun], help="Coût par tick de la construction des trames")
+    p_trames.add_argument("--max", type=int, default=20, help="Taille maximale de grille (n x n)")
+
+    p_debit = sous.add_parser("debit", parents=[commun], help="Cellules par seconde supportées par protocole")
+    p_debit.add_argument("--baud", type=int, default=9600)
+    p_debit.add_argument("--max", type=int, default=20, help="Taille maximale de grille (n x n)")
+
+    p_courbe = sous.add_parser("courbe", parents=[commun], help="Chargement de la courbe et conversion en indice PWM")
+    p_courbe.add_argument("--lignes", type=int, default=5000, help="Points de la courbe haute résolution")
+
+    p_reception = sous.add_parser("reception", parents=[commun], help="Rejeu de trafic RPM à travers un pseudo-terminal")
+    p_reception.add_argument("--baud", type=int, default=9600, help="Débit simulé (0 = sans limite)")
+    p_reception.add_argument("--duree", type=float, default=5.0)
+    p_reception.add_argument("--cellules", type=int, default=25)
+    p_reception.add_argument("--fichier", help="Trafic enregistré (une ligne JSON par message)")
+
+    p_multibus = sous.add_parser("multibus", parents=[commun], help="Mur réparti sur plusieurs pseudo-terminaux")
+    p_multibus.add_argument("--taille", type=int, default=12, help="Grille taille x taille")
+    p_multibus.add_argument("--bus", type=int, nargs="+", default=[1, 2, 4])
+    p_multibus.add_argument("--protocole", choices=PROTOCOLES, default=PROTOCOLES[0])
+    p_multibus.add_argument("--baud", type=int, default=9600)
+
+    p_rendu = sous.add_parser("rendu", parents=[commun], help="Mise à jour de la grille Tk selon sa taille")
+    p_rendu.add_argument("--tailles", type=int, nargs="+", default=[3, 5, 10, 15])
+
+    p_analyse = sous.add_parser("analyse", parents=[commun], help="Décodage des mesures RPM par RPMReceiver")
+    p_analyse.add_argument("--messages", type=int, default=20000)
+
+    p_profils = sous.add_parser("profils", parents=[commun], help="Sauvegarde et chargement de grands profils dynamiques")
+    p_profils.add_argument("--sequences", type=int, nargs="+", default=[10, 50])
+    p_profils.add_argument("--taille", type=int, default=20, help="Grille taille x taille")
+
+    p_grille = sous.add_parser("grille", parents=[commun], help="Construction de la grille Tk (create_fan_grid)")
+    p_grille.add_argument("--tailles", type=int, nargs="+", default=[3, 5, 10, 20])
+
+    p_tout = sous.add_parser("tout", parents=[commun], help="Toute la suite, pour un fichier --json de référence")
+    p_tout.add_argument("--rapide", action="store_true", help="Tailles réduites")
+
+    args = parser.parse_args()
+    if args.commande == "trames":
+        resultats = bench_trames(args.max)
+    elif args.commande == "debit":
+        resultats = bench_debit(args.baud, args.max)
+    elif args.commande == "courbe":
+        resultats = bench_courbe(args.lignes)
+    elif args.commande == "reception":
+        resultats = bench_reception(args.baud, args.duree, args.cellules, args.fichier)
+    elif args.commande == "multibus":
+        resultats = bench_multibus(args.taille, tuple(args.bus), args.protocole, args.baud)
+    elif args.commande == "rendu":
+        with affichage_virtuel():
+            resultats = bench_rendu(args.tailles)
+    elif args.commande == "analyse":
+        resultats = bench_analyse(args.messages)
+    elif args.commande == "profils":
+        resultats = bench_profils(tuple(args.sequences), args.taille)
+    elif args.commande == "grille":
+        with affichage_virtuel():
+            resultats = bench_grille(args.tailles)
+    else:
+        resultats = tout(args.rapide)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"commande": args.commande, "contexte": contexte(), "resultats": resultats}, f, indent=2)
+        print(f"Résultats écrits dans {args.json}")
+
+    if args.comparer:
+        with open(args.comparer) as f:
+            reference = json.load(f)
+        commande_reference = reference.get("commande")
+        avant, apres = reference.get("resultats"), resultats
+        # Une référence 'tout' contient chaque commande : on compare la partie correspondante
+        if commande_reference == "tout" and args.commande != "tout":
+            avant = (avant or {}).get(args.commande)
+        elif args.commande == "tout" and commande_reference != "tout":
+            apres = resultats.get(commande_reference)
+        regressions, comparees = comparer(avant, apres, args.seuil)
+        if not comparees:
+            print(f"[ERREUR] Aucune mesure commune avec la référence ('{commande_reference}', "
+                  f"mesure '{args.commande}') : rien n'a été comparé.")
+            return 2
+        for cle, avant, apres in regressions:
+            print(f"⚠ Régression {cle} : {avant:.4g} -> {apres:.4g}")
+        print(f"{len(regressions)} régression(s) sur {comparees} mesures au-delà de {args.seuil:.0%} "
+              f"(référence du {reference.get('contexte', {}).get('date', '?')})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
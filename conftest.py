@@ -0,0 +1,10 @@
+import pytest
+
+from gvm_curve import FanCurve
+from gvm_engine import CSV_VENTILATEUR
+
+
+@pytest.fixture(scope="session")
+def courbe():
+    """Courbe du ventilateur livrée avec le dépôt (data_value_fan.csv)."""
+    return FanCurve.from_csv(CSV_VENTILATEUR)
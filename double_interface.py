@@ -1,52 +1,129 @@
 
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox, filedialog
-import json
+import argparse
 import threading
 import time
-import random
 import os
-import serial
-import queue
-import csv
+from collections import deque
 
 from functools import partial
 
+import numpy as np
+
+from gvm_address import cle_cellule
+from gvm_async import AsyncIOCore
+from gvm_curve import FanCurve
+from gvm_model import FanWall
+from gvm_bus import BusCoordinator, repartir_par_lignes
+from gvm_serial import BAUDRATE, PORT_SERIE
+from gvm_engine import GVMEngine, Profile
+from gvm_journal import DebitEnvoi, JournalSerie
+from gvm_metriques import METRIQUES
+from gvm_protocol import PROTOCOLE_JSON, PROTOCOLES
+from gvm_regulation import FanRegulator
+from gvm_sante import CALE, ECART, NOMS_ETATS, PERIME, HealthMonitor
+from gvm_telemetrie import TelemetryRecorder
+
+# Couleur d'un ventilateur en défaut dans la grille d'exécution
+COULEURS_DEFAUTS = {ECART: "red", CALE: "darkred", PERIME: "orange"}
+
+SEUIL_VUE_CANVAS = 36  # au-delà de ce nombre de cellules, la grille est dessinée sur un Canvas
+
+
 class GVMControlApp:
-    def __init__(self, root, grid_rows=3, grid_cols=3):
+    def __init__(self, root, grid_rows=3, grid_cols=3, vue_grille=None, ports=None, affectation=None,
+                 telemetrie=None):
         self.root = root
         self.root.title("Contrôle GVM - Système de Ventilation Modulaire")
         
-        self.loop_profile_var = tk.BooleanVar(value=False)
+        self.loop_profile_var = tk.BooleanVar(value=False)  # lecture en boucle des profils dynamiques
 
         self.profile_name = "Aucun profil chargé"
         self.is_modified = False
         self.grid_rows = grid_rows
         self.grid_cols = grid_cols
+        # "boutons" : un tk.Button par ventilateur ; "canvas" : tout sur un Canvas (grands murs)
+        if vue_grille is None:
+            vue_grille = "canvas" if grid_rows * grid_cols > SEUIL_VUE_CANVAS else "boutons"
+        self.vue_grille = vue_grille
+        self.canvas_grids = {}  # {mode: CanvasFanGrid}
         self.pwm_values = []
         self.rpm_values = []
         self.airflow_values = []
         self.airflow_percentage = []
-        self.rpm_data = {}
-        self.fan_status = {}
+        self.courbe = None  # FanCurve : tables de conversion construites au chargement du CSV
+        self.mur = None  # FanWall : consignes, télémétrie et santé (modèle numérique)
+        self.fan_status = {}  # {cell_id: {'create_btn_N' / 'execute_btn_N': widget}}
         self.current_mode = "create"
         self.selected_fans = set()
         self.sequences = {}  # {name: {'powers': {...}, 'duration': int}}
         self.sequence_buttons = []
-        self.rpm_receiver = RPMReceiver()
-        self.rpm_receiver.start()
+        self.protocol_var = tk.StringVar(value=PROTOCOLE_JSON)  # protocole série choisi pour ce mur
+        self.delta_var = tk.BooleanVar(value=False)  # envoi différentiel
+        self.regulation_var = tk.BooleanVar(value=False)  # indices PWM corrigés par les RPM mesurés
+        self.tick_period_var = tk.StringVar(value="1.0")  # période d'envoi en secondes
+        self.metriques_var = tk.BooleanVar(value=False)  # instrumentation des chemins critiques
+        self.sonde_metriques = None  # rappel after() de la sonde de la boucle Tk, None si arrêtée
+        self.dernier_panneau = 0.0
+        # Journal de lecture : tampon circulaire borné, vidé en un seul insert par rafraîchissement
+        self.journal_serie = JournalSerie()
+        self.debit_envoi = DebitEnvoi()
+        self.detail_trames_var = tk.BooleanVar(value=False)  # une ligne par trame dans la fenêtre
+        # Les rappels du moteur et des récepteurs arrivent d'autres threads : passage par le pont
+        self.bridge = TkBridge(self.root)
+        # Un transport par port série (écriture des trames et lecture des RPM) ; par défaut
+        # /dev/serial0 seul, sinon les lignes du mur sont réparties en bandes sur `ports`
+        if affectation is None:
+            affectation = repartir_par_lignes(grid_rows, grid_cols, list(ports or [PORT_SERIE]))
+        # Une boucle asyncio sert tous les ports (envoi, réception, cadence) ; None hors POSIX
+        self.core = AsyncIOCore.pour_plateforme()
+        self.bus = BusCoordinator(affectation, BAUDRATE, self.core)
+        # Rafraîchissement piloté par les changements : rien n'est planifié tant que le mur est muet.
+        # Abonné avant l'ouverture des ports : aucun lot ne peut arriver sans être signalé
+        self.telemetrie_en_attente = False
+        self.dernier_rafraichissement = 0.0
+        self.derniere_sante = 0.0
+        self.interface_prete = False  # vrai une fois la grille et les variables Tk construites
+        self.bus.on_change = self.signaler_telemetrie
+        self.bus.start()
         
         self.charger_csv_ventilateur()
+        # Lecture des profils (encodage, ordonnancement, envoi) : l'interface n'est qu'un client du moteur
+        self.engine = GVMEngine(self.courbe, self.bus, journal=self.journal_serie.ecrire)
+        self.engine.journal_trame = self.journal_serie.trame
+        # Historique RPM (dossier d'archive) : chaque mesure reçue, avec la consigne active
+        if telemetrie:
+            self.engine.enregistreur = TelemetryRecorder(telemetrie)
+            self.engine.enregistreur.start()
+            self.bus.on_mesures = self.engine.enregistreur.enregistrer
+        self.root.protocol("WM_DELETE_WINDOW", self.fermer)
+        self.engine.on_sequence = lambda nom, powers: self.bridge.appeler(self.update_grid_with_powers, powers)
+        self.engine.on_fin = lambda: self.bridge.appeler(self.fin_envoi)
         self.initialize_fan_data()
         
+        self.grid_renderer = GridRenderer(self.root, self.obtenir_bouton)
+        self.tooltip = TooltipManager(self.root, self.get_rpm_text)
+
         self.create_frames()
         self.show_home()
+        self.interface_prete = True
+
+
+    def fermer(self):
+        # Ventilateurs arrêtés (trames à -1) et partis avant la fermeture des ports
+        if self.engine.session_ouverte:
+            self.engine.arreter()
+            self.bus.attendre_vidange()
+        self.engine.attendre(2.0)
+        self.bus.stop()
+        # Les dernières mesures en attente sont écrites avant de quitter
+        if self.engine.enregistreur is not None:
+            self.engine.enregistreur.stop()
+        if self.core is not None:
+            self.core.stop()
+        self.root.destroy()
 
-        self.update_thread = threading.Thread(target=self.update_rpm_data, daemon=True)
-        self.update_thread.start()
-        
-        self.loop_profile_var = tk.BooleanVar(value=False)
-        self.ser = None
     def charger_csv_ventilateur(self):
         # Récupérer le dossier où se trouve le script actuel
         dossier_script = os.path.dirname(os.path.abspath(__file__))
@@ -55,82 +132,29 @@ class GVMControlApp:
         if not filepath:
             return
 
-        self.pwm_values.clear()
-        self.rpm_values.clear()
-        self.airflow_values.clear()
-
         try:
-            with open(filepath, newline='', encoding='latin-1') as csvfile:
-                reader = csv.reader(csvfile, delimiter=';')
-                next(reader)  # ignore l'en-tête
-                for row in reader:
-                    if len(row) != 3:
-                        continue
-                    try:
-                        pwm = int(row[0].strip())
-                        rpm = int(row[1].strip())
-                        airflow = float(row[2].strip().replace(',', '.'))
-                        self.pwm_values.append(pwm)
-                        self.rpm_values.append(rpm)
-                        self.airflow_values.append(airflow)
-                    except ValueError:
-                        continue
+            # Les tables pourcentage -> indice PWM / RPM / débit sont construites ici, une fois
+            self.courbe = FanCurve.from_csv(filepath)
+            self.pwm_values = list(self.courbe.pwm_values)
+            self.rpm_values = list(self.courbe.rpm_values)
+            self.airflow_values = list(self.courbe.airflow_values)
             messagebox.showinfo("Succès", f"Fichier chargé : {os.path.basename(filepath)}")
             self.generer_airflow_reduit()
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors du chargement du CSV : {e}")
 
     def generer_airflow_reduit(self):
-        if not self.airflow_values or len(self.airflow_values) < 2:
-            raise ValueError("La liste airflow_values doit contenir au moins deux valeurs.")
-
-        airflow_debut = self.airflow_values[0]
-        airflow_fin = self.airflow_values[-1]
-
-        # 17 valeurs également espacées entre airflow_debut et airflow_fin
-        step = (airflow_fin - airflow_debut) / 19  # 18 intervalles => 19 points entre les extrêmes
-        valeurs_interpolees = [airflow_debut + i * step for i in range(1, 19)]  # on saute le début (0) et la première vraie valeur
-
-        # On cherche pour chaque valeur interpolée la plus proche dans la vraie liste
-        airflow_reduit = [0.0]  # première valeur fixée à 0
-        airflow_reduit.append(self.airflow_values[0])  # deuxième valeur : premier élément réel
-
-        for v in valeurs_interpolees:
-            valeur_proche = min(self.airflow_values, key=lambda x: abs(x - v))
-            airflow_reduit.append(valeur_proche)
-
-        airflow_reduit.append(self.airflow_values[-1])  # dernière valeur réelle
-        self.airflow_percentage = airflow_reduit
+        # Les 21 débits (paliers de 5 %) sont calculés par FanCurve au chargement
+        self.airflow_percentage = list(self.courbe.airflow_percentage)
 
     def obtenir_indice_depuis_pourcentage(self, pourcentage):
         """
         Reçoit une valeur entre 0 et 100 avec des paliers de 5.
-        1. Divise la valeur par 5 pour trouver l’indice dans self.airflow_percentage.
-        2. Cherche la valeur correspondante dans self.airflow_values.
-        3. Retourne l’indice de cette valeur dans self.airflow_values.
+        Retourne l’indice dans self.airflow_values du débit correspondant (lecture
+        directe dans la table construite au chargement du CSV).
         Si la valeur est 0, retourne -1.
         """
-        if pourcentage % 5 != 0 or not (0 <= pourcentage <= 100):
-            raise ValueError("Le pourcentage doit être un multiple de 5 entre 0 et 100.")
-
-        index_percentage = pourcentage // 5
-
-        try:
-            valeur_airflow = self.airflow_percentage[index_percentage]
-            #print(valeur_airflow)
-        except IndexError:
-            raise IndexError("Index hors limite dans airflow_percentage.")
-
-        if valeur_airflow == 0:
-            return -1
-
-        try:
-            index_airflow = self.airflow_values.index(valeur_airflow)
-            #print(index_airflow)
-            return index_airflow
-            
-        except ValueError:
-            raise ValueError("La valeur airflow n’a pas été trouvée dans airflow_values.")
+        return self.courbe.indice_pwm(pourcentage)
     
     def create_frames(self):
         self.home_frame = ttk.Frame(self.root)
@@ -173,15 +197,34 @@ class GVMControlApp:
             self.back_button.pack_forget()
 
     def initialize_fan_data(self):
-        for cell_row in range(1, self.grid_rows + 1):
-            for cell_col in range(1, self.grid_cols + 1):
-                cell_id = f"{cell_row}{cell_col}"
-                self.fan_status[cell_id] = {
-                    'power': [0] * 9,
-                    'rpm': [0] * 9,
-                    'active': False,
-                    'functional': True
-                }
+        self.mur = FanWall(self.grid_rows, self.grid_cols)
+        self.sante = HealthMonitor(self.mur, self.courbe)  # états calculés sur tout le mur d'un coup
+        self.fan_status = {cell_id: {} for cell_id in self.mur.cell_ids}
+
+    @staticmethod
+    def couches(mode):
+        """Couches du modèle modifiées depuis un mode : l'exécution affiche aussi la lecture."""
+        return ("consignes", "lecture") if mode == "execute" else ("consignes",)
+
+    def afficher_puissances(self, mode, masque=None):
+        """Redessine depuis le modèle les ventilateurs du masque (tout le mur par défaut)."""
+        valeurs = self.mur.lecture if mode == "execute" else self.mur.consignes
+        if masque is None:
+            masque = np.ones(valeurs.shape, dtype=bool)
+        for cell_id, fan_idx in self.mur.ventilateurs(masque):
+            row, col = self.mur.position(cell_id)
+            if mode == "execute":
+                self.grid_renderer.demander("execute", cell_id, fan_idx, **self.style_execution(row, col, fan_idx))
+            else:
+                self.grid_renderer.demander_puissance(mode, cell_id, fan_idx, int(valeurs[row, col, fan_idx]))
+
+    def style_execution(self, row, col, fan_idx):
+        """Puissance lue, en couleur de défaut si le moteur de santé en signale un."""
+        style = GridRenderer.style_puissance(int(self.mur.lecture[row, col, fan_idx]))
+        couleur = COULEURS_DEFAUTS.get(int(self.sante.etat[row, col, fan_idx]))
+        if couleur is not None:
+            style.update(bg=couleur, fg="white")
+        return style
 
     def create_control_interface(self):
         main_frame = ttk.Frame(self.control_frame, padding="10")
@@ -307,6 +350,15 @@ class GVMControlApp:
         ttk.Button(buttons_frame, text="Appliquer à tous", command=lambda: self.apply_power_all("execute")).pack(pady=5, ipadx=10, ipady=5)
         ttk.Button(buttons_frame, text="Reset la grille + clear sequences", command=lambda: self.reset_grille("execute")).pack(pady=5, ipadx=10, ipady=5)
         ttk.Button(buttons_frame, text="Charger profil", command=self.charger_profil).pack(pady=5, ipadx=10, ipady=5)
+        ttk.Label(buttons_frame, text="Protocole série :").pack(pady=(10, 0))
+        ttk.Combobox(buttons_frame, textvariable=self.protocol_var, values=PROTOCOLES,
+                     state='readonly', width=10).pack(pady=(0, 5))
+        ttk.Checkbutton(buttons_frame, text="Envoi différentiel", variable=self.delta_var).pack(pady=(0, 5))
+        ttk.Checkbutton(buttons_frame, text="Régulation RPM", variable=self.regulation_var).pack(pady=(0, 5))
+        ttk.Checkbutton(buttons_frame, text="Lecture en boucle", variable=self.loop_profile_var).pack(pady=(0, 5))
+        ttk.Label(buttons_frame, text="Période d'envoi (s) :").pack()
+        ttk.Spinbox(buttons_frame, textvariable=self.tick_period_var, from_=0.1, to=5.0,
+                    increment=0.1, width=6).pack(pady=(0, 5))
         self.send_button = ttk.Button(buttons_frame, text="Envoyer commande", command=self.start_serial_communication, state='normal')
         self.send_button.pack(pady=5, ipadx=10, ipady=5)
         self.stop_button = ttk.Button(buttons_frame, text="Arrêter l'envoi", command=self.stop_serial_communication, state='disabled')
@@ -357,6 +409,24 @@ class GVMControlApp:
         self.wind_max_var_execute = tk.StringVar(value=str(self.airflow_percentage[-1]))
         ttk.Entry(wind_frame, textvariable=self.wind_max_var_execute, state='readonly').pack(fill=tk.X)
 
+        # Résumé des défauts détectés pendant la lecture
+        self.sante_var = tk.StringVar(value="")
+        ttk.Label(buttons_frame, textvariable=self.sante_var, wraplength=200).pack(pady=(10, 0))
+
+        # Instrumentation : coupée par défaut, elle ne coûte alors qu'un test par point de mesure
+        perf_frame = ttk.LabelFrame(buttons_frame, text="Performances", padding=5)
+        perf_frame.pack(pady=(10, 0), fill=tk.X)
+        ttk.Checkbutton(perf_frame, text="Mesurer", variable=self.metriques_var,
+                        command=self.basculer_metriques).pack(anchor='w')
+        self.metriques_texte_var = tk.StringVar(value="")
+        ttk.Label(perf_frame, textvariable=self.metriques_texte_var, font='TkFixedFont',
+                  justify=tk.LEFT).pack(anchor='w')
+        export_frame = ttk.Frame(perf_frame)
+        export_frame.pack(fill=tk.X)
+        ttk.Button(export_frame, text="JSON…", command=lambda: self.exporter_metriques(".json")).pack(side=tk.LEFT)
+        ttk.Button(export_frame, text="Prometheus…",
+                   command=lambda: self.exporter_metriques(".prom")).pack(side=tk.LEFT)
+
     def on_slider_change(self, mode, value):
         val = round(int(float(value)) / 5) * 5  # ✅ Forcer le pas de 5
         val = max(0, min(100, val))  # S'assure que la valeur reste entre 0 et 100
@@ -414,6 +484,11 @@ class GVMControlApp:
         grid_frame = ttk.Frame(parent)
         grid_frame.pack(fill=tk.BOTH, expand=True)
         setattr(self, f'{mode}_grid_frame', grid_frame)
+        self.grid_renderer.oublier(mode)
+
+        if self.vue_grille == "canvas":
+            self.create_fan_canvas(grid_frame, mode)
+            return
 
         for i in range(self.grid_rows):
             grid_frame.rowconfigure(i, weight=1)
@@ -422,8 +497,7 @@ class GVMControlApp:
 
         for cell_row in range(1, self.grid_rows + 1):
             for cell_col in range(1, self.grid_cols + 1):
-                cell_id = f"{cell_row}{cell_col}"
-                self.rpm_data[cell_id] = [0] * 9
+                cell_id = cle_cellule(cell_row, cell_col)
                 cell_frame = ttk.LabelFrame(grid_frame, text=f"Cell {cell_id}", padding="5")
                 cell_frame.grid(row=cell_row - 1, column=cell_col - 1, padx=2, pady=2, sticky="nsew")
                 cell_frame.configure(width=150, height=150)  # ajuster la taille au besoin
@@ -447,36 +521,54 @@ class GVMControlApp:
                                 command=lambda cr=cell_row, cc=cell_col, fr=fan_row + 1, fc=fan_col + 1:
                                 self.select_fan(cr, cc, fr, fc, "execute")
                             )
-                            Tooltip(btn, lambda c=cell_id, idx=fan_idx: self.get_rpm_text(c, idx))
+                            self.tooltip.attacher(btn, cell_id, fan_idx)
 
                         btn.grid(row=fan_row, column=fan_col, padx=1, pady=1, sticky="nsew")
 
                         key = f"create_btn_{fan_idx}" if mode == "create" else f"execute_btn_{fan_idx}"
                         self.fan_status[cell_id][key] = btn
+                        self.grid_renderer.initialiser(mode, cell_id, fan_idx, text="0%")
+
+    def create_fan_canvas(self, parent, mode):
+        for cell_row in range(1, self.grid_rows + 1):
+            for cell_col in range(1, self.grid_cols + 1):
+                cell_id = cle_cellule(cell_row, cell_col)
+                for fan_idx in range(9):
+                    self.grid_renderer.initialiser(mode, cell_id, fan_idx, text="0%")
+
+        self.canvas_grids[mode] = CanvasFanGrid(
+            parent, self.grid_rows, self.grid_cols,
+            on_click=lambda cr, cc, fr, fc: self.select_fan(cr, cc, fr, fc, mode),
+            on_rectangle=lambda fans: self.select_fans(fans, mode),
+            tooltip=self.tooltip if mode == "execute" else None,
+        )
+
+    def obtenir_bouton(self, mode, cell_id, fan_idx):
+        grille = self.canvas_grids.get(mode)
+        if grille is not None:
+            return grille.ventilateur(cell_id, fan_idx)
+        return self.fan_status[cell_id].get(f"{mode}_btn_{fan_idx}")
 
     def get_rpm_text(self, cell_id, fan_idx):
         try:
-            btn_key = f"execute_btn_{fan_idx}"
-            btn = self.fan_status[cell_id].get(btn_key)
-            if not btn:
+            if not self.obtenir_bouton("execute", cell_id, fan_idx):
                 return "Aucun bouton trouvé", "#ffffe0"
 
-            # Lire le texte du bouton (ex: "75%")
-            text = btn.cget("text").replace('%', '').strip()
-            power = int(text) if text.isdigit() else 0
+            power = self.mur.puissance(cell_id, fan_idx, "lecture")
 
-            indice = self.obtenir_indice_depuis_pourcentage(power)
-            rpm_consigne = self.rpm_values[indice] if indice != -1 else 0
-            rpm_reel = self.rpm_data.get(cell_id, [0]*9)[fan_idx]
+            rpm_consigne = self.courbe.rpm_consigne(power)
+            rpm_reel = self.mur.rpm_cellule(cell_id)[fan_idx]
             ecart = rpm_reel - rpm_consigne
-            ecart_abs = abs(ecart)
+            row, col = self.mur.position(cell_id)
+            etat = int(self.sante.etat[row, col, fan_idx])
 
-            couleur = "#ccffcc" if ecart_abs <= 500 else "#ffcccc"
+            couleur = "#ffcccc" if etat in COULEURS_DEFAUTS else "#ccffcc"
 
             texte = (
                 f"RPM Consigne: {rpm_consigne}\n"
                     f"RPM Réel: {rpm_reel}\n"
-                    f"Écart: {ecart:+} tr/min")
+                    f"Écart: {ecart:+} tr/min\n"
+                    f"État: {NOMS_ETATS[etat]}")
 
             return texte, couleur
         except Exception as e:
@@ -485,34 +577,38 @@ class GVMControlApp:
 
     
     def select_fan(self, cell_row, cell_col, fan_row, fan_col,mode):
-        cell_id = f"{cell_row}{cell_col}"
+        cell_id = cle_cellule(cell_row, cell_col)
         fan_idx = (fan_row - 1) * 3 + (fan_col - 1)
         fan_key = (cell_id, fan_idx)
-        btn = self.fan_status[cell_id][f"create_btn_{fan_idx}" if mode == "create" else f"execute_btn_{fan_idx}"]
 
         if fan_key in self.selected_fans:
             self.selected_fans.remove(fan_key)
-            power = self.fan_status[cell_id]['power'][fan_idx]
-            rpm = self.fan_status[cell_id]['rpm'][fan_idx]
-            expected = power * 10
-            functional = abs(rpm - expected) <= 500
-            if power > 0:
-                btn.config(bg="green" if functional else "red", fg="white")
+            # Même règle que le reste de la grille : puissance, et état de santé en exécution
+            row, col = self.mur.position(cell_id)
+            if mode == "execute":
+                style = self.style_execution(row, col, fan_idx)
             else:
-                btn.config(bg="lightgrey", fg="black")
+                style = GridRenderer.style_puissance(self.mur.puissance(cell_id, fan_idx))
+            self.grid_renderer.demander(mode, cell_id, fan_idx, bg=style["bg"], fg=style["fg"])
         else:
             self.selected_fans.add(fan_key)
-            btn.config(bg="blue", fg="white")
+            self.grid_renderer.demander(mode, cell_id, fan_idx, bg="blue", fg="white")
+
+    def select_fans(self, fans, mode):
+        """Sélection par rectangle : ajoute les ventilateurs pas encore sélectionnés."""
+        for cell_row, cell_col, fan_row, fan_col in fans:
+            fan_key = (cle_cellule(cell_row, cell_col), (fan_row - 1) * 3 + (fan_col - 1))
+            if fan_key not in self.selected_fans:
+                self.select_fan(cell_row, cell_col, fan_row, fan_col, mode)
 
     def apply_power_selected(self, mode):
         if not self.selected_fans:
             return
         power = self.power_var_create.get() if mode =="create" else self.power_var_execute.get()
-        for cell_id, fan_idx in self.selected_fans:
-            self.fan_status[cell_id]['power'][fan_idx] = power
-            btn = self.fan_status[cell_id][f"create_btn_{fan_idx}" if mode == "create" else f"execute_btn_{fan_idx}"]
-            btn.config(text=f"{power}%", bg="green" if power > 0 else "lightgrey",
-                       fg="white" if power > 0 else "black")
+        masque = self.mur.masque(self.selected_fans)
+        for couche in self.couches(mode):
+            self.mur.set_mask(masque, power, couche)
+        self.afficher_puissances(mode, masque)
         self.selected_fans.clear()
         self.mark_as_modified()
         self.stop_serial_communication()
@@ -520,12 +616,9 @@ class GVMControlApp:
     def apply_power_all(self, mode):
         power = self.power_var_create.get() if mode =="create" else self.power_var_execute.get()
         self.selected_fans.clear()
-        for cell_id in self.fan_status:
-            for fan_idx in range(9):
-                self.fan_status[cell_id]['power'][fan_idx] = power
-                btn = self.fan_status[cell_id][f"create_btn_{fan_idx}" if mode == "create" else f"execute_btn_{fan_idx}"]
-                btn.config(text=f"{power}%", bg="green" if power > 0 else "lightgrey",
-                           fg="white" if power > 0 else "black")
+        for couche in self.couches(mode):
+            self.mur.set_all(power, couche)
+        self.afficher_puissances(mode)
         self.mark_as_modified()
         self.stop_serial_communication()
 
@@ -538,14 +631,9 @@ class GVMControlApp:
             self.sequences.clear()
             self.actualiser_sequence_buttons()
 
-        for cell_id, data in self.fan_status.items():
-            data['power'] = [0] * 9  # Remet les puissances à 0
-
-            for i in range(9):
-                btn_key = f"create_btn_{i}" if mode == "create" else f"execute_btn_{i}"
-                if btn_key in data:
-                    btn = data[btn_key]
-                    btn.config(text="0%", bg="lightgrey", fg="black")  # Réinitialise le texte et la couleur
+        for couche in self.couches(mode):
+            self.mur.set_all(0, couche)  # Remet les puissances à 0
+        self.afficher_puissances(mode)  # Réinitialise le texte et la couleur
 
     def create_sequence(self):
         # Demande la durée (en secondes) via une fenêtre modale
@@ -563,19 +651,18 @@ class GVMControlApp:
             i += 1
             name = f"{base_name}_{i}"
 
-        snapshot = {cell_id: self.fan_status[cell_id]['power'][:] for cell_id in self.fan_status}
+        snapshot = self.mur.en_dict()
         self.sequences[name] = {'powers': snapshot, 'duration': duration}
+        self.compiler_sequence(name)
         self.add_sequence_button(name)
         self.reset_grid()
         self.mark_as_modified()
         self.stop_serial_communication()
 
     def reset_grid(self):
-        for cell_id in self.fan_status:
-            for fan_idx in range(9):
-                self.fan_status[cell_id]['power'][fan_idx] = 0
-                btn = self.fan_status[cell_id][f"create_btn_{fan_idx}" if self.current_mode == "create" else f"execute_btn_{fan_idx}"]
-                btn.config(text="0%", bg="lightgrey", fg="black")
+        for couche in self.couches(self.current_mode):
+            self.mur.set_all(0, couche)
+        self.afficher_puissances(self.current_mode)
 
     def add_sequence_button(self, name):
         frame = ttk.Frame(self.sequence_buttons_frame)
@@ -625,6 +712,8 @@ class GVMControlApp:
 
             # Renommer dans le dictionnaire
             self.sequences[new_name] = self.sequences.pop(old_name)
+            if old_name in self.engine.compilees:
+                self.engine.compilees[new_name] = self.engine.compilees.pop(old_name)
 
             # Met à jour l'interface
             for frame, name in self.sequence_buttons:
@@ -650,6 +739,7 @@ class GVMControlApp:
         if messagebox.askyesno("Confirmer la suppression", f"Supprimer la séquence '{name}' ?"):
             if name in self.sequences:
                 del self.sequences[name]
+                self.engine.compilees.pop(name, None)
                 self.mark_as_modified()
                 self.stop_serial_communication()
             frame.destroy()
@@ -657,24 +747,25 @@ class GVMControlApp:
 
     def save_current_grid_to_sequence(self, name):
         if name in self.sequences:
-            new_snapshot = {
-                cell_id: self.fan_status[cell_id]['power'][:] for cell_id in self.fan_status
-            }
+            new_snapshot = self.mur.en_dict()
             self.sequences[name]['powers'] = new_snapshot
+            self.compiler_sequence(name)
             messagebox.showinfo("Modifications enregistrées", f"La séquence '{name}' a été mise à jour.")
             self.mark_as_modified()
             self.stop_serial_communication()
 
+    def compiler_sequence(self, name, protocole=None):
+        """Compile (ou reprend du cache du moteur) les trames série d'une séquence."""
+        seq = self.sequences.get(name)
+        if seq is None:
+            self.engine.compilees.pop(name, None)
+            return None
+        return self.engine.compiler_sequence(name, seq, protocole or self.protocol_var.get())
+
     def load_sequence(self, name):
         if name in self.sequences:
-            snapshot = self.sequences[name]['powers']
-            for cell_id in self.fan_status:
-                for i in range(9):
-                    self.fan_status[cell_id]['power'][i] = snapshot[cell_id][i]
-                    btn = self.fan_status[cell_id][f"create_btn_{i}"]
-                    power = snapshot[cell_id][i]
-                    btn.config(text=f"{power}%", bg="green" if power > 0 else "lightgrey",
-                               fg="white" if power > 0 else "black")
+            self.mur.depuis_dict(self.sequences[name]['powers'])
+            self.afficher_puissances("create")
             self.selected_fans.clear()
 
     def sauvegarder_profil(self):
@@ -689,25 +780,7 @@ class GVMControlApp:
         chemin_fichier = os.path.join(dossier, f"{profil_nom}.json")
 
         try:
-            if self.sequences:
-                data = {
-                    "type": "dynamique",
-                    "sequences": self.sequences,
-                }
-
-            else:
-                # Profil Statique
-                grid_snapshot = {
-                    cell_id: self.fan_status[cell_id]['power'][:] for cell_id in self.fan_status
-                }
-                data = {
-                    "type": "statique",
-                    "grid": grid_snapshot
-                }
-
-            with open(chemin_fichier, "w") as f:
-                json.dump(data, f, indent=2)
-
+            self.profil_courant().sauvegarder(chemin_fichier)
             messagebox.showinfo("Succès", f"Profil enregistré : {chemin_fichier}")
         except Exception as e:
             messagebox.showerror("Erreur", f"Échec de l'enregistrement : {e}")
@@ -718,43 +791,38 @@ class GVMControlApp:
             return
 
         try:
-            with open(filepath, "r") as f:
-                data = json.load(f)
-            
-            profil_type = data.get("type")
+            profil = Profile.charger(filepath)
 
             self.reset_grille(self.current_mode)
+            self.protocol_var.set(profil.protocole)
 
-            if profil_type == "dynamique":
-                self.sequences = data.get("sequences", {})
+            if profil.dynamique:
+                self.sequences = profil.sequences
+                self.engine.compilees.clear()
+                for name in self.sequences:
+                    self.compiler_sequence(name)
                 self.actualiser_sequence_buttons()
                 messagebox.showinfo("Chargé", "Profil dynamique chargé avec succès.")
-                self.profile_name = os.path.splitext(os.path.basename(filepath))[0]
-                self.is_modified = False
-                self.update_profile_label()
-            elif profil_type == "statique":
+            else:
                 self.sequences.clear()
                 self.actualiser_sequence_buttons()
-                grid_data = data.get("grid", {})
-                for cell_id in self.fan_status:
-                    if cell_id in grid_data:
-                        for i in range(9):
-                            power = grid_data[cell_id][i]
-                            self.fan_status[cell_id]['power'][i] = power
-                            btn = self.fan_status[cell_id].get(f"create_btn_{i}" if self.current_mode == "create" else f"execute_btn_{i}")
-                            if btn:
-                                btn.config(text=f"{power}%", bg="green" if power > 0 else "lightgrey",
-                                        fg="white" if power > 0 else "black")
+                for couche in self.couches(self.current_mode):
+                    self.mur.depuis_dict(profil.grid, couche)
+                self.afficher_puissances(self.current_mode)
                 self.selected_fans.clear()
                 messagebox.showinfo("Chargé", "Profil statique chargé avec succès.")
-                self.profile_name = os.path.splitext(os.path.basename(filepath))[0]
-                self.is_modified = False
-                self.update_profile_label()
-            else:
-                raise ValueError("Type de profil inconnu.")
+            self.profile_name = os.path.splitext(os.path.basename(filepath))[0]
+            self.is_modified = False
+            self.update_profile_label()
         except Exception as e:
             messagebox.showerror("Erreur", f"Échec du chargement du profil : {e}")
 
+    def profil_courant(self):
+        """Profil édité : les séquences s'il y en a, sinon la grille statique."""
+        if self.sequences:
+            return Profile(sequences=self.sequences, protocole=self.protocol_var.get())
+        return Profile(grid=self.mur.en_dict(), protocole=self.protocol_var.get())
+
     def mark_as_modified(self):
         if not self.is_modified:
             self.is_modified = True
@@ -772,17 +840,23 @@ class GVMControlApp:
             self.add_sequence_button(name)
 
     def start_serial_communication(self):
-        self.serial_log_window = tk.Toplevel(self.root)
-        self.serial_log_window.title("Envoi des chaînes JSON")
-        self.serial_log_text = tk.Text(self.serial_log_window, height=20, width=80, state='disabled')
-        self.serial_log_text.pack(padx=10, pady=10)
+        try:
+            periode = float(self.tick_period_var.get().replace(',', '.'))
+            if periode <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Entrée invalide", "La période d'envoi doit être un nombre positif (en secondes).")
+            return
 
-        self.serial_active = True
-        self.serial_queue = queue.Queue()
+        self.ouvrir_fenetre_journal()
+        self.journal_serie.vider()
+        self.debit_envoi.reinitialiser()
+        self.appliquer_detail_trames()
+        self.engine.regulateur = FanRegulator(self.courbe) if self.regulation_var.get() else None
 
-        # Lance le thread d'envoi série
-        self.serial_thread = threading.Thread(target=self.serial_send_loop, daemon=True)
-        self.serial_thread.start()
+        # Lance la lecture (réglages figés pour toute la lecture)
+        self.engine.demarrer(self.profil_courant(), periode,
+                             boucle=self.loop_profile_var.get(), delta=self.delta_var.get())
 
         # Rafraîchit l'affichage des logs
         self.update_serial_log_display()
@@ -790,173 +864,178 @@ class GVMControlApp:
         self.stop_button.config(state='normal')
         self.send_button.config(state='disabled')
 
-    def serial_send_loop(self):
-        try:
-            self.ser = serial.Serial('/dev/serial0', 9600, timeout=1)
-        except Exception as e:
-            self.serial_queue.put(f"Erreur ouverture port série: {e}")
-            return
-
-        if self.sequences:
-            try:
-                self.serial_queue.put("🚀 Démarrage de l'envoi cyclique des séquences.")
-                for seq_name in self.sequences:
-                    if not self.serial_active:
-                        break
-
-                    seq = self.sequences[seq_name]
-                    powers = seq['powers']
-                    duration = seq['duration']
-                    self.serial_queue.put(f"⏱ Envoi de la séquence '{seq_name}' pendant {duration} secondes")
-
-                    cell_ids = sorted(powers.keys())
-                    seq_start = time.time()
-                    seq_end = seq_start + duration
-
-                    while time.time() < seq_end and self.serial_active:
-                        loop_start = time.time()
-                        for publish_cell in cell_ids:
-                            if not self.serial_active:
-                                break
-
-                            json_message = {
-                                cell_id: [self.obtenir_indice_depuis_pourcentage(p) for p in powers[cell_id]]
-                                for cell_id in cell_ids
-                            }
-                            json_message["Publish"] = int(publish_cell)
-                            try:
-                                msg = json.dumps(json_message)
-                                self.ser.write((msg + '\n').encode('utf-8'))
-                                self.serial_queue.put(f"Envoyé → {msg}")
-                            except Exception as e:
-                                self.serial_queue.put(f"Erreur d'envoi: {e}")
-                        time.sleep(max(0, 1.0 - (time.time() - loop_start)))
-                        self.root.after(0, self.update_grid_with_powers, powers)
-                if not self.serial_active:
-                    return  # 🛑 l'utilisateur a arrêté l'envoi
-
-                # Si l'utilisateur n'a pas arrêté manuellement
-                if self.serial_active:
-                    self.serial_active = False
-                    self.serial_queue.put("✅ Profil dynamique terminé.")
-                    
-                    # Arrêt propre du port série
-                    if self.ser and self.ser.is_open:
-                        try:
-                            self.ser.close()
-                            self.serial_queue.put("🔌 Port série fermé.")
-                        except Exception as e:
-                            self.serial_queue.put(f"Erreur fermeture série : {e}")
-                    
-                    # Réactive les boutons
-                    self.root.after(0, lambda: self.stop_button.config(state='disabled'))
-                    self.root.after(0, lambda: self.send_button.config(state='normal'))
-
-            except Exception as e:
-                self.serial_queue.put(f"Erreur lors de l'exécution des séquences: {e}")
-       
-        else:
-            # 🔁 Envoi continu du profil statique
-            try:
-                powers = {cell_id: self.fan_status[cell_id]['power'][:] for cell_id in self.fan_status}
-                cell_ids = sorted(powers.keys())
-
-                self.serial_queue.put("📤 Envoi du profil statique : 1 JSON par cellule réparti sur 1 seconde.")
-
-                while self.serial_active:
-                    loop_start = time.time()
-
-                    for publish_cell in cell_ids:
-                        if not self.serial_active:
-                            break
-
-                        json_message = {
-                            cell_id: [self.obtenir_indice_depuis_pourcentage(p) for p in powers[cell_id]]
-                            for cell_id in cell_ids
-                        }
-
-                        json_message["Publish"] = int(publish_cell)
-
-                        try:
-                            msg = json.dumps(json_message)
-                            self.ser.write((msg + '\n').encode('utf-8'))
-                            self.serial_queue.put(f"Envoyé (statique) → {msg}")
-                        except Exception as e:
-                            self.serial_queue.put(f"Erreur d'envoi (statique): {e}")
-                    time.sleep(max(0, 1.0 - (time.time() - loop_start)))
-
-                self.serial_queue.put("🛑 Envoi statique arrêté par l'utilisateur.")
-            except Exception as e:
-                self.serial_queue.put(f"Erreur lors de l'envoi du profil statique: {e}")
+    def fin_envoi(self):
+        # Profil dynamique terminé : réactive les boutons
+        self.stop_button.config(state='disabled')
+        self.send_button.config(state='normal')
+        self.reinitialiser_sante()
 
     def stop_serial_communication(self):
-        self.serial_active = False  # 🛑 Met tout de suite l'arrêt
-        self.serial_queue = queue.Queue()
-
         self.stop_button.config(state='disabled')
         self.send_button.config(state='normal')
 
-        if self.ser and self.ser.is_open:
-            try:
-                cell_ids = sorted(self.fan_status.keys())
-                for publish_cell in cell_ids:
-                    json_message = {
-                        cid: [-1] * 9 for cid in cell_ids
-                    }
-                    json_message["Publish"] = int(publish_cell)
-                    msg = json.dumps(json_message)
-                    self.ser.write((msg + '\n').encode('utf-8'))
-                    self.serial_queue.put(f"🛑 Arrêt → {msg}")
-                self.ser.close()
-                self.serial_queue.put("Port série fermé.")
-            except Exception as e:
-                self.serial_queue.put(f"Erreur lors de l'arrêt série : {e}")
-        else:
-            self.serial_queue.put("Aucun port série actif à fermer.")
+        # Arrêt immédiat de la lecture puis trames à -1 si un envoi était en cours
+        self.engine.arreter()
+        self.reinitialiser_sante()
 
         # 🔒 Ferme la fenêtre de log si elle existe
         # if hasattr(self, 'serial_log_window') and self.serial_log_window.winfo_exists():
         #     self.serial_log_window.destroy()
 
 
-    def update_serial_log_display(self):
+    LIGNES_JOURNAL_MAX = 1000  # lignes gardées dans la fenêtre de journal
+
+    def ouvrir_fenetre_journal(self):
+        """Fenêtre de journal unique, réutilisée d'une lecture à l'autre."""
+        if hasattr(self, 'serial_log_window') and self.serial_log_window.winfo_exists():
+            self.serial_log_window.deiconify()
+            self.serial_log_window.lift()
+            return
+        self.serial_log_window = tk.Toplevel(self.root)
+        self.serial_log_window.title("Envoi des chaînes JSON")
+        self.serial_log_text = tk.Text(self.serial_log_window, height=20, width=80, state='disabled')
+        self.serial_log_text.pack(padx=10, pady=10)
+        self.serial_rate_var = tk.StringVar(value="")
+        ttk.Label(self.serial_log_window, textvariable=self.serial_rate_var).pack(padx=10, anchor='w')
+        self.serial_stats_var = tk.StringVar(value="")
+        ttk.Label(self.serial_log_window, textvariable=self.serial_stats_var).pack(padx=10, pady=(0, 5), anchor='w')
+
+        options = ttk.Frame(self.serial_log_window)
+        options.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Checkbutton(options, text="Détail de chaque trame", variable=self.detail_trames_var,
+                        command=self.appliquer_detail_trames).pack(side=tk.LEFT)
+        self.journal_fichier_button = ttk.Button(options, text="Journal fichier…",
+                                                 command=self.basculer_journal_fichier)
+        self.journal_fichier_button.pack(side=tk.RIGHT)
+
+    INTERVALLE_SONDE_TK = 0.1     # s entre deux mesures du retard de la boucle Tk
+    INTERVALLE_PANNEAU = 1.0      # s entre deux mises à jour du panneau de performances
+
+    def basculer_metriques(self):
+        METRIQUES.activer(self.metriques_var.get())
+        if METRIQUES.actif and self.sonde_metriques is None:
+            self.sonder_boucle_tk(None)
+
+    def sonder_boucle_tk(self, prevu):
+        """
+        Un rappel after() qui arrive en retard mesure le temps pendant lequel la boucle Tk
+        n'a pas pu traiter d'événement. Met aussi le panneau à jour.
+        """
+        if not METRIQUES.actif:
+            self.sonde_metriques = None
+            return
+        maintenant = time.monotonic()
+        if prevu is not None:
+            METRIQUES.observer("tk_retard", max(0.0, maintenant - prevu))
+        if maintenant - self.dernier_panneau >= self.INTERVALLE_PANNEAU:
+            self.dernier_panneau = maintenant
+            self.metriques_texte_var.set(METRIQUES.resume())
+        self.sonde_metriques = self.root.after(int(self.INTERVALLE_SONDE_TK * 1000), self.sonder_boucle_tk,
+                                               maintenant + self.INTERVALLE_SONDE_TK)
+
+    def exporter_metriques(self, extension):
+        types = [("Prometheus", "*.prom")] if extension == ".prom" else [("JSON", "*.json")]
+        chemin = filedialog.asksaveasfilename(title="Exporter les mesures de performance",
+                                              defaultextension=extension, filetypes=types)
+        if not chemin:
+            return
         try:
-            while not self.serial_queue.empty():
-                line = self.serial_queue.get_nowait()
-                self.serial_log_text.configure(state='normal')
-                self.serial_log_text.insert(tk.END, line + "\n")
-                self.serial_log_text.configure(state='disabled')
-                self.serial_log_text.see(tk.END)
-        except queue.Empty:
-            pass
-        if self.serial_active:
-            self.root.after(100, self.update_serial_log_display)
+            METRIQUES.exporter(chemin)
+        except OSError as e:
+            messagebox.showerror("Erreur", f"Impossible d'exporter les mesures : {e}")
+
+    def appliquer_detail_trames(self):
+        # Les lignes par trame ne sont construites que si la fenêtre ou un fichier les attend
+        self.journal_serie.afficher_trames = self.detail_trames_var.get()
+        self.engine.journal_trames = self.journal_serie.trames_demandees
+
+    def basculer_journal_fichier(self):
+        if self.journal_serie.fichier_actif:
+            self.journal_serie.fermer_fichier()
+            self.journal_fichier_button.config(text="Journal fichier…")
         else:
-            if hasattr(self, 'serial_log_text'):
-                self.serial_log_text.configure(state='normal')
-                self.serial_log_text.insert(tk.END, "\n🛑 Affichage des logs arrêté.\n")
-                self.serial_log_text.configure(state='disabled')
-                self.serial_log_text.see(tk.END)
-
-    def update_rpm_data(self):
-        while True:
-            rpm_values = self.rpm_receiver.get_all_rpms()
-            # Utiliser `after` pour mettre à jour l'UI dans le thread principal
-            self.root.after(0, self.update_rpm_display, rpm_values)
-            time.sleep(0.1)
+            chemin = filedialog.asksaveasfilename(title="Journal complet (rotation automatique)",
+                                                  defaultextension=".log", filetypes=[("Journal", "*.log")])
+            if not chemin:
+                return
+            try:
+                self.journal_serie.ouvrir_fichier(chemin)
+            except OSError as e:
+                messagebox.showerror("Erreur", f"Impossible d'ouvrir le journal : {e}")
+                return
+            self.journal_fichier_button.config(text=f"Arrêter le journal ({os.path.basename(chemin)})")
+        self.appliquer_detail_trames()
 
-    def update_rpm_display(self, rpm_values):
-        for cell_id, rpms in rpm_values.items():
-            self.rpm_data[cell_id] = rpms  # met à jour les données utilisées par les tooltips
+    def update_serial_log_display(self):
+        # Sans télémétrie, aucun lot ne déclenche l'évaluation : les cellules muettes sont vues ici
+        if self.engine.actif and time.monotonic() - self.derniere_sante >= 1.0:
+            self.derniere_sante = time.monotonic()
+            self.actualiser_sante()
+        # Fenêtre fermée : le tampon reste borné, rien à afficher
+        if self.serial_log_window.winfo_exists():
+            if self.engine.scheduler:
+                self.serial_rate_var.set(self.debit_envoi.mesurer(*self.engine.compteurs()))
+                self.serial_stats_var.set(self.engine.resume())
+
+            lignes = self.journal_serie.extraire()
+            if not self.engine.actif:
+                lignes.append("\n🛑 Affichage des logs arrêté.")
+            if lignes:
+                self.ajouter_lignes_journal(lignes)
+
+        if self.engine.actif:
+            self.root.after(100, self.update_serial_log_display)
+
+    def ajouter_lignes_journal(self, lignes):
+        # Un seul insert par rafraîchissement, puis les plus anciennes lignes sont retirées
+        texte = self.serial_log_text
+        texte.configure(state='normal')
+        texte.insert(tk.END, "\n".join(lignes) + "\n")
+        excedent = int(texte.index('end-1c').split('.')[0]) - 1 - self.LIGNES_JOURNAL_MAX
+        if excedent > 0:
+            texte.delete('1.0', f'{excedent + 1}.0')
+        texte.configure(state='disabled')
+        texte.see(tk.END)
+
+    INTERVALLE_RAFRAICHISSEMENT = 0.1  # au plus un rafraîchissement télémétrie par intervalle (s)
+
+    def signaler_telemetrie(self):
+        """Appelé depuis la boucle d'entrées/sorties quand de nouvelles mesures attendent."""
+        if not self.telemetrie_en_attente:
+            self.bridge.appeler(self.planifier_telemetrie)
+
+    def planifier_telemetrie(self):
+        # Thread Tk : un seul passage planifié, au plus un par intervalle
+        if self.telemetrie_en_attente:
+            return
+        self.telemetrie_en_attente = True
+        attente = self.dernier_rafraichissement + self.INTERVALLE_RAFRAICHISSEMENT - time.monotonic()
+        self.root.after(max(0, int(attente * 1000)), self.appliquer_telemetrie)
+
+    def appliquer_telemetrie(self):
+        # Remis à False avant la collecte : un lot arrivant pendant la collecte replanifie un passage
+        self.telemetrie_en_attente = False
+        if not self.interface_prete:
+            # Lot reçu pendant la construction de l'interface (boîte de dialogue modale) : plus tard
+            self.planifier_telemetrie()
+            return
+        self.dernier_rafraichissement = time.monotonic()
+        _, rpm_values = self.bus.collecter_modifications()
+        if rpm_values:
+            self.update_rpm_display(rpm_values)
 
-        # 💡 Mise à jour visuelle immédiate des couleurs
-        #
-        # self.actualiser_couleurs_ventilateurs()
+    @METRIQUES.chronometre("tk_telemetrie")
+    def update_rpm_display(self, rpm_values):
+        # rpm_values ne contient que les cellules dont la télémétrie a changé
+        self.mur.enregistrer_telemetrie(rpm_values)  # données lues par les tooltips
+        self.tooltip.rafraichir(rpm_values)
+        if self.engine.actif:
+            self.actualiser_sante()
 
 
     def get_rpm_text_consigne(self, cell_id, fan_idx):
         try:
-            rpm_values = self.rpm_data.get(cell_id, [])
+            rpm_values = self.mur.rpm_cellule(cell_id)
             if 0 <= fan_idx < len(rpm_values):
                 return f"RPM consigne: {rpm_values[fan_idx]}"
             else:
@@ -968,8 +1047,7 @@ class GVMControlApp:
         try:
             if pourcentage % 5 != 0:
                 pourcentage = round(pourcentage / 5) * 5
-            index = pourcentage // 5
-            airflow = self.airflow_percentage[index]
+            airflow = self.courbe.debit(pourcentage)
             
             if self.current_mode == "create":
                 self.wind_requested_var_create.set(str(round(airflow, 2)))
@@ -980,194 +1058,379 @@ class GVMControlApp:
         except Exception:
             self.wind_requested_var.set("Erreur")
 
+    @METRIQUES.chronometre("tk_sequence")
     def update_grid_with_powers(self, powers):
-        for cell_id in powers:
-            for i in range(9):
-                power = powers[cell_id][i]
-                btn_key = f"execute_btn_{i}"
-                if btn_key in self.fan_status[cell_id]:
-                    btn = self.fan_status[cell_id][btn_key]
-                    btn.config(text=f"{power}%",  # ⚠️ car l'indice PWM est entre 0 et 20
-                            bg="green" if power > 0 else "lightgrey",
-                            fg="white" if power > 0 else "black")
-
-    def actualiser_couleurs_ventilateurs(self):
-        for cell_id in self.fan_status:
-            for fan_idx in range(9):
-                btn_key = f"execute_btn_{fan_idx}"
-                btn = self.fan_status[cell_id].get(btn_key)
-                if not btn:
-                    continue
-
-                # Ne pas modifier les ventilateurs sélectionnés (couleur bleue)
-                if (cell_id, fan_idx) in self.selected_fans:
-                    continue
-
-                # Lire le pourcentage directement depuis le texte du bouton
-                try:
-                    text = btn.cget("text").replace('%', '').strip()
-                    power = int(text) if text.isdigit() else 0
-                except:
-                    power = 0
-
-                # S'il est éteint
-                if power == 0:
-                    btn.config(bg="lightgrey", fg="black")
-                    continue
-
-                # Calcul du RPM consigne
-                try:
-                    indice = self.obtenir_indice_depuis_pourcentage(power)
-                    rpm_consigne = self.rpm_values[indice] if indice != -1 else 0
-                except:
-                    rpm_consigne = 0
-
-                # RPM réel
-                rpm_reel = self.rpm_data.get(cell_id, [0]*9)[fan_idx]
-                ecart = abs(rpm_reel - rpm_consigne)
-
-                # Appliquer la couleur selon l'écart
-                if ecart <= 500:
-                    btn.config(bg="green", fg="white")
-                else:
-                    btn.config(bg="red", fg="white")
-
-
-class RPMReceiver:
-    def __init__(self, port='/dev/serial0', baudrate=9600):
-        self.port = port
-        self.baudrate = baudrate
-        self.serial_conn = None
-        self.running = False
-        self.data = {}  # {cell_id: [rpm1, rpm2, ..., rpm9]}
+        # Appelée à chaque changement de séquence : seuls les ventilateurs modifiés sont redessinés
+        self.afficher_puissances("execute", self.mur.depuis_dict(powers, "lecture"))
+        self.tooltip.rafraichir(powers)
+
+    @METRIQUES.chronometre("tk_sante")
+    def actualiser_sante(self):
+        """Évalue tout le mur puis ne redessine et ne journalise que les ventilateurs qui changent d'état."""
+        changes = self.sante.evaluer()
+        if not changes.any():
+            return
+        for defaut in self.sante.defauts(changes):
+            self.journal_serie.ecrire(f"⚠ Cellule {defaut.cell_id} V{defaut.fan_idx + 1} : {defaut.etat} "
+                                      f"({defaut.rpm} tr/min pour {defaut.rpm_attendu} attendus)")
+        self.actualiser_couleurs_ventilateurs(changes)
+        self.sante_var.set(self.sante.resume())
+
+    def actualiser_couleurs_ventilateurs(self, masque=None):
+        # Ne pas modifier les ventilateurs sélectionnés (couleur bleue)
+        if masque is None:
+            masque = np.ones(self.mur.lecture.shape, dtype=bool)
+        if self.selected_fans:
+            masque = masque & ~self.mur.masque(self.selected_fans)
+        self.afficher_puissances("execute", masque)
+
+    def reinitialiser_sante(self):
+        # Lecture arrêtée : plus de consigne à surveiller
+        self.sante.reinitialiser()
+        self.sante_var.set("")
+        self.actualiser_couleurs_ventilateurs()
+
+
+class TkBridge:
+    """
+    Pont thread-safe vers la boucle Tk. Tk n'est sûr que depuis son propre thread :
+    les autres threads (boucle asyncio, lecture) déposent leurs appels dans une file,
+    vidée en un seul passage after_idle quel que soit le nombre d'appels en attente.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.appels = deque()
         self.lock = threading.Lock()
+        self._planifie = False
 
-    def start(self):
+    def appeler(self, fn, *args):
+        """Exécute `fn(*args)` dans le thread Tk ; utilisable depuis n'importe quel thread."""
+        with self.lock:
+            self.appels.append((fn, args))
+            if self._planifie:
+                return
+            self._planifie = True
         try:
-            self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=1)
-            self.running = True
-            self.thread = threading.Thread(target=self.listen_loop, daemon=True)
-            self.thread.start()
-            print(f"[INFO] Lecture série démarrée sur {self.port} à {self.baudrate} bauds.")
-        except Exception as e:
-            print(f"[ERREUR] Impossible d’ouvrir le port série : {e}")
+            self.root.after_idle(self._vider)
+        except (RuntimeError, tk.TclError):
+            pass  # fenêtre détruite : plus rien à afficher
 
-    def stop(self):
-        self.running = False
-        if self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.close()
-            print("[INFO] Connexion série fermée.")
+    def _vider(self):
+        with self.lock:
+            appels, self.appels = self.appels, deque()
+            self._planifie = False
+        for fn, args in appels:
+            fn(*args)
 
-    def listen_loop(self):
-        while self.running:
-            try:
-                line = self.serial_conn.readline().decode('utf-8').strip()
-                if line:
-                    self.handle_message(line)
-            except Exception as e:
-                print(f"[ERREUR] Problème de lecture : {e}")
-            time.sleep(0.05)
-
-    def handle_message(self, message):
-        try:
-            data = json.loads(message)
-            cell_id = str(data.get("cell"))  # ⚠️ conversion en string
-            rpm_values = data.get("RPM")
 
-            if isinstance(rpm_values, list) and len(rpm_values) == 9:
-                with self.lock:
-                    self.data[cell_id] = rpm_values
-        except json.JSONDecodeError:
-            print(f"[AVERTISSEMENT] JSON invalide : {message}")
+class GridRenderer:
+    """
+    Couche de rendu de la grille de ventilateurs.
+    Mémorise l'état affiché de chaque ventilateur et ne reconfigure un widget que si son
+    texte ou sa couleur change réellement. Les demandes sont regroupées et appliquées
+    dans un seul rappel after_idle.
+    """
 
-    def get_rpm_for_cell(self, cell_id):
-        with self.lock:
-            return self.data.get(cell_id, None)
+    def __init__(self, root, obtenir_widget):
+        self.root = root
+        self.obtenir_widget = obtenir_widget  # (mode, cell_id, fan_idx) -> widget ou None
+        self.affiche = {}      # {(mode, cell_id, fan_idx): {option: valeur}} état réellement affiché
+        self.en_attente = {}   # demandes pas encore appliquées, fusionnées par ventilateur
+        self._planifie = None
+        self.configurations = 0  # nombre d'appels widget.config() émis
+
+    @staticmethod
+    def style_puissance(power):
+        return {
+            "text": f"{power}%",
+            "bg": "green" if power > 0 else "lightgrey",
+            "fg": "white" if power > 0 else "black",
+        }
+
+    def initialiser(self, mode, cell_id, fan_idx, **options):
+        """Déclare l'état d'un widget tout juste créé."""
+        self.affiche[(mode, cell_id, fan_idx)] = dict(options)
+
+    def oublier(self, mode):
+        """Les widgets de ce mode ont été recréés : l'état mémorisé n'est plus valable."""
+        for cle in [cle for cle in self.affiche if cle[0] == mode]:
+            del self.affiche[cle]
+        for cle in [cle for cle in self.en_attente if cle[0] == mode]:
+            del self.en_attente[cle]
+
+    def etat(self, mode, cell_id, fan_idx):
+        """État affiché, en tenant compte des demandes pas encore appliquées."""
+        cle = (mode, cell_id, fan_idx)
+        etat = dict(self.affiche.get(cle, {}))
+        etat.update(self.en_attente.get(cle, {}))
+        return etat
+
+    def demander(self, mode, cell_id, fan_idx, **options):
+        self.en_attente.setdefault((mode, cell_id, fan_idx), {}).update(options)
+        if self._planifie is None:
+            self._planifie = self.root.after_idle(self.appliquer)
+
+    def demander_puissance(self, mode, cell_id, fan_idx, power):
+        self.demander(mode, cell_id, fan_idx, **self.style_puissance(power))
+
+    @METRIQUES.chronometre("tk_grille")
+    def appliquer(self):
+        """Applique en une passe toutes les demandes en attente qui changent l'affichage."""
+        self._planifie = None
+        en_attente, self.en_attente = self.en_attente, {}
+        for cle, options in en_attente.items():
+            affiche = self.affiche.setdefault(cle, {})
+            changements = {k: v for k, v in options.items() if affiche.get(k) != v}
+            if not changements:
+                continue
+            widget = self.obtenir_widget(*cle)
+            if widget is None:
+                continue
+            widget.config(**changements)
+            affiche.update(changements)
+            self.configurations += 1
+
+
+class _VentilateurCanvas:
+    """Ventilateur dessiné sur un Canvas, configurable comme un bouton (text, bg, fg)."""
+    __slots__ = ("canvas", "rect", "texte")
+
+    def __init__(self, canvas, rect, texte):
+        self.canvas = canvas
+        self.rect = rect
+        self.texte = texte
+
+    def config(self, **options):
+        if "bg" in options:
+            self.canvas.itemconfigure(self.rect, fill=options["bg"])
+        texte = {}
+        if "text" in options:
+            texte["text"] = options["text"]
+        if "fg" in options:
+            texte["fill"] = options["fg"]
+        if texte:
+            self.canvas.itemconfigure(self.texte, **texte)
+
+
+class CanvasFanGrid:
+    """
+    Vue alternative de la grille : toutes les cellules et tous les ventilateurs sont dessinés
+    sur un seul Canvas au lieu d'un LabelFrame et de 9 tk.Button par cellule.
+    Le clic est résolu par calcul de position, un glisser trace un rectangle de sélection,
+    et l'infobulle est celle, unique, du TooltipManager de l'application.
+    """
+
+    ENTETE = 16         # hauteur du titre de cellule (px)
+    MARGE = 3
+    SEUIL_GLISSER = 5   # déplacement (px) à partir duquel un clic devient un rectangle
+
+    def __init__(self, parent, rows, cols, on_click, on_rectangle, tooltip=None):
+        self.rows = rows
+        self.cols = cols
+        self.on_click = on_click          # (cell_row, cell_col, fan_row, fan_col)
+        self.on_rectangle = on_rectangle  # [(cell_row, cell_col, fan_row, fan_col), ...]
+        self.tooltip = tooltip
+        self.canvas = tk.Canvas(parent, background="white", highlightthickness=0,
+                                width=min(cols * 150, 1200), height=min(rows * 150, 800))
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+
+        self.cadres = {}         # {cell_id: (rectangle, titre)}
+        self.ventilateurs = {}   # {(cell_id, fan_idx): _VentilateurCanvas}
+        self._origine = None
+        self._bande = None
+        self._survol = None
+        self._dessiner()
+
+        self.canvas.bind("<Configure>", lambda e: self._placer(e.width, e.height))
+        self.canvas.bind("<ButtonPress-1>", self._clic)
+        self.canvas.bind("<B1-Motion>", self._glisser)
+        self.canvas.bind("<ButtonRelease-1>", self._relacher)
+        if tooltip is not None:
+            self.canvas.bind("<Motion>", self._survoler)
+            self.canvas.bind("<Leave>", lambda e: self._fin_survol())
+
+    def ventilateur(self, cell_id, fan_idx):
+        return self.ventilateurs.get((cell_id, fan_idx))
+
+    def _dessiner(self):
+        c = self.canvas
+        for cell_row in range(1, self.rows + 1):
+            for cell_col in range(1, self.cols + 1):
+                cell_id = cle_cellule(cell_row, cell_col)
+                self.cadres[cell_id] = (
+                    c.create_rectangle(0, 0, 0, 0, outline="grey"),
+                    c.create_text(0, 0, text=f"Cell {cell_id}", anchor="nw"),
+                )
+                for fan_idx in range(9):
+                    rect = c.create_rectangle(0, 0, 0, 0, fill="#d9d9d9", outline="grey40")
+                    texte = c.create_text(0, 0, text="0%", fill="black")
+                    self.ventilateurs[(cell_id, fan_idx)] = _VentilateurCanvas(c, rect, texte)
+        self._placer(int(c.cget("width")), int(c.cget("height")))
+
+    def _placer(self, largeur, hauteur):
+        """Recalcule la géométrie (au redimensionnement) ; la grille occupe tout le Canvas."""
+        m = self.MARGE
+        self.largeur_cellule = cw = max(largeur, 1) / self.cols
+        self.hauteur_cellule = ch = max(hauteur, 1) / self.rows
+        self.largeur_ventilateur = fw = max(cw - 4 * m, 3) / 3
+        self.hauteur_ventilateur = fh = max(ch - self.ENTETE - 3 * m, 3) / 3
+        coords = self.canvas.coords
+        for cell_row in range(1, self.rows + 1):
+            for cell_col in range(1, self.cols + 1):
+                cell_id = cle_cellule(cell_row, cell_col)
+                x0 = (cell_col - 1) * cw
+                y0 = (cell_row - 1) * ch
+                cadre, titre = self.cadres[cell_id]
+                coords(cadre, x0 + 1, y0 + 1, x0 + cw - 1, y0 + ch - 1)
+                coords(titre, x0 + 2 * m, y0 + m)
+                for fan_idx in range(9):
+                    fx = x0 + 2 * m + (fan_idx % 3) * fw
+                    fy = y0 + self.ENTETE + m + (fan_idx // 3) * fh
+                    v = self.ventilateurs[(cell_id, fan_idx)]
+                    coords(v.rect, fx + 1, fy + 1, fx + fw - 1, fy + fh - 1)
+                    coords(v.texte, fx + fw / 2, fy + fh / 2)
+
+    def _position(self, x, y):
+        """(cell_row, cell_col, fan_row, fan_col) sous le point (x, y), ou None."""
+        cell_col = int(x // self.largeur_cellule) + 1
+        cell_row = int(y // self.hauteur_cellule) + 1
+        if not (1 <= cell_row <= self.rows and 1 <= cell_col <= self.cols):
+            return None
+        lx = x - (cell_col - 1) * self.largeur_cellule - 2 * self.MARGE
+        ly = y - (cell_row - 1) * self.hauteur_cellule - self.ENTETE - self.MARGE
+        if lx < 0 or ly < 0:
+            return None
+        fan_col = int(lx // self.largeur_ventilateur) + 1
+        fan_row = int(ly // self.hauteur_ventilateur) + 1
+        if fan_col > 3 or fan_row > 3:
+            return None
+        return cell_row, cell_col, fan_row, fan_col
+
+    def _clic(self, event):
+        self._origine = (event.x, event.y)
+
+    def _glisser(self, event):
+        if self._origine is None:
+            return
+        x0, y0 = self._origine
+        if self._bande is None:
+            if abs(event.x - x0) < self.SEUIL_GLISSER and abs(event.y - y0) < self.SEUIL_GLISSER:
+                return
+            self._bande = self.canvas.create_rectangle(x0, y0, x0, y0, outline="blue", dash=(4, 2))
+        self.canvas.coords(self._bande, x0, y0, event.x, event.y)
 
-    def get_all_rpms(self):
-        with self.lock:
-            return dict(self.data)  # copie du dict
-        
-    #def get_rpm_text(self, cell_id, fan_idx):
-    #    rpm_values = self.rpm_data.get(cell_id, [])
-     #   print(f"Tooltip for {cell_id}[{fan_idx}] → {rpm_values}")
-      #  if 0 <= fan_idx < len(rpm_values):
-       #     return f"RPM: {rpm_values[fan_idx]}"
-        #else:
-         #   return "RPM non disponible"
-
-
-# # Exemple d'utilisation
-# if __name__ == "__main__":
-#     receiver = RPMReceiver()
-#     receiver.start()
-
-#     try:
-#         while True:
-#             time.sleep(5)
-#             print("[INFO] Valeurs RPM stockées :")
-#             print(receiver.get_all_rpms())
-#     except KeyboardInterrupt:
-#         print("\n[INFO] Arrêt demandé par l'utilisateur.")
-#     finally:
-#         receiver.stop()
-
-class Tooltip:
-    def __init__(self, widget, textfunc):
-        self.widget = widget
-        self.textfunc = textfunc
-        self.tipwindow = None
-        self.label = None
-        self.update_loop_id = None
+    def _relacher(self, event):
+        if self._origine is None:
+            return
+        x0, y0 = self._origine
+        self._origine = None
+        if self._bande is None:
+            position = self._position(event.x, event.y)
+            if position is not None:
+                self.on_click(*position)
+            return
 
-        self.widget.bind("<Enter>", self.show_tip)
-        self.widget.bind("<Leave>", self.hide_tip)
+        self.canvas.delete(self._bande)
+        self._bande = None
+        self.on_rectangle(self._dans_rectangle(min(x0, event.x), min(y0, event.y),
+                                               max(x0, event.x), max(y0, event.y)))
+
+    def _dans_rectangle(self, x0, y0, x1, y1):
+        """Ventilateurs dont le centre est dans le rectangle (seules les cellules couvertes sont parcourues)."""
+        fans = []
+        col_min = max(1, int(x0 // self.largeur_cellule) + 1)
+        col_max = min(self.cols, int(x1 // self.largeur_cellule) + 1)
+        row_min = max(1, int(y0 // self.hauteur_cellule) + 1)
+        row_max = min(self.rows, int(y1 // self.hauteur_cellule) + 1)
+        for cell_row in range(row_min, row_max + 1):
+            for cell_col in range(col_min, col_max + 1):
+                for fan_idx in range(9):
+                    cx = ((cell_col - 1) * self.largeur_cellule + 2 * self.MARGE
+                          + (fan_idx % 3 + 0.5) * self.largeur_ventilateur)
+                    cy = ((cell_row - 1) * self.hauteur_cellule + self.ENTETE + self.MARGE
+                          + (fan_idx // 3 + 0.5) * self.hauteur_ventilateur)
+                    if x0 <= cx <= x1 and y0 <= cy <= y1:
+                        fans.append((cell_row, cell_col, fan_idx // 3 + 1, fan_idx % 3 + 1))
+        return fans
+
+    def _survoler(self, event):
+        position = self._position(event.x, event.y)
+        if position == self._survol:
+            return
+        self._survol = position
+        if position is None:
+            self.tooltip.masquer()
+            return
+        cell_row, cell_col, fan_row, fan_col = position
+        cell_id = cle_cellule(cell_row, cell_col)
+        fan_idx = (fan_row - 1) * 3 + (fan_col - 1)
+        self.tooltip.afficher(event.x_root + 20, event.y_root + 20, cell_id, fan_idx)
 
-    def show_tip(self, event=None):
-        if self.tipwindow is not None:
-            return  # Bulle déjà affichée
+    def _fin_survol(self):
+        self._survol = None
+        self.tooltip.masquer()
 
-        # Créer la fenêtre et le label
-        x = self.widget.winfo_rootx() + 20
-        y = self.widget.winfo_rooty() + 20
-        self.tipwindow = tw = tk.Toplevel(self.widget)
-        tw.wm_overrideredirect(True)
-        tw.wm_geometry(f"+{x}+{y}")
 
-        self.label = tk.Label(tw, justify=tk.LEFT, background="#ffffe0",
-                              relief=tk.SOLID, borderwidth=1, font=("tahoma", "8", "normal"))
-        self.label.pack(ipadx=1)
+class TooltipManager:
+    """
+    Infobulle unique pour toute la grille : une seule fenêtre, créée au premier survol puis
+    cachée/réaffichée. Pas de minuterie : le contenu n'est recalculé que lorsque la
+    télémétrie ou la consigne du ventilateur survolé change (rafraichir).
+    """
 
-        # Démarre la boucle de mise à jour
+    def __init__(self, root, textfunc):
+        self.root = root
+        self.textfunc = textfunc  # (cell_id, fan_idx) -> texte ou (texte, couleur)
+        self.tipwindow = None
+        self.label = None
+        self.cible = None         # (cell_id, fan_idx) survolé
+
+    def attacher(self, widget, cell_id, fan_idx):
+        """Affiche l'infobulle de ce ventilateur au survol du widget."""
+        widget.bind("<Enter>", lambda e: self.afficher(widget.winfo_rootx() + 20,
+                                                       widget.winfo_rooty() + 20, cell_id, fan_idx))
+        widget.bind("<Leave>", lambda e: self.masquer())
+
+    def afficher(self, x, y, cell_id, fan_idx):
+        if self.tipwindow is None:
+            self.tipwindow = tw = tk.Toplevel(self.root)
+            tw.wm_overrideredirect(True)
+            self.label = tk.Label(tw, justify=tk.LEFT, background="#ffffe0",
+                                  relief=tk.SOLID, borderwidth=1, font=("tahoma", "8", "normal"))
+            self.label.pack(ipadx=1)
+        self.cible = (cell_id, fan_idx)
         self._update_tip_content()
+        self.tipwindow.wm_geometry(f"+{x}+{y}")
+        self.tipwindow.deiconify()
 
-    def _update_tip_content(self):
-        if self.tipwindow is None or self.label is None:
-            return
+    def rafraichir(self, cell_ids=None):
+        """À appeler quand des cellules changent ; ne fait rien si aucune n'est survolée."""
+        if self.cible is not None and (cell_ids is None or self.cible[0] in cell_ids):
+            self._update_tip_content()
 
-        result = self.textfunc()
+    def _update_tip_content(self):
+        result = self.textfunc(*self.cible)
         if isinstance(result, tuple):
             text, bg_color = result
         else:
             text, bg_color = result, "#ffffe0"
-
         self.label.config(text=text, background=bg_color)
 
-        # Replanifie la mise à jour dans 1 seconde
-        self.update_loop_id = self.widget.after(1000, self._update_tip_content)
-
-    def hide_tip(self, event=None):
-        if self.update_loop_id:
-            self.widget.after_cancel(self.update_loop_id)
-            self.update_loop_id = None
-
-        if self.tipwindow:
-            self.tipwindow.destroy()
-            self.tipwindow = None
-            self.label = None
+    def masquer(self):
+        self.cible = None
+        if self.tipwindow is not None:
+            self.tipwindow.withdraw()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interface de contrôle du mur de ventilateurs")
+    parser.add_argument("--port", action="append",
+                        help=f"Port série (répétable : lignes du mur réparties en bandes), défaut {PORT_SERIE}")
+    parser.add_argument("--telemetrie", metavar="DOSSIER",
+                        help="Archive chaque mesure RPM reçue (un fichier .rpm par jour)")
+    args = parser.parse_args()
+
     root = tk.Tk()
     root.withdraw()  # Cache temporairement la fenêtre principale
 
@@ -1179,5 +1442,5 @@ if __name__ == "__main__":
         root.destroy()
     else:
         root.deiconify()  # Réaffiche la fenêtre principale
-        app = GVMControlApp(root, grid_rows=rows, grid_cols=cols)
+        app = GVMControlApp(root, grid_rows=rows, grid_cols=cols, ports=args.port, telemetrie=args.telemetrie)
         root.mainloop()
@@ -0,0 +1,109 @@
+"""
+Adressage des cellules du mur.
+
+Historiquement une cellule est identifiée par la chaîne f"{ligne}{colonne}"
+("11", "12", ...) et publiée sous l'entier correspondant (Publish: 11). Ce
+schéma n'est univoque que tant que lignes et colonnes tiennent sur un chiffre :
+(1, 11) et (11, 1) donneraient tous deux "111".
+
+CellAddress garde ce format pour les murs jusqu'à 9x9 (profils et firmware
+existants inchangés) et passe au-delà à une forme étendue :
+    clé "ligne.colonne"  ("1.11", "11.1")
+    identifiant publié  ligne * 256 + colonne  (tient dans le u16 des trames binaires)
+Les identifiants étendus valent au moins 266 et ne recouvrent jamais les
+identifiants historiques (11..99).
+
+Les adresses se trient par (ligne, colonne), ce qui donne l'ordre d'émission.
+Les conversions clé <-> adresse sont mises en cache : les chemins chauds
+(encodage, réception) ne refont jamais l'analyse d'une même clé.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+LIMITE_HISTORIQUE = 9   # lignes et colonnes à un chiffre : format historique
+BASE_ETENDUE = 256      # identifiant publié étendu : ligne * 256 + colonne
+
+
+class CellAddress(namedtuple("CellAddress", "row col")):
+    """Adresse (ligne, colonne) d'une cellule, numérotées à partir de 1."""
+
+    __slots__ = ()
+
+    def __new__(cls, row, col):
+        row, col = int(row), int(col)
+        if not (1 <= row < BASE_ETENDUE and 1 <= col < BASE_ETENDUE):
+            raise ValueError(f"Adresse de cellule hors limites : ({row}, {col})")
+        return super().__new__(cls, row, col)
+
+    @property
+    def historique(self):
+        return self.row <= LIMITE_HISTORIQUE and self.col <= LIMITE_HISTORIQUE
+
+    @property
+    def key(self):
+        """Clé des profils JSON, des trames JSON et des dictionnaires de l'application."""
+        if self.historique:
+            return f"{self.row}{self.col}"
+        return f"{self.row}.{self.col}"
+
+    @property
+    def publish(self):
+        """Identifiant numérique publié (champ "Publish", u16 des trames binaires)."""
+        if self.historique:
+            return self.row * 10 + self.col
+        return self.row * BASE_ETENDUE + self.col
+
+    def __str__(self):
+        return self.key
+
+    @classmethod
+    def depuis_publish(cls, identifiant):
+        identifiant = int(identifiant)
+        if identifiant < 100:
+            row, col = divmod(identifiant, 10)
+            if col == 0:
+                raise ValueError(f"Identifiant de cellule invalide : {identifiant}")
+            return cls(row, col)
+        return cls(*divmod(identifiant, BASE_ETENDUE))
+
+    @classmethod
+    def parse(cls, valeur):
+        """Accepte une CellAddress, une clé ("12", "1.11") ou un identifiant publié (12, 267)."""
+        if isinstance(valeur, cls):
+            return valeur
+        return adresse(valeur)
+
+
+@lru_cache(maxsize=None)
+def adresse(cell_id):
+    """CellAddress d'une clé ou d'un identifiant publié ; ValueError si invalide."""
+    if isinstance(cell_id, int):
+        return CellAddress.depuis_publish(cell_id)
+    texte = str(cell_id).strip()
+    if "." in texte:
+        row, _, col = texte.partition(".")
+        return CellAddress(row, col)
+    if not texte.isdigit():
+        raise ValueError(f"Identifiant de cellule invalide : {cell_id!r}")
+    return CellAddress.depuis_publish(int(texte))
+
+
+@lru_cache(maxsize=None)
+def cle_cellule(row, col):
+    """Clé de la cellule (ligne, colonne), numérotées à partir de 1."""
+    return CellAddress(row, col).key
+
+
+def publish_id(cell_id):
+    return adresse(cell_id).publish
+
+
+def normaliser_cle(cell_id):
+    """Clé canonique ; convertit les identifiants publiés reçus du firmware ou d'anciens profils."""
+    return adresse(cell_id).key
+
+
+def trier(cell_ids):
+    """Clés dans l'ordre d'émission (ligne puis colonne), quelle que soit leur forme."""
+    return sorted(cell_ids, key=adresse)
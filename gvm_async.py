@@ -0,0 +1,304 @@
+"""
+Cœur d'entrées/sorties asyncio.
+
+Une seule boucle asyncio, dans un seul thread, porte toute l'activité série :
+- lecture : le descripteur du port est surveillé par la boucle (add_reader), les
+  octets sont remis aux récepteurs dès qu'ils arrivent, sans thread ni attente ;
+- écriture : une coroutine par port vide une file bornée ; les trames en attente
+  sont regroupées en une écriture non bloquante et l'émetteur attend de la place
+  (attendre_place) au lieu de remplir la mémoire ;
+- ordonnancement : la lecture des profils (GVMEngine) est une coroutine cadencée
+  par les timers de la boucle (AsyncSequenceScheduler).
+
+AsyncSerialPort présente la même interface que SerialTransport ; les appels
+write() / vider_file() se font depuis la boucle (AsyncIOCore.executer depuis un
+autre thread). add_reader n'existant que sur les systèmes POSIX, ailleurs
+AsyncIOCore.pour_plateforme() retourne None et les transports à threads restent
+utilisés.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+import serial
+
+from gvm_metriques import METRIQUES
+from gvm_serial import BAUDRATE, PORT_SERIE
+
+
+class AsyncIOCore:
+    """Boucle asyncio tournant dans un thread dédié."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = None
+
+    @classmethod
+    def pour_plateforme(cls):
+        """Cœur démarré sur POSIX, None ailleurs (boucle sans add_reader)."""
+        if os.name != "posix":
+            return None
+        core = cls()
+        core.start()
+        return core
+
+    def start(self):
+        self.thread = threading.Thread(target=self._executer_boucle, daemon=True)
+        self.thread.start()
+
+    def _executer_boucle(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self, timeout=2.0):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def dans_la_boucle(self):
+        return self.thread is not None and threading.get_ident() == self.thread.ident
+
+    def appeler(self, coro):
+        """Planifie une coroutine sur la boucle ; retourne un concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def executer(self, fn, *args, timeout=5.0):
+        """Exécute `fn(*args)` dans le thread de la boucle et retourne son résultat."""
+        if self.dans_la_boucle():
+            return fn(*args)
+
+        async def appel():
+            return fn(*args)
+
+        return self.appeler(appel()).result(timeout)
+
+
+class AsyncSerialPort:
+    def __init__(self, core, port=PORT_SERIE, baudrate=BAUDRATE,
+                 delai_min=0.5, delai_max=30.0, taille_file=1000):
+        self.core = core
+        self.port = port
+        self.baudrate = baudrate
+        self.delai_min = delai_min
+        self.delai_max = delai_max
+        self.taille_file = taille_file
+        self.serial_conn = None
+        self.recepteurs = []
+        self.file_envoi = deque()
+        self.connecte = False
+        self.ouvertures = 0
+        self.octets_envoyes = 0
+        self.erreurs = 0
+        self.trames_perdues = 0  # refusées faute de place dans la file d'envoi
+        self.attentes_place = 0  # attentes de attendre_place() sur une file pleine
+        self.duree_attente_place = 0.0
+        self._tache = None
+        self._perdu = None
+        self._arret = None
+        self._donnees = None   # des trames attendent l'écrivain
+        self._place = None     # la file est repassée sous sa taille maximale
+        self._vide = None      # tout a été écrit
+
+    @property
+    def reconnexions(self):
+        return max(0, self.ouvertures - 1)
+
+    def ajouter_recepteur(self, callback):
+        """`callback(octets)` est appelé depuis la boucle à chaque bloc reçu."""
+        self.recepteurs.append(callback)
+
+    def start(self):
+        self._tache = self.core.appeler(self._maintenir())
+
+    def stop(self):
+        self.core.executer(self._demander_arret)
+        if self._tache is not None:
+            try:
+                self._tache.result(2.0)
+            except Exception:
+                pass
+        print("[INFO] Connexion série fermée.")
+
+    def _demander_arret(self):
+        if self._arret is not None:
+            self._arret.set()
+        self._perte()
+
+    # --- Écriture (depuis la boucle) -------------------------------------------
+
+    def write(self, data):
+        """
+        Met une trame en file d'envoi. Lève ConnectionError si le port n'est pas ouvert et
+        BufferError si la file est pleine, comme SerialTransport : attendre_place() d'abord.
+        """
+        if not self.connecte:
+            raise ConnectionError(f"Port série {self.port} non connecté")
+        if len(self.file_envoi) >= self.taille_file:
+            self.trames_perdues += 1
+            METRIQUES.compter("serie_trames_perdues")
+            raise BufferError(f"File d'envoi de {self.port} pleine : trame abandonnée")
+        self.file_envoi.append(data)
+        self._vide.clear()
+        self._donnees.set()
+        if len(self.file_envoi) >= self.taille_file:
+            self._place.clear()
+
+    async def attendre_place(self):
+        """Contre-pression : attend que la file repasse sous sa taille maximale."""
+        if not (self.connecte and len(self.file_envoi) >= self.taille_file):
+            return
+        debut = time.perf_counter()
+        while self.connecte and len(self.file_envoi) >= self.taille_file:
+            await self._place.wait()
+        duree = time.perf_counter() - debut
+        self.attentes_place += 1
+        self.duree_attente_place += duree
+        METRIQUES.observer("serie_attente_place", duree)
+
+    def vider_file(self):
+        """Abandonne les trames pas encore écrites (ex. avant les trames d'arrêt)."""
+        self.file_envoi.clear()
+        if self._place is not None:
+            self._place.set()
+
+    def attendre_vidange(self, timeout=5.0):
+        """Attend (depuis un autre thread) que toutes les trames en file soient écrites."""
+        async def vidange():
+            if self.connecte:
+                await asyncio.wait_for(self._vide.wait(), timeout)
+            return not self.file_envoi
+
+        try:
+            return self.core.appeler(vidange()).result(timeout + 1.0)
+        except Exception:
+            return False
+
+    def statistiques(self):
+        return {
+            "octets_envoyes": self.octets_envoyes,
+            "erreurs": self.erreurs,
+            "reconnexions": self.reconnexions,
+            "trames_perdues": self.trames_perdues,
+            "attentes_place": self.attentes_place,
+            "duree_attente_place": self.duree_attente_place,
+            "en_file": len(self.file_envoi),
+        }
+
+    # --- Connexion -----------------------------------------------------------
+
+    def _ouvrir(self):
+        # pyserial ouvre le port en O_NONBLOCK : lectures et écritures ne bloquent jamais la boucle
+        self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=0, write_timeout=0)
+        self.connecte = True
+        self.ouvertures += 1
+        print(f"[INFO] Port série ouvert : {self.port} à {self.baudrate} bauds.")
+
+    def _fermer(self):
+        conn, self.serial_conn = self.serial_conn, None
+        self.connecte = False
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _perte(self):
+        if self._perdu is not None and not self._perdu.done():
+            self._perdu.set_result(None)
+
+    def _signaler_erreur(self, contexte, e):
+        self.erreurs += 1
+        print(f"[ERREUR] {contexte} : {e}")
+        self._perte()
+
+    async def _maintenir(self):
+        """Ouvre le port (avec délai croissant entre les tentatives) et le garde ouvert."""
+        loop = asyncio.get_running_loop()
+        self._arret = asyncio.Event()
+        self._donnees = asyncio.Event()
+        self._place = asyncio.Event()
+        self._vide = asyncio.Event()
+        self._place.set()
+        self._vide.set()
+        delai = self.delai_min
+        while not self._arret.is_set():
+            try:
+                self._ouvrir()
+            except Exception as e:
+                print(f"[ERREUR] Impossible d’ouvrir le port série : {e} (nouvel essai dans {delai:.1f} s)")
+                try:
+                    await asyncio.wait_for(self._arret.wait(), delai)
+                except asyncio.TimeoutError:
+                    pass
+                delai = min(delai * 2, self.delai_max)
+                continue
+            delai = self.delai_min
+
+            self._perdu = loop.create_future()
+            fd = self.serial_conn.fileno()
+            loop.add_reader(fd, self._lisible)
+            ecrivain = loop.create_task(self._ecrire(fd))
+            try:
+                await self._perdu
+            finally:
+                loop.remove_reader(fd)
+                ecrivain.cancel()
+                self._fermer()
+                self._place.set()  # débloque les émetteurs : write() lèvera ConnectionError
+                self._vide.set()
+
+    def _lisible(self):
+        conn = self.serial_conn
+        if conn is None:
+            return
+        try:
+            data = conn.read(conn.in_waiting or 1)
+        except Exception as e:
+            self._signaler_erreur("Problème de lecture", e)
+            return
+        if data:
+            # Un récepteur qui lève ne doit ni arrêter la lecture ni priver les autres du bloc
+            for callback in self.recepteurs:
+                try:
+                    callback(data)
+                except Exception as e:
+                    self.erreurs += 1
+                    print(f"[ERREUR] Traitement des données reçues sur {self.port} : {e!r}")
+
+    async def _ecrire(self, fd):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.file_envoi:
+                self._vide.set()
+                self._donnees.clear()
+                await self._donnees.wait()
+                continue
+            # Regroupe les trames déjà en attente en une seule écriture
+            paquet = memoryview(b''.join(self.file_envoi))
+            self.file_envoi.clear()
+            self._place.set()
+            total = len(paquet)
+            debut = METRIQUES.debut()
+            try:
+                while paquet:
+                    try:
+                        paquet = paquet[os.write(fd, paquet):]
+                    except BlockingIOError:
+                        pass
+                    if paquet:
+                        # Tampon du pilote plein : la boucle nous réveille quand le port accepte la suite
+                        pret = loop.create_future()
+                        loop.add_writer(fd, lambda: pret.done() or pret.set_result(None))
+                        try:
+                            await pret
+                        finally:
+                            loop.remove_writer(fd)
+            except OSError as e:
+                self._signaler_erreur("Problème d'écriture", e)
+                return
+            METRIQUES.fin("serie_ecriture", debut)
+            METRIQUES.compter("serie_octets_envoyes", total)
+            self.octets_envoyes += total
@@ -0,0 +1,269 @@
+"""
+Répartition du mur sur plusieurs liaisons série.
+
+Un seul port à 9600 bauds limite la cadence de rafraîchissement de tout le mur.
+Les cellules sont ici réparties en groupes (bandes de lignes, régions
+rectangulaires) affectés chacun à un port. Chaque SerialBus possède son propre
+SerialTransport (threads d'écriture et de lecture) et son propre RPMReceiver :
+les bus émettent et reçoivent en parallèle.
+
+BusCoordinator présente l'ensemble comme un seul transport et un seul récepteur :
+- les trames sont compilées par bus (chaque trame JSON ne porte que les cellules
+  de son bus) puis entrelacées, ce qui met tous les bus au travail dès le début
+  d'un tick ;
+- write() route chaque trame vers le bus de sa cellule ; le moteur remplit chaque
+  bus dans sa propre tâche, un port lent ou saturé ne retient donc pas les autres ;
+- un seul SequenceScheduler cadence tous les bus, les changements de séquence
+  tombent donc sur le même tick partout.
+
+Avec un AsyncIOCore, les ports sont des AsyncSerialPort servis par une seule
+boucle asyncio au lieu de deux threads par port.
+"""
+
+import time
+from itertools import zip_longest
+
+from gvm_address import CellAddress, cle_cellule, trier
+from gvm_async import AsyncSerialPort
+from gvm_protocol import CompiledFrames
+from gvm_serial import BAUDRATE, RPMReceiver, SerialTransport
+
+
+def repartir_par_lignes(rows, cols, ports):
+    """{port: [cell_id, ...]} en bandes de lignes contiguës, aussi égales que possible."""
+    if not ports:
+        raise ValueError("Au moins un port série est nécessaire.")
+    affectation = {port: [] for port in ports}
+    for row in range(1, rows + 1):
+        port = ports[(row - 1) * len(ports) // rows]
+        affectation[port].extend(cle_cellule(row, col) for col in range(1, cols + 1))
+    return affectation
+
+
+def repartir_par_regions(regions):
+    """
+    {port: [(ligne0, colonne0, ligne1, colonne1), ...]} -> {port: [cell_id, ...]}.
+    Bornes incluses, numérotées à partir de 1. Une cellule ne peut appartenir qu'à un port.
+    """
+    affectation = {}
+    vues = {}
+    for port, rectangles in regions.items():
+        cellules = affectation.setdefault(port, [])
+        for r0, c0, r1, c1 in rectangles:
+            for row in range(min(r0, r1), max(r0, r1) + 1):
+                for col in range(min(c0, c1), max(c0, c1) + 1):
+                    cell_id = cle_cellule(row, col)
+                    if cell_id in vues:
+                        raise ValueError(f"Cellule {cell_id} affectée à {vues[cell_id]} et à {port}.")
+                    vues[cell_id] = port
+                    cellules.append(cell_id)
+    return affectation
+
+
+def analyser_affectation(texte):
+    """
+    Lit "PORT=l0,c0:l1,c1;l0,c0:l1,c1" (régions rectangulaires d'un port).
+    Exemple : "/dev/ttyUSB0=1,1:5,10" -> {"/dev/ttyUSB0": [(1, 1, 5, 10)]}.
+    """
+    port, _, regions = texte.partition("=")
+    rectangles = []
+    for region in filter(None, regions.split(";")):
+        debut, _, fin = region.partition(":")
+        r0, c0 = CellAddress(*debut.split(","))
+        r1, c1 = CellAddress(*(fin or debut).split(","))
+        rectangles.append((r0, c0, r1, c1))
+    if not port or not rectangles:
+        raise ValueError(f"Affectation invalide : {texte!r}")
+    return port, rectangles
+
+
+class SerialBus:
+    """Un port série, ses cellules, son transport et son récepteur RPM."""
+
+    def __init__(self, port, cell_ids, baudrate=BAUDRATE, core=None):
+        self.port = port
+        self.cell_ids = trier(cell_ids)
+        if core is not None:
+            self.transport = AsyncSerialPort(core, port, baudrate)
+        else:
+            self.transport = SerialTransport(port, baudrate)
+        self.receiver = RPMReceiver(port, baudrate)
+        self.receiver.attacher(self.transport)
+
+    def sous_ensemble(self, valeurs):
+        return {cell_id: valeurs[cell_id] for cell_id in self.cell_ids if cell_id in valeurs}
+
+
+class BusCoordinator:
+    def __init__(self, affectation, baudrate=BAUDRATE, core=None):
+        if not affectation:
+            raise ValueError("Au moins un port série est nécessaire.")
+        self.core = core  # AsyncIOCore ou None (transports à threads)
+        self.bus = [SerialBus(port, cell_ids, baudrate, core) for port, cell_ids in affectation.items()]
+        self.bus_par_cellule = {}
+        for bus in self.bus:
+            for cell_id in bus.cell_ids:
+                if cell_id in self.bus_par_cellule:
+                    raise ValueError(f"Cellule {cell_id} affectée à plusieurs ports.")
+                self.bus_par_cellule[cell_id] = bus
+        self._on_change = None
+        self._on_mesures = None
+
+    @property
+    def port(self):
+        return ", ".join(bus.port for bus in self.bus)
+
+    @property
+    def connecte(self):
+        return all(bus.transport.connecte for bus in self.bus)
+
+    def ports_deconnectes(self):
+        return [bus.port for bus in self.bus if not bus.transport.connecte]
+
+    def bus_de(self, cell_id):
+        bus = self.bus_par_cellule.get(cell_id)
+        if bus is None:
+            raise ValueError(f"Cellule {cell_id} affectée à aucun port série.")
+        return bus
+
+    # --- Envoi ---------------------------------------------------------------
+
+    def start(self):
+        for bus in self.bus:
+            bus.transport.start()
+
+    def stop(self):
+        for bus in self.bus:
+            bus.transport.stop()
+
+    def write(self, data, cell_id):
+        """Met la trame en file sur le bus de la cellule ; ConnectionError si ce port est fermé."""
+        self.bus_de(cell_id).transport.write(data)
+
+    def vider_file(self):
+        for bus in self.bus:
+            bus.transport.vider_file()
+
+    async def attendre_place(self, bus):
+        """Contre-pression des ports asyncio ; sans effet pour les transports à threads."""
+        attendre = getattr(bus.transport, "attendre_place", None)
+        if attendre is not None:
+            await attendre()
+
+    def attendre_vidange(self, timeout=5.0):
+        limite = time.monotonic() + timeout
+        return all(bus.transport.attendre_vidange(max(0.0, limite - time.monotonic())) for bus in self.bus)
+
+    def _fusionner(self, par_bus):
+        """Une seule CompiledFrames, trames entrelacées bus par bus (un bus n'attend pas l'autre)."""
+        cell_ids, indices = [], {}
+        for compiled in par_bus:
+            cell_ids.extend(compiled.cell_ids)
+            indices.update(compiled.indices)
+        frames = [frame for tour in zip_longest(*(c.frames for c in par_bus)) for frame in tour if frame]
+        fusion = CompiledFrames(trier(cell_ids), indices, frames)
+        fusion.parties = par_bus
+        return fusion
+
+    def compiler(self, encoder, powers):
+        """Trames d'un jeu de puissances : chaque trame JSON ne porte que les cellules de son bus."""
+        orphelines = [cell_id for cell_id in powers if cell_id not in self.bus_par_cellule]
+        if orphelines:
+            raise ValueError(f"Cellules affectées à aucun port série : {', '.join(trier(orphelines))}")
+        return self._fusionner([encoder.compile(bus.sous_ensemble(powers)) for bus in self.bus])
+
+    def recompiler_indices(self, encoder, compiled, indices):
+        """
+        Trames de `compiled` (mêmes cellules, compilées ici) pour de nouveaux indices, en ne
+        refaisant que les bus dont des cellules ont changé ; `compiled` revient tel quel sinon.
+        """
+        modifiees = [cell_id for cell_id in compiled.cell_ids if indices[cell_id] != compiled.indices[cell_id]]
+        if not modifiees:
+            return compiled
+        bus_modifies = {self.bus_par_cellule[cell_id] for cell_id in modifiees}
+        recompile = self._fusionner([
+            encoder.recompiler(partie, bus.sous_ensemble(indices)) if bus in bus_modifies else partie
+            for bus, partie in zip(self.bus, compiled.parties)
+        ])
+        if compiled.delta is not None:
+            # Trames courtes de l'envoi différentiel : seules celles des cellules modifiées changent
+            recompile.delta = dict(compiled.delta)
+            recompile.delta.update(encoder.frames_delta(
+                encoder.compile_indices({cell_id: indices[cell_id] for cell_id in modifiees})))
+        return recompile
+
+    # --- Réception : même interface que RPMReceiver ---------------------------
+
+    @property
+    def on_change(self):
+        return self._on_change
+
+    @on_change.setter
+    def on_change(self, callback):
+        self._on_change = callback
+        for bus in self.bus:
+            bus.receiver.on_change = callback
+
+    @property
+    def on_mesures(self):
+        return self._on_mesures
+
+    @on_mesures.setter
+    def on_mesures(self, callback):
+        self._on_mesures = callback
+        for bus in self.bus:
+            bus.receiver.on_mesures = callback
+
+    def collecter_modifications(self):
+        version, modifiees = 0, {}
+        for bus in self.bus:
+            v, m = bus.receiver.collecter_modifications()
+            version += v
+            modifiees.update(m)
+        return version, modifiees
+
+    def get_all_rpms(self):
+        rpms = {}
+        for bus in self.bus:
+            rpms.update(bus.receiver.get_all_rpms())
+        return rpms
+
+    def get_last_seen(self):
+        vus = {}
+        for bus in self.bus:
+            vus.update(bus.receiver.get_last_seen())
+        return vus
+
+    def statistiques(self):
+        """Réception (RPMReceiver) et envoi (transport) de chaque bus, et leurs totaux."""
+        par_bus = {bus.port: bus.receiver.statistiques() for bus in self.bus}
+        ages = {}
+        for stats in par_bus.values():
+            ages.update(stats["ages"])
+        for bus in self.bus:
+            par_bus[bus.port]["transport"] = bus.transport.statistiques()
+        transports = [s["transport"] for s in par_bus.values()]
+        return {
+            "messages": sum(s["messages"] for s in par_bus.values()),
+            "messages_par_seconde": sum(s["messages_par_seconde"] for s in par_bus.values()),
+            "erreurs": sum(s["erreurs"] for s in par_bus.values()),
+            "age_max": max(ages.values()) if ages else None,
+            "ages": ages,
+            "trames_perdues": sum(t["trames_perdues"] for t in transports),
+            "attentes_place": sum(t["attentes_place"] for t in transports),
+            "duree_attente_place": sum(t["duree_attente_place"] for t in transports),
+            "bus": par_bus,
+        }
+
+    @staticmethod
+    def _resume_bus(bus):
+        t = bus.transport.statistiques()
+        return (f"{bus.receiver.resume()}\n"
+                f"Transport : {t['en_file']} en file | perdues : {t['trames_perdues']} "
+                f"| attentes de place : {t['attentes_place']} ({t['duree_attente_place']:.2f} s) "
+                f"| reconnexions : {t['reconnexions']}")
+
+    def resume(self):
+        if len(self.bus) == 1:
+            return self._resume_bus(self.bus[0])
+        return "\n".join(f"[{bus.port}] {ligne}" for bus in self.bus for ligne in self._resume_bus(bus).splitlines())
@@ -0,0 +1,100 @@
+"""
+Courbe caractéristique des ventilateurs (data_value_fan.csv) et tables de conversion.
+
+Les tables pourcentage -> indice PWM, pourcentage -> RPM de consigne et
+pourcentage -> débit d'air sont construites une seule fois au chargement du CSV ;
+les conversions du chemin d'envoi sont ensuite de simples accès par dictionnaire.
+"""
+
+import csv
+from bisect import bisect_left
+from types import MappingProxyType
+
+POURCENTAGES = tuple(range(0, 101, 5))  # paliers de 5 % : 21 valeurs
+
+
+class FanCurve:
+    def __init__(self, pwm_values, rpm_values, airflow_values):
+        self.pwm_values = tuple(pwm_values)
+        self.rpm_values = tuple(rpm_values)
+        self.airflow_values = tuple(airflow_values)
+        self.airflow_percentage = self._airflow_reduit()
+
+        # Premier indice de chaque valeur de débit (comme list.index)
+        premier_indice = {}
+        for idx, valeur in enumerate(self.airflow_values):
+            premier_indice.setdefault(valeur, idx)
+
+        indices, rpms = {}, {}
+        for pourcentage, valeur in zip(POURCENTAGES, self.airflow_percentage):
+            idx = -1 if valeur == 0 else premier_indice[valeur]
+            indices[pourcentage] = idx
+            rpms[pourcentage] = self.rpm_values[idx] if idx != -1 else 0
+
+        self.table_indices = MappingProxyType(indices)
+        self.table_rpm = MappingProxyType(rpms)
+        self.table_debits = MappingProxyType(dict(zip(POURCENTAGES, self.airflow_percentage)))
+
+    @classmethod
+    def from_csv(cls, filepath):
+        pwm_values, rpm_values, airflow_values = [], [], []
+        with open(filepath, newline='', encoding='latin-1') as csvfile:
+            reader = csv.reader(csvfile, delimiter=';')
+            next(reader)  # ignore l'en-tête
+            for row in reader:
+                if len(row) != 3:
+                    continue
+                try:
+                    pwm = int(row[0].strip())
+                    rpm = int(row[1].strip())
+                    airflow = float(row[2].strip().replace(',', '.'))
+                except ValueError:
+                    continue
+                pwm_values.append(pwm)
+                rpm_values.append(rpm)
+                airflow_values.append(airflow)
+        return cls(pwm_values, rpm_values, airflow_values)
+
+    def _airflow_reduit(self):
+        """
+        21 débits pour les paliers 0..100 % : 0, le premier débit réel, 18 valeurs
+        réelles les plus proches de points également espacés, puis le dernier débit.
+        Recherche du plus proche voisin par bisection sur les débits triés.
+        """
+        valeurs = self.airflow_values
+        if len(valeurs) < 2:
+            raise ValueError("La liste airflow_values doit contenir au moins deux valeurs.")
+
+        # Valeurs distinctes triées ; à distance égale on garde la première rencontrée dans le CSV
+        ordre = {}
+        for idx, valeur in enumerate(valeurs):
+            ordre.setdefault(valeur, idx)
+        tries = sorted(ordre)
+
+        def plus_proche(v):
+            pos = bisect_left(tries, v)
+            candidats = tries[max(0, pos - 1):pos + 1]
+            return min(candidats, key=lambda x: (abs(x - v), ordre[x]))
+
+        debut, fin = valeurs[0], valeurs[-1]
+        step = (fin - debut) / 19  # 18 intervalles => 19 points entre les extrêmes
+        reduit = [0.0, debut]
+        reduit.extend(plus_proche(debut + i * step) for i in range(1, 19))
+        reduit.append(fin)
+        return tuple(reduit)
+
+    def _palier(self, table, pourcentage):
+        try:
+            return table[pourcentage]
+        except (KeyError, TypeError):
+            raise ValueError("Le pourcentage doit être un multiple de 5 entre 0 et 100.") from None
+
+    def indice_pwm(self, pourcentage):
+        """Indice de la ligne du CSV à envoyer pour ce pourcentage (-1 si éteint)."""
+        return self._palier(self.table_indices, pourcentage)
+
+    def rpm_consigne(self, pourcentage):
+        return self._palier(self.table_rpm, pourcentage)
+
+    def debit(self, pourcentage):
+        return self._palier(self.table_debits, pourcentage)
@@ -0,0 +1,511 @@
+"""
+Moteur de lecture des profils, sans interface graphique.
+
+Chargement des profils (.json statiques ou dynamiques), encodage des trames,
+ordonnancement et entrées/sorties série sont regroupés ici. GVMControlApp n'est
+qu'un client de ce moteur ; un service sur le Raspberry Pi peut jouer un profil
+sans affichage ni Tk :
+
+    python gvm_engine.py profil.json --port /dev/serial0 --boucle --periode 0.5
+
+Le moteur ne connaît de son client que trois rappels, appelés depuis le thread
+de lecture : `journal(texte)`, `on_sequence(nom, powers)` et `on_fin()`.
+
+La lecture est une coroutine (AsyncSequenceScheduler) : sur la boucle du cœur
+asyncio qui sert aussi les ports série, ou dans une boucle privée quand le bus
+utilise des transports à threads. Ces rappels sont donc appelés depuis un autre
+thread que celui du client.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import signal
+import threading
+import time
+
+from gvm_address import adresse, normaliser_cle
+from gvm_async import AsyncIOCore
+from gvm_bus import BusCoordinator, analyser_affectation, repartir_par_lignes, repartir_par_regions
+from gvm_curve import FanCurve
+from gvm_journal import journal_fichier
+from gvm_metriques import METRIQUES
+from gvm_protocol import PROTOCOLE_JSON, PROTOCOLES, SYNC, DeltaTracker, creer_encodeur
+from gvm_regulation import FanRegulator
+from gvm_scheduler import AsyncSequenceScheduler
+from gvm_telemetrie import TelemetryRecorder
+from gvm_serial import BAUDRATE, PORT_SERIE
+
+CSV_VENTILATEUR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_value_fan.csv")
+INTERVALLE_EXPORT_METRIQUES = 10.0  # s entre deux écritures du fichier --metriques
+
+
+def normaliser_puissances(powers):
+    """Clés de cellules canoniques (profils historiques "12" ou étendus "1.11")."""
+    return {normaliser_cle(cell_id): valeurs for cell_id, valeurs in powers.items()}
+
+
+class Profile:
+    """Profil de lecture : séquences {nom: {'powers': {...}, 'duration': s}} ou grille statique."""
+
+    def __init__(self, sequences=None, grid=None, protocole=PROTOCOLE_JSON):
+        if protocole not in PROTOCOLES:
+            raise ValueError(f"Protocole inconnu : {protocole}")
+        self.sequences = sequences if sequences is not None else {}
+        self.grid = grid if grid is not None else {}
+        self.protocole = protocole
+
+    @property
+    def dynamique(self):
+        return bool(self.sequences)
+
+    @classmethod
+    def from_dict(cls, data):
+        protocole = data.get("protocole", PROTOCOLE_JSON)  # anciens profils : JSON
+        profil_type = data.get("type")
+        if profil_type == "dynamique":
+            sequences = data.get("sequences", {})
+            for seq in sequences.values():
+                seq['powers'] = normaliser_puissances(seq['powers'])
+            return cls(sequences=sequences, protocole=protocole)
+        if profil_type == "statique":
+            return cls(grid=normaliser_puissances(data.get("grid", {})), protocole=protocole)
+        raise ValueError("Type de profil inconnu.")
+
+    def to_dict(self):
+        if self.dynamique:
+            return {"type": "dynamique", "sequences": self.sequences, "protocole": self.protocole}
+        return {"type": "statique", "grid": self.grid, "protocole": self.protocole}
+
+    @classmethod
+    def charger(cls, chemin):
+        with open(chemin, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def sauvegarder(self, chemin):
+        with open(chemin, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def cell_ids(self):
+        if self.dynamique:
+            return set().union(*(seq['powers'] for seq in self.sequences.values()))
+        return set(self.grid)
+
+    def dimensions(self):
+        """(lignes, colonnes) du plus petit mur contenant toutes les cellules du profil."""
+        adresses = [adresse(cell_id) for cell_id in self.cell_ids()]
+        if not adresses:
+            return 0, 0
+        return max(a.row for a in adresses), max(a.col for a in adresses)
+
+
+class GVMEngine:
+    def __init__(self, courbe, bus, journal=None):
+        self.courbe = courbe
+        self.bus = bus  # BusCoordinator : un ou plusieurs ports série
+        self.encodeurs = {protocole: creer_encodeur(protocole, courbe.indice_pwm) for protocole in PROTOCOLES}
+        self.compilees = {}  # {name: (powers, protocole, CompiledFrames)}
+        self.delta_tracker = DeltaTracker()
+        self.scheduler = None
+        self.tache = None    # lecture sur le cœur asyncio (concurrent.futures.Future)
+        self.thread = None   # ou thread portant une boucle asyncio privée
+        self.lock = threading.Lock()  # ordre des trames entre envoi et arrêt
+        self.actif = False
+        self.session_ouverte = False  # un envoi a eu lieu depuis le dernier arrêt
+        self.generation = 0  # numéro de la lecture en cours : une lecture finissante ne touche pas la suivante
+        # Réglages figés au démarrage de l'envoi
+        self.protocole = PROTOCOLE_JSON
+        self.delta = False
+        self.boucle = False
+        # Compteurs cumulés de la lecture en cours (résumé de débit à la place du détail)
+        self.trames_envoyees = 0
+        self.octets_envoyes = 0
+        self.erreurs_envoi = 0
+
+        self.journal = journal or print
+        self.journal_trames = True  # une ligne de journal par trame envoyée
+        self.journal_trame = None   # destination de ces lignes ; par défaut `journal`
+        self.on_sequence = None     # (nom, powers) à chaque changement de séquence
+        self.on_fin = None          # fin d'un profil dynamique ou lecture interrompue par une erreur
+        self.enregistreur = None    # TelemetryRecorder : consignes jointes à l'historique RPM
+        self.regulateur = None      # FanRegulator : indices corrigés par la télémétrie à chaque tick
+        self._regule = None         # (trames de la courbe, trames régulées du tick précédent)
+
+    # --- Compilation ---------------------------------------------------------
+
+    def compiler(self, powers, protocole):
+        return self.bus.compiler(self.encodeurs[protocole], powers)
+
+    def compiler_sequence(self, name, seq, protocole):
+        """
+        Compile une fois les trames série d'une séquence (création, modification, chargement).
+        Le cache est invalidé dès que le dictionnaire 'powers' de la séquence est remplacé.
+        """
+        cached = self.compilees.get(name)
+        if cached is None or cached[0] is not seq['powers'] or cached[1] != protocole:
+            cached = (seq['powers'], protocole, self.compiler(seq['powers'], protocole))
+            self.compilees[name] = cached
+        return cached[2]
+
+    # --- Lecture -------------------------------------------------------------
+
+    def demarrer(self, profil, periode=1.0, boucle=False, delta=False):
+        """
+        Lance la lecture et rend la main : coroutine sur la boucle du cœur asyncio du bus,
+        ou à défaut (transports à threads) boucle asyncio privée dans un thread.
+        """
+        self._preparer(profil, periode, boucle, delta)
+        if self.bus.core is not None:
+            self.tache = self.bus.core.appeler(self._boucle_envoi(profil))
+        else:
+            self.thread = threading.Thread(target=asyncio.run, args=(self._boucle_envoi(profil),), daemon=True)
+            self.thread.start()
+
+    def jouer(self, profil, periode=1.0, boucle=False, delta=False):
+        """Joue le profil et attend la fin ou arreter()."""
+        self.demarrer(profil, periode, boucle, delta)
+        while self.en_cours():
+            self.attendre(0.5)
+
+    def en_cours(self):
+        if self.tache is not None:
+            return not self.tache.done()
+        return self.thread is not None and self.thread.is_alive()
+
+    def attendre(self, timeout=None):
+        if self.tache is not None:
+            concurrent.futures.wait([self.tache], timeout)
+        elif self.thread is not None:
+            self.thread.join(timeout)
+
+    def _preparer(self, profil, periode, boucle, delta):
+        self.generation += 1
+        self.actif = True
+        self.session_ouverte = True
+        self.protocole = profil.protocole
+        self.delta = delta
+        self.boucle = boucle
+        self.delta_tracker.reinitialiser()
+        self.delta_tracker.reinitialiser_compteurs()
+        self.delta_tracker.periode = periode
+        if self.regulateur is not None:
+            self.regulateur.reinitialiser()
+        self._regule = None
+        self.scheduler = AsyncSequenceScheduler(periode)
+        self.trames_envoyees = self.octets_envoyes = self.erreurs_envoi = 0
+        self.tache = None
+        self.thread = None
+
+    async def _boucle_envoi(self, profil):
+        generation = self.generation
+        sans_erreur = False
+        try:
+            sans_erreur = await self._lire(profil)
+        finally:
+            # Fin du profil ou erreur (arreter() a déjà tout remis en ordre) : la lecture ne reste
+            # jamais « en cours », sinon l'interface garderait Envoyer désactivé
+            if self.actif and generation == self.generation:
+                self.actif = False
+                if not sans_erreur and self.session_ouverte:
+                    self.journal("🛑 Lecture interrompue : envoi des trames d'arrêt.")
+                    self._envoyer_arret()  # ventilateurs à -1, comme pour un arrêt
+                self.session_ouverte = False  # fin du profil : le port reste ouvert pour la suivante
+                self._consignes_actives(None)
+                if self.on_fin:
+                    self.on_fin()
+
+    async def _lire(self, profil):
+        """Joue le profil ; False s'il a été interrompu par une erreur."""
+        if not self.bus.connecte:
+            ports = ", ".join(self.bus.ports_deconnectes())
+            self.journal(f"⚠ Port série {ports} non connecté : reconnexion automatique en cours.")
+
+        if profil.dynamique:
+            try:
+                self.journal(f"🚀 Démarrage de l'envoi cyclique des séquences (protocole {self.protocole}).")
+                plan = [(seq_name, seq['duration']) for seq_name, seq in profil.sequences.items()]
+                compiled = None
+                iteration = 0
+
+                # Échéances absolues sur l'horloge monotone : pas de dérive entre séquences.
+                # En boucle, le port et les trames compilées restent prêts d'une itération à l'autre.
+                async for tick in self.scheduler.ticks_async(plan, boucle=self.boucle):
+                    if not self.actif:
+                        break
+
+                    if tick.iteration != iteration:
+                        iteration = tick.iteration
+                        if self.boucle:
+                            self.journal(f"🔁 {self.scheduler.resume().splitlines()[0]}")
+
+                    if tick.nouvelle_sequence:
+                        seq = profil.sequences[tick.nom]
+                        compiled = self.compiler_sequence(tick.nom, seq, self.protocole)
+                        self.journal(f"⏱ Envoi de la séquence '{tick.nom}' pendant {seq['duration']} secondes")
+                        self._consignes_actives(seq['powers'])
+                        if self.on_sequence:
+                            self.on_sequence(tick.nom, seq['powers'])
+
+                    debut = METRIQUES.debut()
+                    await self.envoyer_trames(self.reguler(compiled))
+                    METRIQUES.fin("envoi_tick", debut)
+                if not self.actif:
+                    return True  # 🛑 l'utilisateur a arrêté l'envoi
+                self.journal("✅ Profil dynamique terminé.")
+                return True
+
+            except Exception as e:
+                self.journal(f"Erreur lors de l'exécution des séquences: {e}")
+                return False
+
+        else:
+            # 🔁 Envoi continu du profil statique
+            try:
+                compiled = self.compiler(profil.grid, self.protocole)
+                self._consignes_actives(profil.grid)
+
+                self.journal(f"📤 Envoi du profil statique : 1 trame par cellule toutes les {self.scheduler.periode} s.")
+
+                async for tick in self.scheduler.ticks_async([("statique", None)]):
+                    if not self.actif:
+                        break
+                    debut = METRIQUES.debut()
+                    await self.envoyer_trames(self.reguler(compiled), statique=True)
+                    METRIQUES.fin("envoi_tick", debut)
+
+                self.journal("🛑 Envoi statique arrêté par l'utilisateur.")
+                return True
+            except Exception as e:
+                self.journal(f"Erreur lors de l'envoi du profil statique: {e}")
+                return False
+
+    def reguler(self, compiled):
+        """
+        Trames du tick : celles de la courbe, ou celles des indices régulés. D'un tick à l'autre,
+        seules les cellules dont l'indice régulé a changé sont recompilées.
+        """
+        if self.regulateur is None:
+            return compiled
+        indices = self.regulateur.indices(compiled.indices, self.bus.get_all_rpms(), self.bus.get_last_seen())
+        base = self._regule[1] if self._regule is not None and self._regule[0] is compiled else compiled
+        regule = self.bus.recompiler_indices(self.encodeurs[self.protocole], base, indices)
+        self._regule = (compiled, regule)
+        return regule
+
+    async def envoyer_trames(self, compiled, statique=False):
+        """
+        Envoie les trames d'un tick : toutes les cellules, ou en mode différentiel
+        uniquement celles dont les indices ont changé (+ rafraîchissement tournant).
+        """
+        suffixe = " (statique)" if statique else ""
+        if self.delta:
+            maintenant = time.monotonic()
+            self.delta_tracker.acquitter(self.bus.get_last_seen())
+            frames = self.encodeurs[self.protocole].frames_delta(compiled)
+            envois = [(cell_id, frames[cell_id]) for cell_id in self.delta_tracker.selectionner(compiled, maintenant)]
+        else:
+            envois = compiled
+
+        # Une tâche par bus : un port lent ou saturé ne retient pas les trames des autres
+        par_bus = {}
+        for publish_cell, frame in envois:
+            par_bus.setdefault(self.bus.bus_de(publish_cell), []).append((publish_cell, frame))
+        await asyncio.gather(*(self._envoyer_bus(bus, trames, compiled, suffixe)
+                               for bus, trames in par_bus.items()))
+
+    async def _envoyer_bus(self, bus, trames, compiled, suffixe):
+        for publish_cell, frame in trames:
+            await self.bus.attendre_place(bus)  # contre-pression de ce seul bus, hors du verrou
+
+            with self.lock:
+                if not self.actif:
+                    return
+                try:
+                    bus.transport.write(frame)
+                    self.trames_envoyees += 1
+                    self.octets_envoyes += len(frame)
+                    if self.delta:
+                        # Instant pris une fois la trame en file : une réponse RPM partie avant
+                        # (pendant l'attente de place) ne peut pas l'acquitter
+                        self.delta_tracker.marquer_envoye(publish_cell, compiled.indices[publish_cell],
+                                                          time.monotonic())
+                    if self.journal_trames:
+                        (self.journal_trame or self.journal)(f"Envoyé{suffixe} → {self.decrire_trame(frame)}")
+                except Exception as e:
+                    # Un port en défaut abandonne le reste de son tick, sans interrompre les autres
+                    self.erreurs_envoi += 1
+                    self.journal(f"Erreur d'envoi{suffixe} ({bus.port}): {e}")
+                    return
+
+    def arreter(self):
+        """Arrête la lecture et envoie les trames d'arrêt (-1) si un envoi était en cours."""
+        self.actif = False  # 🛑 Met tout de suite l'arrêt
+        if self.scheduler:
+            self.scheduler.arreter()  # réveille la lecture si elle attend une échéance
+
+        # Un port tombé n'empêche pas d'arrêter les ventilateurs des autres
+        if not self.session_ouverte:
+            self.journal("Aucun envoi série en cours.")
+            return False
+        if self.bus.core is not None:
+            self.bus.core.executer(self._envoyer_arret)  # les ports asyncio s'écrivent depuis leur boucle
+        else:
+            self._envoyer_arret()
+        return True
+
+    def _envoyer_arret(self):
+        # Le port reste ouvert : l'arrêt se limite aux trames à -1
+        with self.lock:
+            self.bus.vider_file()
+            # Trames d'arrêt complètes, jamais filtrées par l'envoi différentiel ; bus par bus,
+            # l'erreur d'un port n'empêche pas l'arrêt des autres
+            encoder = self.encodeurs[self.protocole]
+            for bus in self.bus.bus:
+                if not bus.transport.connecte:
+                    self.journal(f"⚠ Port {bus.port} non connecté : trames d'arrêt non envoyées.")
+                    continue
+                try:
+                    for _, frame in encoder.compile_stop(bus.cell_ids):
+                        bus.transport.write(frame)
+                        if self.journal_trames:
+                            (self.journal_trame or self.journal)(f"🛑 Arrêt → {self.decrire_trame(frame)}")
+                except Exception as e:
+                    self.journal(f"Erreur lors de l'arrêt série ({bus.port}) : {e}")
+            self.delta_tracker.reinitialiser()
+        self.session_ouverte = False
+        self._consignes_actives(None)
+
+    def _consignes_actives(self, powers):
+        if self.enregistreur is not None:
+            self.enregistreur.definir_consignes(powers)
+
+    def compteurs(self):
+        """(trames, octets, erreurs) envoyés depuis le début de la lecture."""
+        return self.trames_envoyees, self.octets_envoyes, self.erreurs_envoi
+
+    def resume(self):
+        lignes = [self.scheduler.resume()] if self.scheduler else []
+        lignes.append(f"Envoi : {self.trames_envoyees} trames | {self.octets_envoyes / 1024:.1f} ko "
+                      f"| erreurs : {self.erreurs_envoi}")
+        if self.delta:
+            lignes.append(self.delta_tracker.resume())
+        lignes.append(self.bus.resume())
+        return "\n".join(lignes)
+
+    @staticmethod
+    def decrire_trame(frame):
+        if frame.startswith(SYNC):
+            return frame.hex(' ')
+        return frame[:-1].decode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lecture d'un profil GVM sans interface graphique")
+    parser.add_argument("profil", help="Profil .json (statique ou dynamique)")
+    parser.add_argument("--port", action="append",
+                        help=f"Port série (répétable : lignes du mur réparties en bandes), défaut {PORT_SERIE}")
+    parser.add_argument("--region", action="append", metavar="PORT=L0,C0:L1,C1[;...]",
+                        help="Affecte des régions rectangulaires de cellules à un port (remplace --port)")
+    parser.add_argument("--baud", type=int, default=BAUDRATE)
+    parser.add_argument("--periode", type=float, default=1.0, help="Période d'envoi en secondes")
+    parser.add_argument("--boucle", action="store_true", help="Rejoue un profil dynamique indéfiniment")
+    parser.add_argument("--delta", action="store_true", help="Envoi différentiel")
+    parser.add_argument("--protocole", choices=PROTOCOLES, help="Remplace le protocole du profil")
+    parser.add_argument("--courbe", default=CSV_VENTILATEUR, help="Courbe des ventilateurs (CSV)")
+    parser.add_argument("--attente", type=float, default=5.0,
+                        help="Attente maximale de l'ouverture des ports avant de jouer (s)")
+    parser.add_argument("-v", "--verbeux", action="store_true", help="Journalise chaque trame envoyée")
+    parser.add_argument("--regulation", action="store_true",
+                        help="Corrige les indices PWM à chaque tick d'après les RPM mesurés (PI)")
+    parser.add_argument("--telemetrie", metavar="DOSSIER",
+                        help="Archive chaque mesure RPM reçue (un fichier .rpm par jour)")
+    parser.add_argument("--journal", metavar="FICHIER",
+                        help="Journal complet (chaque trame) dans un fichier tournant")
+    parser.add_argument("--metriques", metavar="FICHIER",
+                        help="Active l'instrumentation et l'exporte périodiquement (.prom : Prometheus, sinon JSON)")
+    args = parser.parse_args(argv)
+
+    if args.periode <= 0:
+        parser.error("La période d'envoi doit être un nombre positif (en secondes).")
+    try:
+        profil = Profile.charger(args.profil)
+        if args.protocole:
+            profil.protocole = args.protocole
+        if args.region:
+            affectation = repartir_par_regions(dict(analyser_affectation(r) for r in args.region))
+        else:
+            rows, cols = profil.dimensions()
+            affectation = repartir_par_lignes(rows, cols, args.port or [PORT_SERIE])
+        courbe = FanCurve.from_csv(args.courbe)
+        bus = BusCoordinator(affectation, args.baud, AsyncIOCore.pour_plateforme())
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    engine = GVMEngine(courbe, bus)
+    engine.journal_trames = args.verbeux
+    if args.regulation:
+        engine.regulateur = FanRegulator(courbe)
+    if args.journal:
+        fichier = journal_fichier(args.journal)
+
+        def ecrire(texte):
+            print(texte)
+            fichier.info(texte)
+
+        def trame(texte):
+            if args.verbeux:
+                print(texte)
+            fichier.info(texte)
+
+        # Chaque trame va dans le fichier ; à l'écran seulement avec -v
+        engine.journal, engine.journal_trame = ecrire, trame
+        engine.journal_trames = True
+    if args.telemetrie:
+        engine.enregistreur = TelemetryRecorder(args.telemetrie)
+        engine.enregistreur.start()
+        bus.on_mesures = engine.enregistreur.enregistrer
+    if args.metriques:
+        METRIQUES.activer()
+
+    def exporter_metriques():
+        try:
+            METRIQUES.exporter(args.metriques)
+        except OSError as e:
+            print(f"[ERREUR] Export des métriques impossible : {e}")
+
+    bus.start()
+    limite = time.monotonic() + args.attente
+    while not bus.connecte and time.monotonic() < limite:
+        time.sleep(0.05)
+
+    arret_demande = threading.Event()
+
+    def arreter(signum, frame):
+        arret_demande.set()
+        engine.arreter()
+
+    signal.signal(signal.SIGINT, arreter)
+    signal.signal(signal.SIGTERM, arreter)
+
+    engine.demarrer(profil, args.periode, args.boucle, args.delta)
+    prochain_export = time.monotonic() + INTERVALLE_EXPORT_METRIQUES
+    while engine.en_cours():
+        engine.attendre(0.5)
+        if args.metriques and time.monotonic() >= prochain_export:
+            exporter_metriques()
+            prochain_export += INTERVALLE_EXPORT_METRIQUES
+    if arret_demande.is_set():
+        bus.attendre_vidange()  # les trames d'arrêt partent avant la fermeture des ports
+    print(engine.resume())
+    if args.metriques:
+        exporter_metriques()
+    bus.stop()
+    if engine.enregistreur is not None:
+        engine.enregistreur.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
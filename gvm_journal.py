@@ -0,0 +1,142 @@
+"""
+Journal de lecture borné.
+
+Une ligne par trame envoyée ("Envoyé → {JSON complet}"), c'est plusieurs Mo par
+heure sur un grand mur : le widget Text de l'interface grossissait sans limite
+jusqu'à faire swapper le Raspberry Pi. Ici :
+- JournalSerie garde les lignes à afficher dans un tampon circulaire de taille
+  fixe ; l'interface les extrait toutes d'un coup et les insère en un seul appel,
+  les plus anciennes étant perdues (et comptées) si l'affichage prend du retard ;
+- les lignes par trame sont facultatives : le journal détaillé peut aller dans un
+  fichier tournant (RotatingFileHandler) sans être affiché ;
+- DebitEnvoi résume l'envoi (trames/s, octets/s, erreurs) à la place du détail.
+"""
+
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import deque
+
+CAPACITE_JOURNAL = 1000        # lignes gardées pour l'affichage
+TAILLE_FICHIER = 1024 * 1024   # octets par fichier de journal
+NB_FICHIERS = 3                # fichiers de journal conservés après rotation
+
+
+def journal_fichier(fichier, taille_fichier=TAILLE_FICHIER, nb_fichiers=NB_FICHIERS):
+    """Logger dédié écrivant dans `fichier` avec rotation ; rien ne remonte au logger racine."""
+    handler = logging.handlers.RotatingFileHandler(fichier, maxBytes=taille_fichier,
+                                                   backupCount=nb_fichiers, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger = logging.getLogger(f"gvm.journal.{os.path.abspath(fichier)}")
+    for ancien in logger.handlers[:]:
+        logger.removeHandler(ancien)
+        ancien.close()
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    return logger
+
+
+def fermer_journal_fichier(logger):
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+class JournalSerie:
+    def __init__(self, capacite=CAPACITE_JOURNAL, fichier=None,
+                 taille_fichier=TAILLE_FICHIER, nb_fichiers=NB_FICHIERS):
+        self.capacite = capacite
+        self.afficher_trames = False  # lignes par trame aussi dans l'affichage
+        self.perdues = 0              # lignes écrasées avant d'avoir été affichées
+        self._lignes = deque(maxlen=capacite)
+        self._lock = threading.Lock()
+        self._logger = None
+        if fichier:
+            self.ouvrir_fichier(fichier, taille_fichier, nb_fichiers)
+
+    @property
+    def fichier_actif(self):
+        return self._logger is not None
+
+    def ouvrir_fichier(self, fichier, taille_fichier=TAILLE_FICHIER, nb_fichiers=NB_FICHIERS):
+        """Journal complet (y compris chaque trame) dans `fichier`, avec rotation."""
+        self.fermer_fichier()
+        self._logger = journal_fichier(fichier, taille_fichier, nb_fichiers)
+
+    def fermer_fichier(self):
+        logger, self._logger = self._logger, None
+        if logger is not None:
+            fermer_journal_fichier(logger)
+
+    # --- Écriture (n'importe quel thread) --------------------------------------
+
+    def ecrire(self, texte):
+        """Ligne d'événement : toujours affichée et enregistrée."""
+        self._ajouter(texte)
+        if self._logger is not None:
+            self._logger.info(texte)
+
+    def trame(self, texte):
+        """Ligne par trame : dans le fichier, et à l'écran seulement si afficher_trames."""
+        if self.afficher_trames:
+            self._ajouter(texte)
+        if self._logger is not None:
+            self._logger.info(texte)
+
+    @property
+    def trames_demandees(self):
+        """Faut-il seulement construire les lignes par trame ?"""
+        return self.afficher_trames or self._logger is not None
+
+    def _ajouter(self, texte):
+        with self._lock:
+            if len(self._lignes) == self.capacite:
+                self.perdues += 1
+            self._lignes.append(texte)
+
+    # --- Lecture (thread Tk) ---------------------------------------------------
+
+    def extraire(self):
+        """Toutes les lignes en attente, dans l'ordre ; le tampon est vidé."""
+        with self._lock:
+            if not self._lignes:
+                return []
+            lignes = list(self._lignes)
+            self._lignes.clear()
+        return lignes
+
+    def vider(self):
+        with self._lock:
+            self._lignes.clear()
+
+
+class DebitEnvoi:
+    """Débits d'envoi calculés sur des compteurs cumulés, au plus une fois par intervalle."""
+
+    def __init__(self, intervalle=1.0):
+        self.intervalle = intervalle
+        self.trames_par_seconde = 0.0
+        self.octets_par_seconde = 0.0
+        self._precedent = None  # (instant, trames, octets)
+
+    def mesurer(self, trames, octets, erreurs, maintenant=None):
+        if maintenant is None:
+            maintenant = time.monotonic()
+        if self._precedent is None:
+            self._precedent = (maintenant, trames, octets)
+        else:
+            instant, trames_avant, octets_avant = self._precedent
+            duree = maintenant - instant
+            if duree >= self.intervalle:
+                self.trames_par_seconde = (trames - trames_avant) / duree
+                self.octets_par_seconde = (octets - octets_avant) / duree
+                self._precedent = (maintenant, trames, octets)
+        return (f"Envoi : {self.trames_par_seconde:.1f} trames/s | {self.octets_par_seconde / 1024:.1f} ko/s | "
+                f"{trames} trames au total | erreurs : {erreurs}")
+
+    def reinitialiser(self):
+        self.trames_par_seconde = self.octets_par_seconde = 0.0
+        self._precedent = None
@@ -0,0 +1,181 @@
+"""
+Instrumentation des chemins critiques : compteurs et histogrammes de durées.
+
+Quand le mur se comporte mal, il faut savoir si la boucle d'envoi déborde, si la
+réception prend du retard ou si la boucle Tk est bloquée. Les modules mesurent
+donc leurs points chauds dans l'instance partagée METRIQUES :
+
+    debut = METRIQUES.debut()          # 0.0 si l'instrumentation est coupée
+    ...
+    METRIQUES.fin("reception_lot", debut)
+
+Coupée (par défaut), chaque point de mesure ne coûte qu'un test d'attribut. Les
+histogrammes ont des classes fixes (4 par décade, de 1 µs à 10 s) : enregistrer
+une durée est une recherche dichotomique et un incrément, p50/p99 se lisent sur
+les comptes cumulés. Un instantané s'exporte en JSON ou au format texte de
+Prometheus (collecteur textfile de node_exporter).
+"""
+
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# Bornes supérieures des classes (s) ; au-delà de la dernière, classe de débordement
+BORNES = tuple(10 ** (e / 4) for e in range(-24, 5))
+PREFIXE_PROMETHEUS = "gvm_"
+
+
+class Histogramme:
+    __slots__ = ("comptes", "n", "somme", "max")
+
+    def __init__(self):
+        self.comptes = [0] * (len(BORNES) + 1)
+        self.n = 0
+        self.somme = 0.0
+        self.max = 0.0
+
+    def ajouter(self, duree):
+        self.comptes[bisect.bisect_left(BORNES, duree)] += 1
+        self.n += 1
+        self.somme += duree
+        if duree > self.max:
+            self.max = duree
+
+    def quantile(self, q):
+        """Borne supérieure de la classe contenant le quantile `q` (plafonnée au maximum observé)."""
+        if not self.n:
+            return None
+        rang = q * self.n
+        cumul = 0
+        for i, compte in enumerate(self.comptes):
+            cumul += compte
+            if cumul >= rang and compte:
+                return min(BORNES[i], self.max) if i < len(BORNES) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "n": self.n, "somme_s": self.somme, "max_s": self.max,
+            "p50_s": self.quantile(0.50), "p99_s": self.quantile(0.99),
+            "comptes": self.comptes,
+        }
+
+
+class Metriques:
+    def __init__(self):
+        self.actif = False
+        self.lock = threading.Lock()
+        self.compteurs = {}
+        self.histogrammes = {}
+        self.depuis = time.time()
+
+    def activer(self, actif=True):
+        self.actif = actif
+
+    def reinitialiser(self):
+        with self.lock:
+            self.compteurs = {}
+            self.histogrammes = {}
+            self.depuis = time.time()
+
+    # --- Points de mesure ------------------------------------------------------
+
+    def compter(self, nom, n=1):
+        if not self.actif:
+            return
+        with self.lock:
+            self.compteurs[nom] = self.compteurs.get(nom, 0) + n
+
+    def observer(self, nom, duree):
+        if not self.actif:
+            return
+        with self.lock:
+            histogramme = self.histogrammes.get(nom)
+            if histogramme is None:
+                histogramme = self.histogrammes[nom] = Histogramme()
+            histogramme.ajouter(duree)
+
+    def debut(self):
+        return time.perf_counter() if self.actif else 0.0
+
+    def fin(self, nom, debut):
+        """Durée écoulée depuis `debut` (retour de debut()) ; rien si la mesure n'a pas commencé."""
+        if debut:
+            self.observer(nom, time.perf_counter() - debut)
+
+    def chronometre(self, nom):
+        """Décorateur : durée de chaque appel, pour les fonctions qui ne sont pas dans une boucle serrée."""
+        def decorer(fn):
+            @functools.wraps(fn)
+            def enveloppe(*args, **kwargs):
+                if not self.actif:
+                    return fn(*args, **kwargs)
+                debut = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observer(nom, time.perf_counter() - debut)
+            return enveloppe
+        return decorer
+
+    # --- Lecture et export -----------------------------------------------------
+
+    def instantane(self):
+        with self.lock:
+            return {
+                "date": time.time(),
+                "depuis": self.depuis,
+                "actif": self.actif,
+                "compteurs": dict(self.compteurs),
+                "histogrammes": {nom: h.to_dict() for nom, h in self.histogrammes.items()},
+                "bornes_s": list(BORNES),
+            }
+
+    def resume(self):
+        """Une ligne par mesure, pour le panneau d'exécution."""
+        instantane = self.instantane()
+        lignes = []
+        for nom, h in sorted(instantane["histogrammes"].items()):
+            lignes.append(f"{nom:<18} {h['n']:>7} p50 {_ms(h['p50_s'])} p99 {_ms(h['p99_s'])}")
+        for nom, n in sorted(instantane["compteurs"].items()):
+            lignes.append(f"{nom:<18} {n:>7}")
+        return "\n".join(lignes) if lignes else "Aucune mesure."
+
+    def texte_prometheus(self):
+        instantane = self.instantane()
+        lignes = []
+        for nom, n in sorted(instantane["compteurs"].items()):
+            metrique = f"{PREFIXE_PROMETHEUS}{nom}_total"
+            lignes += [f"# TYPE {metrique} counter", f"{metrique} {n}"]
+        for nom, h in sorted(instantane["histogrammes"].items()):
+            metrique = f"{PREFIXE_PROMETHEUS}{nom}_secondes"
+            lignes.append(f"# TYPE {metrique} histogram")
+            cumul = 0
+            for borne, compte in zip(BORNES, h["comptes"]):
+                cumul += compte
+                lignes.append(f'{metrique}_bucket{{le="{borne:.6g}"}} {cumul}')
+            lignes += [f'{metrique}_bucket{{le="+Inf"}} {h["n"]}',
+                       f"{metrique}_sum {h['somme_s']:.9g}", f"{metrique}_count {h['n']}"]
+        return "\n".join(lignes) + "\n"
+
+    def exporter(self, chemin):
+        """Instantané vers `chemin` : format Prometheus pour .prom, JSON sinon. Remplacement atomique."""
+        if chemin.endswith(".prom"):
+            contenu = self.texte_prometheus()
+        else:
+            contenu = json.dumps(self.instantane(), indent=2)
+        provisoire = f"{chemin}.{os.getpid()}.tmp"
+        with open(provisoire, "w") as f:
+            f.write(contenu)
+        os.replace(provisoire, chemin)  # un collecteur ne lit jamais un fichier à moitié écrit
+
+
+def _ms(secondes):
+    return f"{secondes * 1e3:6.2f} ms" if secondes is not None else "     — ms"
+
+
+# Instance partagée par tous les modules instrumentés
+METRIQUES = Metriques()
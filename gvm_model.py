@@ -0,0 +1,128 @@
+"""
+Modèle numérique du mur de ventilateurs, indépendant de Tk.
+
+Consignes, télémétrie et santé sont rangées dans des tableaux NumPy contigus de
+forme (lignes, colonnes, 9), indexés par (ligne, colonne, ventilateur) à partir
+de 0. Les opérations en masse (tout le mur, un masque) sont vectorisées ;
+depuis_dict() retourne le masque des ventilateurs dont la consigne a changé, que
+l'interface redessine seuls. L'interface n'est qu'une vue sur ce modèle.
+
+Deux couches de consignes (en %) coexistent :
+- "consignes" : la grille éditée (mode création, profil statique) ;
+- "lecture" : ce qui est affiché en exécution (séquence en cours de lecture).
+"""
+
+import time
+
+import numpy as np
+
+from gvm_address import cle_cellule
+
+COUCHES = ("consignes", "lecture")
+
+
+class FanWall:
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        forme = (rows, cols, 9)
+        self.consignes = np.zeros(forme, dtype=np.int16)
+        self.lecture = np.zeros(forme, dtype=np.int16)
+        self.rpm = np.zeros(forme, dtype=np.int32)          # dernière mesure reçue
+        self.vu = np.full((rows, cols), np.nan)             # time.monotonic() de la dernière mesure
+        self.fonctionnel = np.ones(forme, dtype=bool)       # aucun défaut (mis à jour par HealthMonitor)
+        self.cell_ids = [cle_cellule(r, c) for r in range(1, rows + 1) for c in range(1, cols + 1)]
+        self._positions = {cell_id: divmod(i, cols) for i, cell_id in enumerate(self.cell_ids)}
+
+    def __contains__(self, cell_id):
+        return cell_id in self._positions
+
+    def position(self, cell_id):
+        """(ligne, colonne) à partir de 0 ; KeyError si la cellule n'existe pas."""
+        return self._positions[cell_id]
+
+    def cell_id(self, row, col):
+        return self.cell_ids[row * self.cols + col]
+
+    def _couche(self, couche):
+        if couche not in COUCHES:
+            raise ValueError(f"Couche inconnue : {couche}")
+        return getattr(self, couche)
+
+    # --- Masques -------------------------------------------------------------
+
+    def masque_vide(self):
+        return np.zeros((self.rows, self.cols, 9), dtype=bool)
+
+    def masque(self, fans):
+        """Masque booléen à partir d'un itérable de (cell_id, fan_idx)."""
+        masque = self.masque_vide()
+        for cell_id, fan_idx in fans:
+            row, col = self._positions[cell_id]
+            masque[row, col, fan_idx] = True
+        return masque
+
+    def ventilateurs(self, masque):
+        """Liste des (cell_id, fan_idx) sélectionnés par un masque."""
+        return [(self.cell_id(r, c), int(f)) for r, c, f in np.argwhere(masque)]
+
+    # --- Consignes ----------------------------------------------------------
+
+    def set_all(self, pourcentage, couche="consignes"):
+        self._couche(couche)[...] = pourcentage
+
+    def set_mask(self, masque, pourcentage, couche="consignes"):
+        self._couche(couche)[masque] = pourcentage
+
+    def set_fan(self, cell_id, fan_idx, pourcentage, couche="consignes"):
+        row, col = self._positions[cell_id]
+        self._couche(couche)[row, col, fan_idx] = pourcentage
+
+    def puissance(self, cell_id, fan_idx, couche="consignes"):
+        row, col = self._positions[cell_id]
+        return int(self._couche(couche)[row, col, fan_idx])
+
+    def depuis_dict(self, powers, couche="consignes"):
+        """
+        Charge {cell_id: [9 %]} (séquence, profil) ; les cellules inconnues sont ignorées.
+        Retourne le masque des ventilateurs dont la valeur a changé.
+        """
+        cible = self._couche(couche)
+        avant = cible.copy()
+        for cell_id, valeurs in powers.items():
+            position = self._positions.get(cell_id)
+            if position is not None:
+                cible[position] = valeurs
+        return cible != avant
+
+    def en_dict(self, couche="consignes"):
+        """{cell_id: [9 %]} en entiers Python, prêt pour json et les encodeurs de trames."""
+        valeurs = self._couche(couche).tolist()
+        return {cell_id: valeurs[r][c] for cell_id, (r, c) in self._positions.items()}
+
+    # --- Télémétrie et santé -------------------------------------------------
+
+    def enregistrer_telemetrie(self, rpm_values, maintenant=None):
+        """Enregistre {cell_id: [9 RPM]} ; retourne le nombre de cellules connues mises à jour."""
+        if maintenant is None:
+            maintenant = time.monotonic()
+        n = 0
+        for cell_id, rpms in rpm_values.items():
+            position = self._positions.get(cell_id)
+            if position is None or len(rpms) != 9:
+                continue
+            self.rpm[position] = rpms
+            self.vu[position] = maintenant
+            n += 1
+        return n
+
+    def rpm_cellule(self, cell_id):
+        row, col = self._positions[cell_id]
+        return self.rpm[row, col].tolist()
+
+    def rpm_consignes(self, courbe, couche="lecture"):
+        """RPM attendus pour chaque ventilateur, par table de correspondance vectorisée."""
+        table = np.zeros(101, dtype=np.int32)
+        for pourcentage, rpm in courbe.table_rpm.items():
+            table[pourcentage] = rpm
+        return table[np.clip(self._couche(couche), 0, 100)]
@@ -0,0 +1,381 @@
+"""
+Encodage des trames série envoyées au mur de ventilateurs.
+
+Le format historique est une ligne JSON par cellule publiée :
+    {"11": [i1, ..., i9], "12": [...], ..., "Publish": 11}\n
+Toutes les cellules sont présentes dans chaque ligne, seule la clé "Publish"
+change d'une ligne à l'autre. Les trames sont donc compilées une seule fois
+(au chargement ou à la modification d'une séquence) : le corps commun est
+sérialisé une fois, puis seul le champ "Publish" est ajouté pour chaque cellule.
+
+Le mode binaire (optionnel, choisi par mur) envoie une trame courte par cellule :
+    A5 5A | type | cellule (u16) | 9 indices PWM (int8) | CRC-16/CCITT
+et le firmware répond avec une trame RPM du même format (9 RPM en u16).
+
+En mode différentiel, seules les cellules dont les indices PWM ont changé depuis
+le dernier acquittement sont envoyées (une trame courte par cellule), plus un
+rafraîchissement tournant à faible cadence.
+
+Les cellules sont ordonnées et publiées via gvm_address : identifiants historiques
+jusqu'à 9x9, forme étendue au-delà.
+"""
+
+import json
+import math
+import struct
+
+from gvm_address import cle_cellule, publish_id, trier
+
+
+class CompiledFrames:
+    """Trames prêtes à l'envoi pour un jeu de puissances donné."""
+
+    def __init__(self, cell_ids, indices, frames):
+        self.cell_ids = cell_ids    # ordre d'émission
+        self.indices = indices      # {cell_id: [indice PWM x9]}
+        self.frames = frames        # [(publish_cell, bytes), ...] dans l'ordre d'émission
+        self.delta = None           # {cell_id: bytes} trames courtes, voir FrameEncoder.frames_delta
+        self.parties = None         # [CompiledFrames] d'un bus chacune, voir BusCoordinator
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def nb_octets(self):
+        return sum(len(frame) for _, frame in self.frames)
+
+
+class FrameEncoder:
+    """
+    Compile un dictionnaire {cell_id: [pourcentages x9]} en trames JSON.
+    `indice_depuis_pourcentage` convertit un pourcentage (multiple de 5) en indice PWM.
+    """
+
+    def __init__(self, indice_depuis_pourcentage):
+        self.indice_depuis_pourcentage = indice_depuis_pourcentage
+
+    def indices(self, powers):
+        conv = self.indice_depuis_pourcentage
+        return {cell_id: [conv(p) for p in powers[cell_id]] for cell_id in trier(powers)}
+
+    def compile(self, powers):
+        return self.compile_indices(self.indices(powers))
+
+    def compile_indices(self, indices):
+        cell_ids = trier(indices)
+        corps = {cell_id: indices[cell_id] for cell_id in cell_ids}
+        # json.dumps(...) se termine par "}" : on le retire pour y greffer "Publish"
+        prefixe = json.dumps(corps)[:-1].encode('utf-8')
+        prefixe += b', "Publish": ' if corps else b'"Publish": '
+        frames = [
+            (publish_cell, prefixe + str(publish_id(publish_cell)).encode('ascii') + b'}\n')
+            for publish_cell in cell_ids
+        ]
+        return CompiledFrames(cell_ids, indices, frames)
+
+    def compile_stop(self, cell_ids):
+        """Trames d'arrêt : tous les ventilateurs à -1."""
+        return self.compile_indices({cell_id: [-1] * 9 for cell_id in cell_ids})
+
+    def recompiler(self, compiled, indices):
+        """Trames des mêmes cellules avec de nouveaux indices ; en JSON, chaque trame porte tout le corps."""
+        return self.compile_indices(indices)
+
+    def frames_delta(self, compiled):
+        """
+        Trames courtes {"12": [...], "Publish": 12} ne portant que la cellule publiée,
+        utilisées par l'envoi différentiel. Calculées une fois puis gardées dans `compiled`.
+        """
+        if compiled.delta is None:
+            compiled.delta = {
+                cell_id: self.compile_indices({cell_id: compiled.indices[cell_id]}).frames[0][1]
+                for cell_id in compiled.cell_ids
+            }
+        return compiled.delta
+
+
+# ---------------------------------------------------------------------------
+# Protocole binaire compact
+# ---------------------------------------------------------------------------
+
+PROTOCOLE_JSON = "json"
+PROTOCOLE_BINAIRE = "binaire"
+PROTOCOLES = (PROTOCOLE_JSON, PROTOCOLE_BINAIRE)
+
+SYNC = b'\xA5\x5A'
+TYPE_CONSIGNE = 0x01
+TYPE_RPM = 0x02
+
+_ENTETE = struct.Struct('>2sBH')            # sync, type, cellule
+_CONSIGNE = struct.Struct('>2sBH9b')        # + 9 indices PWM signés (-1 = arrêt)
+_RPM = struct.Struct('>2sBH9H')             # + 9 RPM non signés
+_CRC = struct.Struct('>H')
+
+TAILLES_TRAMES = {
+    TYPE_CONSIGNE: _CONSIGNE.size + _CRC.size,
+    TYPE_RPM: _RPM.size + _CRC.size,
+}
+
+
+def _table_crc16():
+    table = []
+    for octet in range(256):
+        crc = octet << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+
+_TABLE_CRC16 = _table_crc16()
+
+
+def crc16_ccitt(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE (polynôme 0x1021, valeur initiale 0xFFFF)."""
+    table = _TABLE_CRC16
+    for octet in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ octet]
+    return crc
+
+
+def _signer(corps):
+    return corps + _CRC.pack(crc16_ccitt(corps[len(SYNC):]))
+
+
+def encoder_trame_consigne(cell_id, indices):
+    return _signer(_CONSIGNE.pack(SYNC, TYPE_CONSIGNE, publish_id(cell_id), *indices))
+
+
+def encoder_trame_rpm(cell_id, rpms):
+    return _signer(_RPM.pack(SYNC, TYPE_RPM, publish_id(cell_id), *rpms))
+
+
+def decoder_trame_binaire(trame):
+    """
+    Décode une trame binaire complète.
+    Retourne (type, cellule, valeurs) ; lève ValueError si la trame est invalide.
+    """
+    if len(trame) < _ENTETE.size or not trame.startswith(SYNC):
+        raise ValueError("Trame binaire tronquée ou sans synchronisation.")
+    _, type_trame, _ = _ENTETE.unpack_from(trame)
+    taille = TAILLES_TRAMES.get(type_trame)
+    if taille is None or len(trame) != taille:
+        raise ValueError(f"Type ou taille de trame inconnu : {type_trame}/{len(trame)}.")
+    (crc,) = _CRC.unpack_from(trame, taille - _CRC.size)
+    if crc != crc16_ccitt(trame[len(SYNC):taille - _CRC.size]):
+        raise ValueError("CRC invalide.")
+    champs = (_CONSIGNE if type_trame == TYPE_CONSIGNE else _RPM).unpack_from(trame)
+    return type_trame, champs[2], list(champs[3:])
+
+
+class BinaryFrameEncoder(FrameEncoder):
+    """Même interface que FrameEncoder, mais une trame binaire de 16 octets par cellule."""
+
+    def compile_indices(self, indices):
+        cell_ids = trier(indices)
+        frames = [(cell_id, encoder_trame_consigne(cell_id, indices[cell_id])) for cell_id in cell_ids]
+        return CompiledFrames(cell_ids, indices, frames)
+
+    def recompiler(self, compiled, indices):
+        # Une trame par cellule : seules celles dont les indices ont changé sont refaites
+        anciens = compiled.indices
+        frames = [(cell_id, frame if indices[cell_id] == anciens[cell_id]
+                   else encoder_trame_consigne(cell_id, indices[cell_id]))
+                  for cell_id, frame in compiled.frames]
+        return CompiledFrames(compiled.cell_ids, indices, frames)
+
+    def frames_delta(self, compiled):
+        # Les trames binaires ne portent déjà qu'une cellule
+        if compiled.delta is None:
+            compiled.delta = dict(compiled.frames)
+        return compiled.delta
+
+
+def creer_encodeur(protocole, indice_depuis_pourcentage):
+    if protocole == PROTOCOLE_BINAIRE:
+        return BinaryFrameEncoder(indice_depuis_pourcentage)
+    if protocole == PROTOCOLE_JSON:
+        return FrameEncoder(indice_depuis_pourcentage)
+    raise ValueError(f"Protocole inconnu : {protocole}")
+
+
+class StreamSplitter:
+    """
+    Découpe un flux d'octets mêlant lignes JSON et trames binaires.
+    Les octets illisibles sont ignorés jusqu'à la prochaine synchronisation ou fin de ligne.
+    """
+
+    TAILLE_LIGNE_MAX = 4096
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.erreurs = 0
+
+    def feed(self, data):
+        buf = self.buffer
+        buf += data
+        messages = []
+        while buf:
+            if buf[0] == SYNC[0]:
+                if len(buf) < _ENTETE.size:
+                    break
+                taille = TAILLES_TRAMES.get(buf[2]) if buf[1] == SYNC[1] else None
+                if taille is None:
+                    del buf[0]
+                    self.erreurs += 1
+                    continue
+                if len(buf) < taille:
+                    break
+                trame = bytes(buf[:taille])
+                try:
+                    decoder_trame_binaire(trame)
+                except ValueError:
+                    del buf[0]
+                    self.erreurs += 1
+                    continue
+                messages.append(trame)
+                del buf[:taille]
+                continue
+
+            fin = buf.find(b'\n')
+            sync = buf.find(SYNC[:1])
+            if sync != -1 and (fin == -1 or sync < fin):
+                # Ligne interrompue par une trame binaire : on l'abandonne
+                del buf[:sync]
+                self.erreurs += 1
+                continue
+            if fin == -1:
+                if len(buf) > self.TAILLE_LIGNE_MAX:
+                    buf.clear()
+                    self.erreurs += 1
+                break
+            ligne = bytes(buf[:fin]).strip()
+            del buf[:fin + 1]
+            if ligne:
+                messages.append(ligne)
+        return messages
+
+
+# ---------------------------------------------------------------------------
+# Envoi différentiel
+# ---------------------------------------------------------------------------
+
+class DeltaTracker:
+    """
+    Mémorise, par cellule, les indices PWM acquittés par le firmware.
+
+    Une cellule est considérée comme acquittée lorsqu'une réponse RPM en provient après
+    la mise en file de sa trame (strictement : une réponse du même instant a pu partir avant). Une cellule non acquittée est réémise après `delai_acquittement`
+    secondes. Le rafraîchissement tournant renvoie chaque cellule au moins toutes les
+    `rafraichissement` secondes (keep-alive).
+    """
+
+    def __init__(self, periode=1.0, rafraichissement=10.0, delai_acquittement=1.0):
+        self.periode = periode
+        self.rafraichissement = rafraichissement
+        self.delai_acquittement = delai_acquittement
+        self.reinitialiser()
+        self.reinitialiser_compteurs()
+
+    def reinitialiser(self):
+        """Oublie tout : le prochain tick renverra toutes les cellules (après un arrêt à -1)."""
+        self.acquittes = {}     # {cell_id: indices confirmés}
+        self.en_attente = {}    # {cell_id: (indices, instant d'envoi)}
+        self._curseur = 0
+
+    def reinitialiser_compteurs(self):
+        # Séparé de reinitialiser() : les compteurs d'une lecture survivent à son arrêt
+        self.trames_envoyees = 0
+        self.trames_evitees = 0
+
+    def resume(self):
+        total = self.trames_envoyees + self.trames_evitees
+        part = f" ({self.trames_evitees / total:.0%} de trames en moins)" if total else ""
+        return f"Différentiel : {self.trames_envoyees} trames envoyées, {self.trames_evitees} évitées{part}"
+
+    def acquitter(self, last_seen):
+        """`last_seen` : {cell_id: instant (time.monotonic) de la dernière réponse RPM}."""
+        for cell_id, (indices, envoi) in list(self.en_attente.items()):
+            if last_seen.get(cell_id, -math.inf) > envoi:
+                self.acquittes[cell_id] = indices
+                del self.en_attente[cell_id]
+
+    def _a_envoyer(self, cell_id, indices, maintenant):
+        if self.acquittes.get(cell_id) == indices:
+            return False
+        attente = self.en_attente.get(cell_id)
+        if attente and attente[0] == indices and maintenant - attente[1] < self.delai_acquittement:
+            return False
+        return True
+
+    def selectionner(self, compiled, maintenant):
+        """Cellules à envoyer pendant ce tick, dans l'ordre d'émission."""
+        cell_ids = compiled.cell_ids
+        choisies = {c for c in cell_ids if self._a_envoyer(c, compiled.indices[c], maintenant)}
+
+        # Rafraîchissement tournant : chaque cellule revient au moins toutes les `rafraichissement` s
+        n = len(cell_ids)
+        if n:
+            quota = max(1, math.ceil(n * self.periode / self.rafraichissement))
+            for _ in range(quota):
+                choisies.add(cell_ids[self._curseur % n])
+                self._curseur += 1
+
+        selection = [c for c in cell_ids if c in choisies]
+        self.trames_evitees += n - len(selection)
+        return selection
+
+    def marquer_envoye(self, cell_id, indices, maintenant):
+        """`maintenant` : instant où la trame a été mise en file, pas celui du début du tick."""
+        self.en_attente[cell_id] = (indices, maintenant)
+        self.trames_envoyees += 1
+
+
+# ---------------------------------------------------------------------------
+# Capacité de la liaison série
+# ---------------------------------------------------------------------------
+
+BITS_PAR_OCTET = 10  # 8N1 : bit de start + 8 bits + bit de stop
+
+
+def taille_trame(protocole, nb_cellules, indice_typique=38):
+    """Taille en octets d'une trame pour un mur carré de nb_cellules (indices PWM à 2 chiffres)."""
+    if protocole == PROTOCOLE_BINAIRE:
+        return TAILLES_TRAMES[TYPE_CONSIGNE]
+    # Clés réelles du mur ("11", "12", ... puis "1.10" au-delà de 9 colonnes)
+    cote = math.isqrt(max(nb_cellules - 1, 0)) + 1
+    indices = {cle_cellule(1 + i // cote, 1 + i % cote): [indice_typique] * 9 for i in range(nb_cellules)}
+    return len(FrameEncoder(None).compile_indices(indices).frames[0][1])
+
+
+def capacite_liaison(baud, nb_cellules, protocole):
+    """
+    Capacité d'une liaison série pour un mur donné.
+    En JSON chaque trame contient tout le mur : sa taille croît avec le nombre de cellules.
+    """
+    octets_par_seconde = baud / BITS_PAR_OCTET
+    octets_trame = taille_trame(protocole, nb_cellules)
+    octets_tick = octets_trame * nb_cellules
+    return {
+        "protocole": protocole,
+        "baud": baud,
+        "cellules": nb_cellules,
+        "octets_trame": octets_trame,
+        "octets_tick": octets_tick,
+        "duree_tick_s": octets_tick / octets_par_seconde,
+        "cellules_par_seconde": octets_par_seconde / octets_trame,
+    }
+
+
+def mur_max(baud, protocole, periode=1.0, limite=10000):
+    """Plus grand nombre de cellules dont toutes les trames tiennent dans une période."""
+    budget = baud / BITS_PAR_OCTET * periode
+    if protocole == PROTOCOLE_BINAIRE:
+        return int(budget // TAILLES_TRAMES[TYPE_CONSIGNE])
+    n = 0
+    while n < limite and taille_trame(protocole, n + 1) * (n + 1) <= budget:
+        n += 1
+    return n
@@ -0,0 +1,209 @@
+"""
+Régulation en boucle fermée des RPM (PI par ventilateur).
+
+En boucle ouverte, l'indice PWM envoyé vient de la seule courbe du CSV : un
+ventilateur usé ou simplement différent tourne moins vite que prévu et le débit
+du mur s'écarte de la consigne. Ici, à chaque tick, l'indice est corrigé à
+partir de l'écart entre le RPM attendu (courbe) et le RPM mesuré :
+
+    indice = indice de la courbe + kp * écart + ki * intégrale de l'écart
+
+- tout le mur est calculé d'un bloc sur des tableaux NumPy (N cellules x 9) ;
+- anti-emballement : l'intégrale est gelée tant que la commande est saturée
+  (bornes de la courbe ou limite de pente) dans le sens de l'écart ;
+- limite de pente : l'indice ne varie pas de plus de `pente_max` par seconde ;
+- un ventilateur sans mesure récente garde sa commande et son intégrale ; un
+  ventilateur éteint (-1) repart de zéro au rallumage ;
+- la courbe du CSV redescend en RPM après son maximum alors que le débit croît
+  encore : les indices de la courbe au-delà de ce maximum (pleine puissance)
+  sont envoyés sans correction.
+
+FanPlant simule la réponse des ventilateurs (courbe du CSV, facteur d'usure par
+ventilateur, premier ordre) pour essayer le régulateur hors ligne :
+
+    python gvm_regulation.py --periode 0.5 --ticks 40
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+ETEINT = -1
+
+
+class PIController:
+    """PI vectorisé : tous les tableaux ont la même forme (un élément par ventilateur)."""
+
+    def __init__(self, forme, kp, ki, indice_max, pente_max=20.0):
+        self.kp = kp
+        self.ki = ki
+        self.indice_max = indice_max
+        self.pente_max = pente_max  # indices PWM par seconde
+        self.integrale = np.zeros(forme)   # tr/min x s
+        self.commande = np.full(forme, np.nan)  # dernier indice (continu) ; NaN : pas encore commandé
+
+    def reinitialiser(self):
+        self.integrale[...] = 0.0
+        self.commande[...] = np.nan
+
+    def calculer(self, indice_ouvert, rpm_cible, rpm_mesure, mesure_valide, dt):
+        """
+        Indices PWM entiers à envoyer. `indice_ouvert` : indice de la courbe (-1 : éteint) ;
+        `mesure_valide` : masque des ventilateurs dont la mesure est récente.
+        """
+        allume = indice_ouvert != ETEINT
+        ecart = np.where(mesure_valide & allume, rpm_cible - rpm_mesure, 0.0)
+
+        brute = indice_ouvert + self.kp * ecart + self.ki * (self.integrale + ecart * dt)
+        # Au (re)démarrage, la pente part de la commande en boucle ouverte
+        precedente = np.where(np.isnan(self.commande), indice_ouvert, self.commande)
+        pas = self.pente_max * dt
+        commande = np.clip(np.clip(brute, precedente - pas, precedente + pas), 0, self.indice_max)
+
+        # Anti-emballement : pas d'intégration si la saturation va dans le sens de l'écart
+        sature = np.sign(brute - commande)
+        integrer = mesure_valide & allume & ((sature == 0) | (sature != np.sign(ecart)))
+        self.integrale = np.where(integrer, self.integrale + ecart * dt, self.integrale)
+
+        self.integrale[~allume] = 0.0
+        self.commande = np.where(allume, commande, np.nan)
+        return np.where(allume, np.rint(commande), ETEINT).astype(np.int16)
+
+
+class FanRegulator:
+    """
+    Branche un PIController sur le chemin d'envoi : indices {cell_id: [9]} de la courbe
+    et télémétrie du bus en entrée, indices corrigés en sortie.
+    """
+
+    def __init__(self, courbe, kp=None, ki=None, pente_max=20.0, age_max=3.0):
+        self.courbe = courbe
+        self.table_rpm = np.asarray(courbe.rpm_values, dtype=float)  # RPM attendu par indice PWM
+        # Gain statique moyen de la courbe (indices par tr/min) : sert d'échelle aux gains par défaut
+        gain = (len(self.table_rpm) - 1) / max(1.0, self.table_rpm[-1] - self.table_rpm[0])
+        self.kp = 0.2 * gain if kp is None else kp
+        self.ki = 0.8 * gain if ki is None else ki
+        self.pente_max = pente_max
+        # La courbe du CSV redescend après son maximum : au-delà, plus d'indice ne veut plus dire plus de RPM
+        self.indice_max = int(np.argmax(self.table_rpm))
+        self.age_max = age_max  # s : au-delà, la mesure n'est plus utilisée
+        self.cell_ids = ()
+        self.pi = None
+        self._dernier = None
+
+    def reinitialiser(self):
+        self.cell_ids = ()
+        self.pi = None
+        self._dernier = None
+
+    def indices(self, indices_ouverts, rpms, vus, maintenant=None):
+        """
+        `indices_ouverts` : {cell_id: [9 indices]} compilés depuis la courbe ;
+        `rpms` / `vus` : get_all_rpms() / get_last_seen() du bus.
+        """
+        if maintenant is None:
+            maintenant = time.monotonic()
+        cell_ids = tuple(indices_ouverts)
+        if cell_ids != self.cell_ids:
+            self.cell_ids = cell_ids
+            self.pi = PIController((len(cell_ids), 9), self.kp, self.ki,
+                                   self.indice_max, self.pente_max)
+            self._dernier = None
+        dt = 0.0 if self._dernier is None else min(maintenant - self._dernier, 2.0)
+        self._dernier = maintenant
+
+        ouvert = np.array([indices_ouverts[c] for c in cell_ids], dtype=float).reshape(-1, 9)
+        mesure = np.zeros_like(ouvert)
+        valide = np.zeros(ouvert.shape, dtype=bool)
+        for i, cell_id in enumerate(cell_ids):
+            valeurs = rpms.get(cell_id)
+            vu = vus.get(cell_id)
+            if valeurs is not None and len(valeurs) == 9 and vu is not None and maintenant - vu <= self.age_max:
+                mesure[i] = valeurs
+                valide[i] = True
+        # Au-delà du maximum de RPM, la courbe ne se régule plus (le débit, lui, croît encore) :
+        # ces indices partent tels quels, sans mesure ni intégration
+        hors_courbe = ouvert > self.indice_max
+        valide &= ~hors_courbe
+        cible = self.table_rpm[np.clip(ouvert, 0, None).astype(int)]
+
+        corriges = self.pi.calculer(ouvert, cible, mesure, valide, dt)
+        corriges[hors_courbe] = ouvert[hors_courbe]
+        self.pi.commande[hors_courbe] = ouvert[hors_courbe]  # la pente repart de l'indice envoyé
+        return dict(zip(cell_ids, corriges.tolist()))
+
+
+class FanPlant:
+    """
+    Ventilateurs simulés : RPM établi = courbe du CSV x facteur d'usure, atteint avec une
+    constante de temps `tau` ; bruit de mesure gaussien optionnel.
+    """
+
+    def __init__(self, forme, courbe, tau=0.8, facteurs=None, bruit=0.0, graine=None):
+        self.table_rpm = np.asarray(courbe.rpm_values, dtype=float)
+        self.tau = tau
+        self.bruit = bruit
+        self.aleatoire = np.random.default_rng(graine)
+        self.facteurs = np.ones(forme) if facteurs is None else np.broadcast_to(facteurs, forme).astype(float)
+        self.rpm = np.zeros(forme)
+
+    @classmethod
+    def usee(cls, forme, courbe, usure=(0.8, 1.0), graine=None, **kwargs):
+        """Facteurs d'usure tirés uniformément dans `usure`."""
+        facteurs = np.random.default_rng(graine).uniform(*usure, size=forme)
+        return cls(forme, courbe, facteurs=facteurs, graine=graine, **kwargs)
+
+    def avancer(self, indices, dt):
+        """Applique les indices PWM pendant `dt` secondes ; retourne les RPM mesurés (entiers)."""
+        indices = np.asarray(indices)
+        etabli = np.where(indices >= 0, self.table_rpm[np.clip(indices, 0, len(self.table_rpm) - 1)], 0.0)
+        self.rpm += (etabli * self.facteurs - self.rpm) * (1.0 - np.exp(-dt / self.tau))
+        mesure = self.rpm + (self.aleatoire.normal(0.0, self.bruit, self.rpm.shape) if self.bruit else 0.0)
+        return np.rint(np.clip(mesure, 0, None)).astype(int)
+
+
+def simuler(courbe, powers, regulateur=None, periode=0.5, ticks=40, plante=None):
+    """
+    Joue `powers` ({cell_id: [9 %]}) sur une FanPlant ; retourne l'écart RPM absolu moyen
+    (ventilateurs allumés) à chaque tick, avec ou sans régulateur.
+    """
+    cell_ids = list(powers)
+    if plante is None:
+        plante = FanPlant.usee((len(cell_ids), 9), courbe, graine=1)
+    ouverts = {c: [courbe.indice_pwm(p) for p in powers[c]] for c in cell_ids}
+    ouvert = np.array([ouverts[c] for c in cell_ids])
+    cible = np.where(ouvert >= 0, plante.table_rpm[np.clip(ouvert, 0, None)], 0.0)
+    rpms, vus, ecarts = {}, {}, []
+    for n in range(ticks):
+        maintenant = n * periode
+        if regulateur is not None:
+            envoyes = regulateur.indices(ouverts, rpms, vus, maintenant)
+            indices = np.array([envoyes[c] for c in cell_ids])
+        else:
+            indices = ouvert
+        mesure = plante.avancer(indices, periode)
+        rpms = dict(zip(cell_ids, mesure.tolist()))
+        vus = dict.fromkeys(cell_ids, maintenant + periode)
+        ecarts.append(float(np.abs(cible - mesure)[ouvert >= 0].mean()))
+    return ecarts
+
+
+if __name__ == "__main__":
+    from gvm_curve import FanCurve
+    from gvm_engine import CSV_VENTILATEUR
+
+    parser = argparse.ArgumentParser(description="Régulation RPM sur un mur simulé (ventilateurs usés)")
+    parser.add_argument("--cellules", type=int, default=100)
+    parser.add_argument("--pourcentage", type=int, default=60, help="Consigne (multiple de 5)")
+    parser.add_argument("--periode", type=float, default=0.5)
+    parser.add_argument("--ticks", type=int, default=40)
+    args = parser.parse_args()
+
+    courbe = FanCurve.from_csv(CSV_VENTILATEUR)
+    powers = {str(i): [args.pourcentage] * 9 for i in range(args.cellules)}
+    ouvert = simuler(courbe, powers, None, args.periode, args.ticks)
+    regule = simuler(courbe, powers, FanRegulator(courbe), args.periode, args.ticks)
+    for n in range(0, args.ticks, max(1, args.ticks // 10)):
+        print(f"t = {n * args.periode:5.1f} s | écart moyen boucle ouverte {ouvert[n]:7.1f} tr/min "
+              f"| régulé {regule[n]:7.1f} tr/min")
@@ -0,0 +1,111 @@
+"""
+Santé des ventilateurs : un seul moteur de règles, évalué sur tout le mur d'un coup.
+
+Après chaque lot de télémétrie (et périodiquement pendant la lecture, pour voir
+les cellules devenues muettes), HealthMonitor compare la mesure de chaque
+ventilateur au RPM attendu par la courbe du CSV pour la consigne affichée :
+
+- "ecart"  : |RPM mesuré - RPM attendu| au-delà de `tolerance` ;
+- "cale"   : consigne non nulle mais RPM sous `seuil_calage` ;
+- "perime" : consigne non nulle mais pas de mesure depuis `age_max` secondes.
+
+Hystérésis : un défaut d'écart ou de calage n'est levé qu'au-delà du seuil et
+retombe seulement en deçà du seuil diminué de `hysteresis` (ou augmenté pour le
+calage). Après un changement de consigne, le ventilateur a `grace` secondes pour
+atteindre sa nouvelle vitesse avant d'être jugé.
+
+Tout est calculé sur des tableaux (lignes, colonnes, 9) ; l'interface et les
+journaux ne consomment que la liste compacte des défauts et des transitions.
+"""
+
+import time
+from collections import namedtuple
+
+import numpy as np
+
+ETEINT, OK, ECART, CALE, PERIME = range(5)
+NOMS_ETATS = ("éteint", "ok", "écart", "calé", "périmé")
+
+Defaut = namedtuple("Defaut", "cell_id fan_idx etat rpm rpm_attendu")
+
+
+class HealthMonitor:
+    def __init__(self, mur, courbe, tolerance=500, hysteresis=150, seuil_calage=300,
+                 age_max=3.0, grace=3.0, couche="lecture"):
+        self.mur = mur          # FanWall : consignes, RPM et instant de la dernière mesure
+        self.courbe = courbe
+        self.tolerance = tolerance
+        self.hysteresis = hysteresis
+        self.seuil_calage = seuil_calage
+        self.age_max = age_max
+        self.grace = grace
+        self.couche = couche
+        forme = mur.rpm.shape
+        self.etat = np.full(forme, ETEINT, dtype=np.int8)
+        self._consignes = np.zeros(forme, dtype=np.int16)   # consignes vues à l'évaluation précédente
+        self._changement = np.full(forme, -np.inf)          # instant du dernier changement de consigne
+
+    def reinitialiser(self):
+        self.etat[...] = ETEINT
+        self._consignes[...] = 0
+        self._changement[...] = -np.inf
+
+    def evaluer(self, maintenant=None):
+        """
+        Recalcule l'état de tous les ventilateurs. Retourne le masque de ceux dont
+        l'état a changé depuis l'évaluation précédente.
+        """
+        if maintenant is None:
+            maintenant = time.monotonic()
+        mur = self.mur
+        consignes = getattr(mur, self.couche)
+        self._changement[consignes != self._consignes] = maintenant
+        self._consignes = consignes.copy()
+
+        allume = consignes > 0
+        attendu = mur.rpm_consignes(self.courbe, self.couche)
+        ecart = np.abs(mur.rpm - attendu)
+        precedent = self.etat
+
+        # Hystérésis : seuils plus stricts pour lever un défaut que pour le garder
+        en_ecart = np.where(precedent == ECART, ecart > self.tolerance - self.hysteresis, ecart > self.tolerance)
+        cale = np.where(precedent == CALE, mur.rpm < self.seuil_calage + self.hysteresis,
+                        mur.rpm < self.seuil_calage)
+        age = maintenant - mur.vu[..., np.newaxis]           # NaN : jamais mesuré
+        perime = np.broadcast_to(~(age <= self.age_max), precedent.shape)
+
+        etat = np.full(precedent.shape, OK, dtype=np.int8)
+        etat[en_ecart] = ECART
+        etat[cale] = CALE       # un ventilateur calé est aussi en écart : le calage prime
+        etat[perime] = PERIME   # sans mesure récente, les deux précédents ne veulent rien dire
+        en_grace = (maintenant - self._changement) < self.grace
+        etat[en_grace & (etat != OK)] = OK
+        etat[~allume] = ETEINT
+
+        self.etat = etat
+        mur.fonctionnel = etat <= OK
+        return etat != precedent
+
+    def defauts(self, masque=None):
+        """Liste compacte [Defaut, ...] des ventilateurs en défaut (dans `masque` s'il est donné)."""
+        en_defaut = self.etat > OK
+        if masque is not None:
+            en_defaut &= masque
+        attendu = self.mur.rpm_consignes(self.courbe, self.couche)
+        return [
+            Defaut(self.mur.cell_id(r, c), int(f), NOMS_ETATS[self.etat[r, c, f]],
+                   int(self.mur.rpm[r, c, f]), int(attendu[r, c, f]))
+            for r, c, f in np.argwhere(en_defaut)
+        ]
+
+    def compter(self):
+        """{nom d'état: nombre de ventilateurs} pour les seuls défauts présents."""
+        comptes = np.bincount(self.etat.ravel(), minlength=len(NOMS_ETATS))
+        return {NOMS_ETATS[etat]: int(comptes[etat]) for etat in (ECART, CALE, PERIME) if comptes[etat]}
+
+    def resume(self):
+        comptes = self.compter()
+        if not comptes:
+            return "✅ Aucun défaut"
+        detail = ", ".join(f"{n} {nom}" for nom, n in comptes.items())
+        return f"⚠ {sum(comptes.values())} défaut(s) : {detail}"
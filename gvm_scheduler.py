@@ -0,0 +1,211 @@
+"""
+Ordonnanceur de lecture des profils, sans dérive.
+
+Toutes les échéances sont absolues et calculées sur time.monotonic() à partir du
+début de chaque séquence : un tick en retard ne décale pas les suivants, et un
+saut de l'horloge système (NTP sur le Raspberry Pi) n'a aucun effet. Les
+frontières de séquences tombent exactement sur leur échéance, même si la durée
+n'est pas un multiple de la période. En lecture en boucle, l'itération suivante
+enchaîne sur la même base de temps, sans trou au rebouclage.
+
+SequenceScheduler.ticks() attend en bloquant le thread appelant ;
+AsyncSequenceScheduler.ticks_async() produit les mêmes ticks depuis une boucle
+asyncio, les attentes n'y occupent aucun thread.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import namedtuple
+
+from gvm_metriques import METRIQUES
+
+# nom : séquence en cours ; numero : tick dans la séquence ; echeance : instant prévu (monotonic)
+# iteration : passage courant dans le plan (1, 2, ... en lecture en boucle)
+Tick = namedtuple("Tick", "nom numero echeance fin_sequence nouvelle_sequence iteration")
+
+ATTENDRE, TICK = "attendre", "tick"  # étapes produites par SequenceScheduler._deroulement
+
+
+class TickStats:
+    """Gigue et dépassements mesurés tick par tick."""
+
+    def __init__(self):
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        self.ticks = 0
+        self.gigue_totale = 0.0
+        self.gigue_max = 0.0
+        self.depassements = 0      # travail d'un tick ayant débordé sur l'échéance suivante
+        self.ticks_sautes = 0      # échéances abandonnées pour rattraper le retard
+
+    def enregistrer_tick(self, gigue):
+        METRIQUES.observer("envoi_gigue", gigue)
+        self.ticks += 1
+        self.gigue_totale += gigue
+        if gigue > self.gigue_max:
+            self.gigue_max = gigue
+
+    def enregistrer_depassement(self, sautes):
+        METRIQUES.compter("envoi_depassements")
+        METRIQUES.compter("envoi_ticks_sautes", sautes)
+        self.depassements += 1
+        self.ticks_sautes += sautes
+
+    @property
+    def gigue_moyenne(self):
+        return self.gigue_totale / self.ticks if self.ticks else 0.0
+
+    def resume(self):
+        return (f"Ticks : {self.ticks} | gigue moy. {self.gigue_moyenne * 1e3:.2f} ms, "
+                f"max {self.gigue_max * 1e3:.2f} ms | dépassements : {self.depassements} "
+                f"({self.ticks_sautes} ticks sautés)")
+
+
+class SequenceScheduler:
+    def __init__(self, periode=1.0, horloge=time.monotonic):
+        if periode <= 0:
+            raise ValueError("La période doit être strictement positive.")
+        self.periode = periode
+        self.horloge = horloge
+        self.stats = TickStats()
+        self.iteration = 0
+        self.debut_lecture = None
+        self._arret = threading.Event()
+
+    def arreter(self):
+        """Interrompt immédiatement l'attente en cours (appelable depuis un autre thread)."""
+        self._arret.set()
+
+    @property
+    def arrete(self):
+        return self._arret.is_set()
+
+    def attendre_jusqu_a(self, echeance):
+        """Attend l'échéance absolue ; retourne False si l'ordonnanceur a été arrêté."""
+        while not self._arret.is_set():
+            reste = echeance - self.horloge()
+            if reste <= 0:
+                return True
+            self._arret.wait(reste)
+        return False
+
+    def ecoule(self):
+        """Temps écoulé depuis le début de la lecture, toutes itérations confondues."""
+        return self.horloge() - self.debut_lecture if self.debut_lecture is not None else 0.0
+
+    def resume(self):
+        ecoule = int(self.ecoule())
+        h, reste = divmod(ecoule, 3600)
+        return (f"Itération {self.iteration} | écoulé {h:02d}:{reste // 60:02d}:{reste % 60:02d}\n"
+                f"{self.stats.resume()}")
+
+    def ticks(self, plan, boucle=False):
+        """
+        Génère les ticks d'un plan [(nom, durée en s), ...] ; une durée None est infinie.
+        Avec boucle=True le plan est rejoué indéfiniment jusqu'à arreter().
+        Le travail du tick est fait par l'appelant entre deux itérations.
+        """
+        etapes = self._deroulement(plan, boucle)
+        reponse = None
+        while True:
+            try:
+                nature, valeur = etapes.send(reponse)
+            except StopIteration:
+                return
+            if nature == ATTENDRE:
+                reponse = self.attendre_jusqu_a(valeur)
+            else:
+                reponse = None
+                yield valeur
+
+    def _deroulement(self, plan, boucle):
+        """
+        Calcul des échéances, commun aux versions bloquante et asyncio.
+        Produit (ATTENDRE, échéance) -- on lui renvoie False si l'attente a été interrompue --
+        puis (TICK, Tick) une fois l'échéance atteinte.
+        """
+        plan = list(plan)
+        if boucle and sum(duree or 0 for _, duree in plan) <= 0:
+            raise ValueError("Un profil lu en boucle doit avoir une durée totale positive.")
+
+        debut = self.debut_lecture = self.horloge()
+        self.iteration = 0
+        while True:
+            self.iteration += 1
+            for nom, duree in plan:
+                fin = debut + duree if duree is not None else math.inf
+                numero = 0
+                while True:
+                    echeance = debut + numero * self.periode
+                    if echeance >= fin:
+                        break
+                    if not (yield ATTENDRE, echeance):
+                        return
+                    self.stats.enregistrer_tick(self.horloge() - echeance)
+
+                    yield TICK, Tick(nom, numero, echeance, fin, numero == 0, self.iteration)
+
+                    numero += 1
+                    apres = self.horloge()
+                    if apres > debut + numero * self.periode:
+                        # Dépassement : on reprend à la prochaine échéance future, sans rafale
+                        suivant = math.ceil((apres - debut) / self.periode)
+                        self.stats.enregistrer_depassement(suivant - numero)
+                        numero = suivant
+                # Frontière de séquence : la suivante commence exactement à l'échéance prévue
+                debut = fin
+            if not boucle or self.arrete:
+                break
+        # La fin du plan tombe elle aussi sur son échéance
+        yield ATTENDRE, debut
+
+
+class AsyncSequenceScheduler(SequenceScheduler):
+    """
+    Même ordonnancement, attendu dans une boucle asyncio : les échéances sont des timers
+    de la boucle et arreter() (appelable depuis n'importe quel thread) réveille l'attente.
+    """
+
+    def __init__(self, periode=1.0, horloge=time.monotonic):
+        super().__init__(periode, horloge)
+        self._boucle = None
+        self._reveil = None
+
+    def arreter(self):
+        super().arreter()
+        if self._boucle is not None:
+            try:
+                self._boucle.call_soon_threadsafe(self._reveil.set)
+            except RuntimeError:
+                pass  # boucle privée déjà fermée (lecture terminée) : plus d'attente à réveiller
+
+    async def attendre_jusqu_a_async(self, echeance):
+        while not self._arret.is_set():
+            reste = echeance - self.horloge()
+            if reste <= 0:
+                return True
+            try:
+                await asyncio.wait_for(self._reveil.wait(), reste)
+            except asyncio.TimeoutError:
+                pass
+        return False
+
+    async def ticks_async(self, plan, boucle=False):
+        """Version asyncio de ticks() : `async for tick in scheduler.ticks_async(plan)`."""
+        self._reveil = asyncio.Event()
+        self._boucle = asyncio.get_running_loop()
+        etapes = self._deroulement(plan, boucle)
+        reponse = None
+        while True:
+            try:
+                nature, valeur = etapes.send(reponse)
+            except StopIteration:
+                return
+            if nature == ATTENDRE:
+                reponse = await self.attendre_jusqu_a_async(valeur)
+            else:
+                reponse = None
+                yield valeur
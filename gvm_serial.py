@@ -0,0 +1,391 @@
+"""
+Transport série partagé et réception des RPM.
+
+Un seul SerialTransport possède le port (/dev/serial0) pendant toute la vie de
+l'application : un thread d'écriture vide une file de trames, un thread de
+lecture alimente les récepteurs (RPMReceiver) et rouvre le port avec un délai
+croissant en cas d'erreur. Démarrer ou arrêter l'envoi ne rouvre plus le port.
+
+La lecture ne dort jamais : elle bloque sur le port et prend d'un coup tout ce
+qui est disponible. RPMReceiver découpe ce bloc en messages et les enregistre en
+une seule prise de verrou.
+
+Chaque lot enregistré incrémente RPMReceiver.version et marque ses cellules comme
+modifiées ; l'abonné `on_change` n'est prévenu qu'au premier lot suivant une
+collecte, ce qui laisse l'interface regrouper les mises à jour.
+"""
+
+import json
+import queue
+import threading
+import time
+
+import serial
+
+from gvm_address import normaliser_cle
+from gvm_metriques import METRIQUES
+from gvm_protocol import SYNC, TYPE_RPM, StreamSplitter, decoder_trame_binaire
+
+PORT_SERIE = '/dev/serial0'
+BAUDRATE = 9600
+
+
+class SerialTransport:
+    def __init__(self, port=PORT_SERIE, baudrate=BAUDRATE, timeout=0.1,
+                 delai_min=0.5, delai_max=30.0, taille_file=1000):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.delai_min = delai_min
+        self.delai_max = delai_max
+        self.serial_conn = None
+        self.recepteurs = []
+        self.file_envoi = queue.Queue(maxsize=taille_file)
+        self.connecte = False
+        self.ouvertures = 0
+        self.octets_envoyes = 0
+        self.erreurs = 0
+        self.trames_perdues = 0  # refusées faute de place dans la file d'envoi
+        self.attentes_place = 0  # write() ne bloque jamais : pas de contre-pression ici
+        self.duree_attente_place = 0.0
+        self._arret = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def reconnexions(self):
+        return max(0, self.ouvertures - 1)
+
+    def ajouter_recepteur(self, callback):
+        """`callback(octets)` est appelé depuis le thread de lecture à chaque bloc reçu."""
+        self.recepteurs.append(callback)
+
+    def start(self):
+        self._arret.clear()
+        self.thread_lecture = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread_ecriture = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread_lecture.start()
+        self.thread_ecriture.start()
+
+    def stop(self):
+        self._arret.set()
+        self._fermer()
+        print("[INFO] Connexion série fermée.")
+
+    def write(self, data):
+        """
+        Met une trame en file d'envoi. Lève ConnectionError si le port n'est pas ouvert et
+        BufferError si la file est pleine : l'appelant tient souvent le verrou du moteur,
+        attendre ici bloquerait aussi l'arrêt demandé depuis l'interface.
+        """
+        if not self.connecte:
+            raise ConnectionError(f"Port série {self.port} non connecté")
+        try:
+            self.file_envoi.put_nowait(data)
+        except queue.Full:
+            self.trames_perdues += 1
+            METRIQUES.compter("serie_trames_perdues")
+            raise BufferError(f"File d'envoi de {self.port} pleine : trame abandonnée") from None
+
+    def vider_file(self):
+        """Abandonne les trames pas encore écrites (ex. avant les trames d'arrêt)."""
+        try:
+            while True:
+                self.file_envoi.get_nowait()
+                self.file_envoi.task_done()
+        except queue.Empty:
+            pass
+
+    def attendre_vidange(self, timeout=5.0):
+        """Attend que toutes les trames en file soient écrites ; retourne False au délai."""
+        limite = time.monotonic() + timeout
+        while self.file_envoi.unfinished_tasks and self.connecte:
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(0.01)
+        return not self.file_envoi.unfinished_tasks
+
+    def statistiques(self):
+        return {
+            "octets_envoyes": self.octets_envoyes,
+            "erreurs": self.erreurs,
+            "reconnexions": self.reconnexions,
+            "trames_perdues": self.trames_perdues,
+            "attentes_place": self.attentes_place,
+            "duree_attente_place": self.duree_attente_place,
+            "en_file": self.file_envoi.qsize(),
+        }
+
+    def _ouvrir(self):
+        conn = serial.Serial(self.port, self.baudrate, timeout=self.timeout)
+        with self._lock:
+            self.serial_conn = conn
+            self.connecte = True
+            self.ouvertures += 1
+        print(f"[INFO] Port série ouvert : {self.port} à {self.baudrate} bauds.")
+
+    def _fermer(self):
+        with self._lock:
+            conn, self.serial_conn = self.serial_conn, None
+            self.connecte = False
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _signaler_erreur(self, contexte, e):
+        self.erreurs += 1
+        print(f"[ERREUR] {contexte} : {e}")
+        self._fermer()
+
+    def read_loop(self):
+        """Ouvre le port (avec délai croissant entre les tentatives) puis lit en continu."""
+        delai = self.delai_min
+        while not self._arret.is_set():
+            if self.serial_conn is None:
+                try:
+                    self._ouvrir()
+                    delai = self.delai_min
+                except Exception as e:
+                    print(f"[ERREUR] Impossible d’ouvrir le port série : {e} (nouvel essai dans {delai:.1f} s)")
+                    self._arret.wait(delai)
+                    delai = min(delai * 2, self.delai_max)
+                    continue
+
+            conn = self.serial_conn
+            try:
+                # Bloque au plus `timeout` pour le premier octet, puis prend tout ce qui est disponible
+                data = conn.read(conn.in_waiting or 1)
+            except Exception as e:
+                if not self._arret.is_set():
+                    self._signaler_erreur("Problème de lecture", e)
+                continue
+            if data:
+                self._distribuer(data)
+
+    def _distribuer(self, data):
+        # Un récepteur qui lève ne doit ni arrêter la lecture ni priver les autres du bloc
+        for callback in self.recepteurs:
+            try:
+                callback(data)
+            except Exception as e:
+                self.erreurs += 1
+                print(f"[ERREUR] Traitement des données reçues sur {self.port} : {e!r}")
+
+    def write_loop(self):
+        while not self._arret.is_set():
+            try:
+                data = self.file_envoi.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Regroupe les trames déjà en attente en une seule écriture
+            morceaux = [data]
+            try:
+                while True:
+                    morceaux.append(self.file_envoi.get_nowait())
+            except queue.Empty:
+                pass
+
+            conn = self.serial_conn
+            try:
+                if conn is None:
+                    continue  # trames périmées : le port est tombé entre-temps
+                paquet = b''.join(morceaux)
+                debut = METRIQUES.debut()
+                conn.write(paquet)
+                METRIQUES.fin("serie_ecriture", debut)
+                METRIQUES.compter("serie_octets_envoyes", len(paquet))
+                self.octets_envoyes += len(paquet)
+            except Exception as e:
+                self._signaler_erreur("Problème d'écriture", e)
+            finally:
+                for _ in morceaux:
+                    self.file_envoi.task_done()
+
+
+class RPMReceiver:
+    def __init__(self, port=PORT_SERIE, baudrate=BAUDRATE):
+        self.port = port
+        self.baudrate = baudrate
+        self.transport = None
+        self.running = False
+        self.splitter = StreamSplitter()  # lignes JSON et trames binaires sur le même port
+        self.data = {}  # {cell_id: [rpm1, rpm2, ..., rpm9]}
+        self.last_seen = {}  # {cell_id: time.monotonic() de la dernière réponse}
+        self.lock = threading.Lock()
+        self.messages_recus = 0
+        self.erreurs_analyse = 0
+        self.version = 0  # incrémentée à chaque lot de mesures
+        self.modifiees = set()  # cellules modifiées depuis la dernière collecte
+        self._on_change = None  # appelé (thread de lecture) quand des mesures attendent une collecte
+        self.on_mesures = None  # (mesures) appelé (thread de lecture) à chaque lot, ex. historique
+        self._mesure_debit = (time.monotonic(), 0)
+        self._debit = 0.0
+
+    def attacher(self, transport):
+        """Reçoit les octets lus par un transport partagé."""
+        self.transport = transport
+        transport.ajouter_recepteur(self.feed)
+        self.running = True
+
+    def start(self):
+        """Utilisation autonome : ouvre son propre transport."""
+        if self.transport is None:
+            self.attacher(SerialTransport(self.port, self.baudrate))
+        self.transport.start()
+        print(f"[INFO] Lecture série démarrée sur {self.port} à {self.baudrate} bauds.")
+
+    def stop(self):
+        self.running = False
+        if self.transport:
+            self.transport.stop()
+
+    def feed(self, data):
+        """Traite un bloc d'octets reçu : tous les messages complets sont enregistrés d'un coup."""
+        debut = METRIQUES.debut()
+        mesures = []
+        for message in self.splitter.feed(data):
+            mesure = self.decoder(message)
+            if mesure is not None:
+                mesures.append(mesure)
+        if mesures:
+            self._enregistrer(mesures)
+        if debut:
+            METRIQUES.fin("reception_lot", debut)
+            METRIQUES.compter("reception_messages", len(mesures))
+
+    def decoder(self, message):
+        """Retourne (cell_id, [9 RPM]) ou None si le message n'est pas une mesure valide."""
+        if isinstance(message, (bytes, bytearray)) and message.startswith(SYNC):
+            return self.decoder_binaire(message)
+        try:
+            data = json.loads(message)
+            cell_id = normaliser_cle(data.get("cell"))  # 11, "11", 267 ou "1.11" -> clé canonique
+            rpm_values = data.get("RPM")
+        except (ValueError, AttributeError, TypeError):  # JSON ou UTF-8 invalide, pas un objet, cellule invalide
+            self.erreurs_analyse += 1
+            print(f"[AVERTISSEMENT] JSON invalide : {message}")
+            return None
+
+        # 9 nombres exactement : la mesure part ensuite dans des tableaux NumPy
+        if (isinstance(rpm_values, list) and len(rpm_values) == 9
+                and all(type(v) in (int, float) for v in rpm_values)):
+            return cell_id, rpm_values
+        self.erreurs_analyse += 1
+        return None
+
+    def decoder_binaire(self, message):
+        try:
+            type_trame, cell, rpm_values = decoder_trame_binaire(message)
+        except ValueError as e:
+            self.erreurs_analyse += 1
+            print(f"[AVERTISSEMENT] Trame binaire invalide ({e}) : {message.hex(' ')}")
+            return None
+        if type_trame == TYPE_RPM:
+            try:
+                return normaliser_cle(cell), rpm_values
+            except ValueError:
+                self.erreurs_analyse += 1
+        return None
+
+    def _enregistrer(self, mesures):
+        maintenant = time.monotonic()
+        with self.lock:
+            prevenir = not self.modifiees
+            for cell_id, rpm_values in mesures:
+                self.data[cell_id] = rpm_values
+                self.last_seen[cell_id] = maintenant
+                self.modifiees.add(cell_id)
+            self.messages_recus += len(mesures)
+            self.version += 1
+        if self.on_mesures is not None:
+            self.on_mesures(mesures)
+        if prevenir and self._on_change is not None:
+            self._on_change()
+
+    @property
+    def on_change(self):
+        return self._on_change
+
+    @on_change.setter
+    def on_change(self, callback):
+        # Des mesures arrivées avant l'abonnement ne préviendraient plus personne : on prévient ici
+        with self.lock:
+            self._on_change = callback
+            en_attente = bool(self.modifiees)
+        if en_attente and callback is not None:
+            callback()
+
+    def collecter_modifications(self):
+        """Retourne (version, {cell_id: rpms}) pour les seules cellules modifiées depuis l'appel précédent."""
+        with self.lock:
+            modifiees = {cell_id: self.data[cell_id] for cell_id in self.modifiees}
+            self.modifiees.clear()
+            return self.version, modifiees
+
+    def handle_message(self, message):
+        debut = METRIQUES.debut()
+        mesure = self.decoder(message)
+        if mesure is not None:
+            self._enregistrer([mesure])
+        METRIQUES.fin("reception_message", debut)
+
+    def get_rpm_for_cell(self, cell_id):
+        with self.lock:
+            return self.data.get(cell_id, None)
+
+    def get_all_rpms(self):
+        with self.lock:
+            return dict(self.data)  # copie du dict
+
+    def get_last_seen(self):
+        with self.lock:
+            return dict(self.last_seen)
+
+    def ages(self):
+        """Âge (s) de la dernière mesure de chaque cellule."""
+        maintenant = time.monotonic()
+        with self.lock:
+            return {cell_id: maintenant - vu for cell_id, vu in self.last_seen.items()}
+
+    def messages_par_seconde(self):
+        """Débit moyen depuis l'appel précédent (recalculé au plus une fois par seconde)."""
+        maintenant = time.monotonic()
+        t0, n0 = self._mesure_debit
+        if maintenant - t0 >= 1.0:
+            n = self.messages_recus
+            self._debit = (n - n0) / (maintenant - t0)
+            self._mesure_debit = (maintenant, n)
+        return self._debit
+
+    def statistiques(self):
+        ages = self.ages()
+        return {
+            "messages": self.messages_recus,
+            "messages_par_seconde": self.messages_par_seconde(),
+            "erreurs": self.erreurs_analyse + self.splitter.erreurs,
+            "age_max": max(ages.values()) if ages else None,
+            "ages": ages,
+        }
+
+    def resume(self):
+        stats = self.statistiques()
+        age = f"{stats['age_max']:.1f} s" if stats['age_max'] is not None else "—"
+        return (f"Réception : {stats['messages_par_seconde']:.1f} msg/s | erreurs : {stats['erreurs']} "
+                f"| mesure la plus ancienne : {age}")
+
+
+# Exemple d'utilisation
+if __name__ == "__main__":
+    receiver = RPMReceiver()
+    receiver.start()
+
+    try:
+        while True:
+            time.sleep(5)
+            print("[INFO] Valeurs RPM stockées :")
+            print(receiver.get_all_rpms())
+    except KeyboardInterrupt:
+        print("\n[INFO] Arrêt demandé par l'utilisateur.")
+    finally:
+        receiver.stop()
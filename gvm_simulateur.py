@@ -0,0 +1,404 @@
+"""
+Simulateur du mur de ventilateurs sur pseudo-terminal (matériel dans la boucle).
+
+WallSimulator ouvre une paire pty et se comporte, côté esclave, comme le bus des
+contrôleurs de cellules : l'application (interface, gvm_engine, moniteur) ouvre
+le chemin de l'esclave comme un vrai port série.
+
+- Trames reçues : lignes JSON {"11": [...], ..., "Publish": n} et trames binaires
+  de consigne. Comme le firmware, seule la cellule désignée par "Publish" retient
+  ses 9 indices ; -1 arrête le ventilateur.
+- Ventilateurs : FanPlant (gvm_regulation), RPM établi lu dans data_value_fan.csv
+  et atteint avec une constante de temps `tau`.
+- Réponses : chaque cellule renvoie ses 9 RPM toutes les `periode_rpm` secondes,
+  au format de la dernière trame reçue (ligne JSON {"cell", "RPM"} ou trame
+  binaire RPM).
+- Liaison : lecture et écriture limitées à baud / 10 octets par seconde ; un
+  émetteur trop bavard est freiné comme par un vrai UART (baud = 0 : sans limite).
+- Défauts injectables : ventilateur calé, usure (facteur de vitesse), cellule
+  muette, réponses corrompues.
+
+Usage :
+    python gvm_simulateur.py serveur --taille 5x5 [--cale 11:3] [--muette 23]
+    python gvm_simulateur.py charge [--tailles 3 5 10 15 20] [--protocole binaire]
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+import numpy as np
+
+from gvm_address import CellAddress, cle_cellule, normaliser_cle
+from gvm_curve import FanCurve
+from gvm_engine import CSV_VENTILATEUR
+from gvm_protocol import (PROTOCOLE_BINAIRE, PROTOCOLE_JSON, PROTOCOLES, SYNC, TYPE_CONSIGNE, StreamSplitter,
+                          decoder_trame_binaire, encoder_trame_rpm)
+from gvm_regulation import FanPlant
+from gvm_serial import BAUDRATE
+
+
+class WallSimulator:
+    def __init__(self, rows, cols, courbe, baud=BAUDRATE, periode_rpm=0.5, tau=0.8, graine=None):
+        self.rows = rows
+        self.cols = cols
+        self.baud = baud
+        self.periode_rpm = periode_rpm
+        self.cell_ids = [cle_cellule(r, c) for r in range(1, rows + 1) for c in range(1, cols + 1)]
+        self.positions = {cell_id: i for i, cell_id in enumerate(self.cell_ids)}
+        self.publish = [CellAddress(r, c).publish for r in range(1, rows + 1) for c in range(1, cols + 1)]
+        self.plante = FanPlant((len(self.cell_ids), 9), courbe, tau=tau)
+        self.indices = np.full((len(self.cell_ids), 9), -1, dtype=int)
+        self.aleatoire = random.Random(graine)
+
+        # Défauts injectés
+        self.muettes = set()
+        self.taux_corruption = 0.0
+
+        # Compteurs
+        self.trames_recues = 0
+        self.trames_appliquees = 0
+        self.octets_recus = 0
+        self.reponses = 0
+        self.octets_envoyes = 0
+        self.erreurs = 0
+
+        self.format_reponse = PROTOCOLE_JSON
+        self.maitre = self.esclave = None
+        self.chemin = None
+        self._splitter = StreamSplitter()
+        self._sortie = bytearray()
+        self._arret = threading.Event()
+        self.thread = None
+
+    # --- Cycle de vie --------------------------------------------------------
+
+    def start(self):
+        """Ouvre la paire pty et démarre le simulateur ; retourne le chemin à ouvrir côté application."""
+        self.maitre, self.esclave = os.openpty()
+        tty.setraw(self.maitre)
+        tty.setraw(self.esclave)
+        fcntl.fcntl(self.maitre, fcntl.F_SETFL, fcntl.fcntl(self.maitre, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self.chemin = os.ttyname(self.esclave)
+        self._arret.clear()
+        self.thread = threading.Thread(target=self._boucle, daemon=True)
+        self.thread.start()
+        return self.chemin
+
+    def stop(self):
+        self._arret.set()
+        if self.thread is not None:
+            self.thread.join(2.0)
+        for fd in (self.maitre, self.esclave):
+            if fd is not None:
+                os.close(fd)
+        self.maitre = self.esclave = None
+
+    # --- Défauts -------------------------------------------------------------
+
+    def _cible(self, cell_id, fan_idx):
+        i = self.positions[normaliser_cle(cell_id)]
+        return (i, slice(None)) if fan_idx is None else (i, fan_idx)
+
+    def caler(self, cell_id, fan_idx=None):
+        """Ventilateur (ou cellule) bloqué : sa vitesse retombe à 0 quelle que soit la consigne."""
+        self.plante.facteurs[self._cible(cell_id, fan_idx)] = 0.0
+
+    def user(self, cell_id, facteur, fan_idx=None):
+        """Ventilateur usé : ne tourne qu'à `facteur` de la vitesse de la courbe."""
+        self.plante.facteurs[self._cible(cell_id, fan_idx)] = facteur
+
+    def reparer(self, cell_id=None):
+        if cell_id is None:
+            self.plante.facteurs[...] = 1.0
+            self.muettes.clear()
+        else:
+            self.plante.facteurs[self._cible(cell_id, None)] = 1.0
+            self.muettes.discard(normaliser_cle(cell_id))
+
+    def rendre_muette(self, cell_id):
+        """La cellule applique toujours ses consignes mais ne répond plus."""
+        self.muettes.add(normaliser_cle(cell_id))
+
+    # --- Boucle --------------------------------------------------------------
+
+    def _boucle(self):
+        octets_par_seconde = self.baud / 10 if self.baud else None
+        plafond = 4096  # octets de crédit accumulables : rafales courtes comme un tampon d'UART
+        credit_entree = credit_sortie = plafond
+        dernier = time.monotonic()
+        prochaine_reponse = dernier
+        while not self._arret.is_set():
+            lire = [self.maitre] if octets_par_seconde is None or credit_entree >= 1 else []
+            ecrire = [self.maitre] if self._sortie and (octets_par_seconde is None or credit_sortie >= 1) else []
+            try:
+                prets, prets_ecriture, _ = select.select(lire, ecrire, [], 0.005)
+            except (OSError, ValueError):
+                return
+            maintenant = time.monotonic()
+            dt = maintenant - dernier
+            dernier = maintenant
+            if octets_par_seconde is not None:
+                credit_entree = min(plafond, credit_entree + dt * octets_par_seconde)
+                credit_sortie = min(plafond, credit_sortie + dt * octets_par_seconde)
+
+            if prets:
+                taille = 65536 if octets_par_seconde is None else max(1, int(credit_entree))
+                try:
+                    data = os.read(self.maitre, taille)
+                except (BlockingIOError, InterruptedError):
+                    data = b''
+                except OSError:
+                    return  # esclave fermé
+                self.octets_recus += len(data)
+                if octets_par_seconde is not None:
+                    credit_entree -= len(data)
+                for message in self._splitter.feed(data):
+                    self._appliquer(message)
+
+            rpm = self.plante.avancer(self.indices, dt)
+
+            # Les réponses d'un cycle ne s'empilent pas si la liaison n'a pas fini d'écrire le précédent
+            if maintenant >= prochaine_reponse and len(self._sortie) < plafond:
+                self._sortie += self._reponses(rpm)
+                prochaine_reponse = maintenant + self.periode_rpm
+
+            if prets_ecriture and self._sortie:
+                taille = len(self._sortie) if octets_par_seconde is None else int(credit_sortie)
+                try:
+                    n = os.write(self.maitre, self._sortie[:taille])
+                except (BlockingIOError, InterruptedError):
+                    n = 0
+                except OSError:
+                    return
+                del self._sortie[:n]
+                self.octets_envoyes += n
+                if octets_par_seconde is not None:
+                    credit_sortie -= n
+
+    def _appliquer(self, message):
+        """Comme le firmware : la cellule publiée retient ses 9 indices, les autres ignorent la trame."""
+        self.trames_recues += 1
+        try:
+            if message.startswith(SYNC):
+                type_trame, publish, indices = decoder_trame_binaire(message)
+                if type_trame != TYPE_CONSIGNE:
+                    return
+                self.format_reponse = PROTOCOLE_BINAIRE
+            else:
+                trame = json.loads(message)
+                publish = trame["Publish"]
+                indices = trame[CellAddress.depuis_publish(publish).key]
+                self.format_reponse = PROTOCOLE_JSON
+            i = self.positions[CellAddress.depuis_publish(publish).key]
+            if len(indices) != 9:
+                raise ValueError("9 indices attendus")
+        except (ValueError, KeyError, TypeError):
+            self.erreurs += 1
+            return
+        self.indices[i] = indices
+        self.trames_appliquees += 1
+
+    def _reponses(self, rpm):
+        paquet = bytearray()
+        binaire = self.format_reponse == PROTOCOLE_BINAIRE
+        for i, cell_id in enumerate(self.cell_ids):
+            if cell_id in self.muettes:
+                continue
+            valeurs = rpm[i].tolist()
+            if binaire:
+                reponse = bytearray(encoder_trame_rpm(cell_id, [min(v, 0xFFFF) for v in valeurs]))
+            else:
+                reponse = bytearray(json.dumps({"cell": self.publish[i], "RPM": valeurs}).encode() + b"\n")
+            if self.taux_corruption and self.aleatoire.random() < self.taux_corruption:
+                reponse[self.aleatoire.randrange(len(reponse) - 1)] ^= 0x5A
+            paquet += reponse
+            self.reponses += 1
+        return paquet
+
+
+# ---------------------------------------------------------------------------
+# Banc de charge
+# ---------------------------------------------------------------------------
+
+def percentile(valeurs, p):
+    return float(np.percentile(valeurs, p)) if valeurs else None
+
+
+def charge(tailles=(3, 5, 10, 15, 20), protocole=PROTOCOLE_BINAIRE, baud=BAUDRATE, periode=0.2,
+           duree=6.0, tolerance=0.05, tau=0.8):
+    """
+    Pour chaque mur n x n : joue un profil 30 % puis 70 % à travers le simulateur et mesure
+    la latence consigne -> RPM (de l'envoi de la séquence à 70 % jusqu'à la première mesure
+    reçue à `tolerance` près de la vitesse attendue, par cellule) et les débits de la liaison.
+    """
+    from gvm_async import AsyncIOCore
+    from gvm_bus import BusCoordinator, repartir_par_lignes
+    from gvm_engine import GVMEngine, Profile
+
+    courbe = FanCurve.from_csv(CSV_VENTILATEUR)
+    cible = courbe.rpm_consigne(70)
+    resultats = []
+    avertir_debit(baud)
+    print(f"Protocole {protocole}, {baud or 'sans limite'} bauds, période {periode} s, tolérance {tolerance:.0%}")
+    print(f"{'mur':>6} {'trames/s':>9} {'ko/s reçus':>11} {'RPM/s':>8} {'latence p50':>12} "
+          f"{'p95':>7} {'max':>7} {'convergées':>11}")
+    for n in tailles:
+        simulateur = WallSimulator(n, n, courbe, baud, tau=tau)
+        chemin = simulateur.start()
+        core = AsyncIOCore.pour_plateforme()
+        bus = BusCoordinator(repartir_par_lignes(n, n, [chemin]), baud or BAUDRATE, core)
+        engine = GVMEngine(courbe, bus, journal=lambda texte: None)
+        engine.journal_trames = False
+
+        debut_70 = [None]
+        convergence = {}
+
+        def sequence(nom, powers):
+            if nom == "haut":
+                debut_70[0] = time.monotonic()
+
+        def mesures(lot):
+            t0 = debut_70[0]
+            if t0 is None:
+                return
+            maintenant = time.monotonic()
+            for cell_id, rpms in lot:
+                if cell_id not in convergence and all(abs(r - cible) <= tolerance * cible for r in rpms):
+                    convergence[cell_id] = maintenant - t0
+
+        engine.on_sequence = sequence
+        bus.on_mesures = mesures
+        bus.start()
+        limite = time.monotonic() + 5.0
+        while not bus.connecte and time.monotonic() < limite:
+            time.sleep(0.01)
+
+        cellules = simulateur.cell_ids
+        profil = Profile(sequences={
+            "bas": {"powers": {c: [30] * 9 for c in cellules}, "duration": 2},
+            "haut": {"powers": {c: [70] * 9 for c in cellules}, "duration": duree},
+        }, protocole=protocole)
+        trames_avant = octets_avant = messages_avant = 0
+        t_mesure = None
+        engine.demarrer(profil, periode)
+        while engine.en_cours():
+            if t_mesure is None and debut_70[0] is not None:
+                # Débits mesurés sur la séquence à 70 % seulement
+                t_mesure = time.monotonic()
+                trames_avant, octets_avant = simulateur.trames_appliquees, simulateur.octets_recus
+                messages_avant = bus.statistiques()["messages"]
+            engine.attendre(0.05)
+        ecoule = time.monotonic() - (t_mesure or time.monotonic())
+        trames_s = (simulateur.trames_appliquees - trames_avant) / ecoule if ecoule else 0.0
+        ko_s = (simulateur.octets_recus - octets_avant) / 1024 / ecoule if ecoule else 0.0
+        rpm_s = (bus.statistiques()["messages"] - messages_avant) / ecoule if ecoule else 0.0
+
+        engine.arreter()
+        bus.attendre_vidange(2.0)
+        bus.stop()
+        if core is not None:
+            core.stop()
+        simulateur.stop()
+
+        latences = sorted(convergence.values())
+        resultat = {
+            "taille": f"{n}x{n}", "cellules": n * n, "trames_par_seconde": trames_s,
+            "ko_par_seconde": ko_s, "rpm_par_seconde": rpm_s,
+            "latence_p50_s": percentile(latences, 50), "latence_p95_s": percentile(latences, 95),
+            "latence_max_s": latences[-1] if latences else None, "convergees": len(latences),
+            "erreurs_simulateur": simulateur.erreurs,
+        }
+        resultats.append(resultat)
+
+        def s(v):
+            return f"{v:7.2f}" if v is not None else "      —"
+        print(f"{resultat['taille']:>6} {trames_s:>9.1f} {ko_s:>11.2f} {rpm_s:>8.1f} {s(resultat['latence_p50_s']):>12} "
+              f"{s(resultat['latence_p95_s'])} {s(resultat['latence_max_s'])} {len(latences):>6}/{n * n}")
+    return resultats
+
+
+def avertir_debit(baud):
+    """Un débit simulé différent de la liaison réelle donne des mesures que le mur n'atteindra pas."""
+    if baud != BAUDRATE:
+        simule = f"{baud} bauds" if baud else "un débit illimité"
+        print(f"⚠ Simulation à {simule} alors que la liaison réelle est à {BAUDRATE} bauds "
+              f"(gvm_serial.BAUDRATE) : latences et débits non représentatifs du mur.")
+
+
+def analyser_cible(texte):
+    """"11" ou "11:3" (ventilateur 1 à 9) -> (cell_id, fan_idx ou None)."""
+    cell_id, _, ventilateur = texte.partition(":")
+    return normaliser_cle(cell_id), (int(ventilateur) - 1 if ventilateur else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mur de ventilateurs simulé sur pseudo-terminal")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_serveur = sous.add_parser("serveur", help="Ouvre un pty et simule le mur jusqu'à Ctrl+C")
+    p_serveur.add_argument("--taille", default="3x3", help="LIGNESxCOLONNES")
+    p_serveur.add_argument("--baud", type=int, default=BAUDRATE, help="Débit simulé (0 = sans limite)")
+    p_serveur.add_argument("--periode-rpm", type=float, default=0.5, help="Période des réponses RPM (s)")
+    p_serveur.add_argument("--tau", type=float, default=0.8, help="Constante de temps des ventilateurs (s)")
+    p_serveur.add_argument("--cale", action="append", default=[], metavar="CELLULE[:V]")
+    p_serveur.add_argument("--usure", action="append", default=[], metavar="CELLULE[:V]=FACTEUR")
+    p_serveur.add_argument("--muette", action="append", default=[], metavar="CELLULE")
+    p_serveur.add_argument("--corruption", type=float, default=0.0, help="Part des réponses corrompues")
+
+    p_charge = sous.add_parser("charge", help="Latence consigne -> RPM et débits de 3x3 à 20x20")
+    p_charge.add_argument("--tailles", type=int, nargs="+", default=[3, 5, 10, 15, 20])
+    p_charge.add_argument("--protocole", choices=PROTOCOLES, default=PROTOCOLE_BINAIRE)
+    p_charge.add_argument("--baud", type=int, default=BAUDRATE,
+                          help=f"Débit simulé (0 = sans limite), défaut {BAUDRATE} comme la liaison réelle")
+    p_charge.add_argument("--periode", type=float, default=0.2, help="Période d'envoi (s)")
+    p_charge.add_argument("--duree", type=float, default=6.0, help="Durée de la séquence mesurée (s)")
+    p_charge.add_argument("--json", metavar="FICHIER", help="Écrit les résultats en JSON")
+
+    args = parser.parse_args(argv)
+    if args.commande == "charge":
+        resultats = charge(args.tailles, args.protocole, args.baud, args.periode, args.duree)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(resultats, f, indent=2)
+        return 0
+
+    try:
+        rows, cols = (int(v) for v in args.taille.lower().split("x"))
+        simulateur = WallSimulator(rows, cols, FanCurve.from_csv(CSV_VENTILATEUR), args.baud,
+                                   args.periode_rpm, args.tau)
+        for texte in args.cale:
+            simulateur.caler(*analyser_cible(texte))
+        for texte in args.usure:
+            cible, _, facteur = texte.partition("=")
+            cell_id, fan_idx = analyser_cible(cible)
+            simulateur.user(cell_id, float(facteur), fan_idx)
+        for texte in args.muette:
+            simulateur.rendre_muette(texte)
+    except (ValueError, KeyError) as e:
+        parser.error(f"Configuration invalide : {e}")
+    simulateur.taux_corruption = args.corruption
+
+    avertir_debit(args.baud)
+    chemin = simulateur.start()
+    print(f"🧪 Mur {rows}x{cols} simulé sur {chemin} ({args.baud or 'sans limite'} bauds)")
+    print(f"   python gvm_engine.py profil.json --port {chemin}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"Trames reçues : {simulateur.trames_recues} (appliquées {simulateur.trames_appliquees}, "
+                  f"erreurs {simulateur.erreurs}) | réponses : {simulateur.reponses}")
+    except KeyboardInterrupt:
+        print("\n[INFO] Arrêt du simulateur.")
+    simulateur.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
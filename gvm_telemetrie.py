@@ -0,0 +1,241 @@
+"""
+Enregistrement de l'historique de télémétrie RPM.
+
+RPMReceiver ne garde que la dernière mesure de chaque cellule ; pour suivre
+l'usure des ventilateurs sur des semaines, chaque mesure reçue est ajoutée ici,
+horodatée et accompagnée de la consigne active à cet instant, à un fichier
+binaire en ajout seul :
+- enregistrements de taille fixe (dtype structuré NumPy, petit-boutiste), un
+  fichier par jour dans le dossier d'archive ;
+- TelemetryRecorder.enregistrer() est appelé depuis la lecture série et ne fait
+  que déposer le lot dans une file ; un thread d'écriture convertit et écrit par
+  blocs, au plus tous les `periode_flush` secondes ;
+- TelemetryReader ouvre les fichiers par np.memmap : les mesures étant rangées
+  par date, une fenêtre de temps se trouve par recherche dichotomique sur la
+  colonne des dates, sans lire ni analyser le reste du fichier.
+
+Les dates viennent de l'horloge murale (time.time()), qui peut reculer : resynchro
+NTP d'un Raspberry Pi sans horloge sauvegardée, réglage manuel. La recherche
+dichotomique suppose une colonne t croissante ; l'enregistreur la garantit donc :
+une date antérieure à la dernière écrite (y compris dans l'archive existante au
+démarrage) est ramenée à celle-ci et comptée dans `retours_horloge`. Les mesures
+reçues pendant le recul partagent alors une même date, au lieu de casser la
+recherche sur tout le fichier.
+"""
+
+import datetime
+import glob
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from gvm_address import adresse, cle_cellule
+
+ENREGISTREMENT = np.dtype([
+    ("t", "<f8"),             # time.time() de réception
+    ("ligne", "<u2"),         # adresse de la cellule, à partir de 1
+    ("colonne", "<u2"),
+    ("rpm", "<i4", (9,)),
+    ("consigne", "<i2", (9,)),  # % actif à la réception, -1 si aucune lecture en cours
+])
+
+MAGIC = b"GVMRPM\x00\x01"
+ENTETE = struct.Struct("<8sI52x")  # 64 octets : signature, taille d'un enregistrement
+SUFFIXE = ".rpm"
+SANS_CONSIGNE = [-1] * 9
+
+
+def nom_fichier(t):
+    return datetime.date.fromtimestamp(t).strftime("%Y%m%d") + SUFFIXE
+
+
+class TelemetryRecorder:
+    def __init__(self, dossier, periode_flush=1.0, taille_bloc=4096):
+        self.dossier = dossier
+        self.periode_flush = periode_flush
+        self.taille_bloc = taille_bloc  # enregistrements accumulés avant écriture anticipée
+        self.enregistrees = 0
+        self.erreurs = 0
+        self.retours_horloge = 0  # lots datés avant le précédent (horloge murale reculée)
+        self._dernier_t = None    # dernière date écrite : la colonne t ne décroît jamais
+        self._consignes = {}  # {cell_id: [9 %]} de la séquence en cours
+        self._file = queue.SimpleQueue()
+        self._arret = threading.Event()
+        self._fichier = None
+        self._nom = None
+        self.thread = None
+        os.makedirs(dossier, exist_ok=True)
+
+    def start(self):
+        self._dernier_t = self._derniere_date_archivee()
+        self._arret.clear()
+        self.thread = threading.Thread(target=self._boucle_ecriture, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        self._arret.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self._fermer()
+
+    def definir_consignes(self, powers):
+        """Consignes en cours ({cell_id: [9 %]}, vide à l'arrêt) ; remplacées d'un bloc."""
+        self._consignes = powers or {}
+
+    def enregistrer(self, mesures):
+        """Lot [(cell_id, [9 RPM]), ...] reçu : appelé depuis la lecture série, ne bloque jamais."""
+        consignes = self._consignes
+        self._file.put((time.time(), [(cell_id, rpm, consignes.get(cell_id, SANS_CONSIGNE))
+                                      for cell_id, rpm in mesures]))
+
+    # --- Thread d'écriture -----------------------------------------------------
+
+    def _boucle_ecriture(self):
+        en_attente, n = [], 0
+        prochaine = time.monotonic() + self.periode_flush
+        while True:
+            try:
+                t, lot = self._file.get(timeout=min(0.5, max(0.0, prochaine - time.monotonic())))
+                en_attente.append((t, lot))
+                n += len(lot)
+            except queue.Empty:
+                pass
+            arret = self._arret.is_set()
+            if not arret and n < self.taille_bloc and time.monotonic() < prochaine:
+                continue
+            if arret:  # ce qui est encore en file part avec le dernier bloc
+                try:
+                    while True:
+                        en_attente.append(self._file.get_nowait())
+                except queue.Empty:
+                    pass
+            if en_attente:
+                self._ecrire(en_attente)
+                en_attente, n = [], 0
+            if arret:
+                return
+            prochaine = time.monotonic() + self.periode_flush
+
+    def _derniere_date_archivee(self):
+        chemins = TelemetryReader(self.dossier).fichiers()
+        if not chemins:
+            return None
+        try:
+            donnees = TelemetryReader.projeter(chemins[-1])
+        except (OSError, ValueError):
+            return None
+        return float(donnees["t"][-1]) if len(donnees) else None
+
+    def _ecrire(self, lots):
+        # Les lots d'un même jour sont écrits d'un bloc ; une écriture par changement de jour
+        par_fichier = {}
+        lots.sort(key=lambda t_lot: t_lot[0])  # lots de plusieurs ports : colonne t croissante
+        for t, lot in lots:
+            if self._dernier_t is not None and t < self._dernier_t:
+                if not self.retours_horloge:
+                    print(f"[AVERTISSEMENT] L'horloge a reculé de {self._dernier_t - t:.1f} s : mesures "
+                          f"datées du dernier enregistrement jusqu'à ce qu'elle le rattrape.")
+                self.retours_horloge += 1
+                t = self._dernier_t
+            self._dernier_t = t
+            par_fichier.setdefault(nom_fichier(t), []).append((t, lot))
+        for nom, lots_du_jour in par_fichier.items():
+            n = sum(len(lot) for _, lot in lots_du_jour)
+            enregistrements = np.empty(n, dtype=ENREGISTREMENT)
+            i = 0
+            for t, lot in lots_du_jour:
+                for cell_id, rpm, consigne in lot:
+                    try:
+                        a = adresse(cell_id)
+                        enregistrements[i] = (t, a.row, a.col, rpm, consigne)
+                    except (ValueError, TypeError):
+                        self.erreurs += 1
+                        continue
+                    i += 1
+            try:
+                fichier = self._ouvrir(nom)
+                fichier.write(enregistrements[:i].tobytes())
+                fichier.flush()
+                self.enregistrees += i
+            except OSError as e:
+                self.erreurs += i
+                print(f"[ERREUR] Écriture de la télémétrie impossible : {e}")
+                self._fermer()
+
+    def _ouvrir(self, nom):
+        if self._nom != nom:
+            self._fermer()
+            chemin = os.path.join(self.dossier, nom)
+            fichier = open(chemin, "ab")
+            if fichier.tell() == 0:
+                fichier.write(ENTETE.pack(MAGIC, ENREGISTREMENT.itemsize))
+            else:
+                # Un arrêt brutal peut laisser un enregistrement incomplet : on repart aligné
+                excedent = (fichier.tell() - ENTETE.size) % ENREGISTREMENT.itemsize
+                if excedent:
+                    fichier.truncate(fichier.tell() - excedent)
+            self._fichier, self._nom = fichier, nom
+        return self._fichier
+
+    def _fermer(self):
+        fichier, self._fichier, self._nom = self._fichier, None, None
+        if fichier is not None:
+            fichier.close()
+
+
+class TelemetryReader:
+    """Lecture de l'archive par projection mémoire, fenêtre de temps par fenêtre de temps."""
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+
+    def fichiers(self, debut=None, fin=None):
+        chemins = sorted(glob.glob(os.path.join(self.dossier, "*" + SUFFIXE)))
+        if debut is not None:
+            chemins = [c for c in chemins if os.path.basename(c) >= nom_fichier(debut)]
+        if fin is not None:
+            chemins = [c for c in chemins if os.path.basename(c) <= nom_fichier(fin)]
+        return chemins
+
+    @staticmethod
+    def projeter(chemin):
+        """Enregistrements d'un fichier en np.memmap (lecture seule), sans les lire."""
+        with open(chemin, "rb") as f:
+            entete = f.read(ENTETE.size)
+        magic, taille = ENTETE.unpack(entete) if len(entete) == ENTETE.size else (None, None)
+        if magic != MAGIC or taille != ENREGISTREMENT.itemsize:
+            raise ValueError(f"{chemin} : fichier de télémétrie invalide ou d'une autre version")
+        n = (os.path.getsize(chemin) - ENTETE.size) // taille  # ignore un enregistrement incomplet
+        if n == 0:
+            return np.empty(0, dtype=ENREGISTREMENT)
+        return np.memmap(chemin, dtype=ENREGISTREMENT, mode="r", offset=ENTETE.size, shape=(n,))
+
+    def fenetre(self, cell_id=None, debut=None, fin=None):
+        """
+        Copie des enregistrements de [debut, fin] (time.time()), pour une cellule ou toutes.
+        Seules les pages de la fenêtre sont lues : recherche dichotomique sur la colonne t.
+        """
+        morceaux = []
+        for chemin in self.fichiers(debut, fin):
+            donnees = self.projeter(chemin)
+            t = donnees["t"]
+            i0 = 0 if debut is None else int(np.searchsorted(t, debut, side="left"))
+            i1 = len(t) if fin is None else int(np.searchsorted(t, fin, side="right"))
+            tranche = donnees[i0:i1]
+            if cell_id is not None:
+                a = adresse(cell_id)
+                tranche = tranche[(tranche["ligne"] == a.row) & (tranche["colonne"] == a.col)]
+            morceaux.append(np.array(tranche))
+        if not morceaux:
+            return np.empty(0, dtype=ENREGISTREMENT)
+        return np.concatenate(morceaux)
+
+    def cellules(self, debut=None, fin=None):
+        """Cellules présentes dans la fenêtre, en clés canoniques."""
+        enregistrements = self.fenetre(None, debut, fin)
+        paires = np.unique(np.stack([enregistrements["ligne"], enregistrements["colonne"]], axis=1), axis=0)
+        return {cle_cellule(int(r), int(c)) for r, c in paires}
@@ -0,0 +1,58 @@
+import pytest
+
+from gvm_address import CellAddress, adresse, cle_cellule, normaliser_cle, publish_id, trier
+
+
+@pytest.mark.parametrize("row, col, cle, publish", [
+    (1, 1, "11", 11),
+    (9, 9, "99", 99),
+    (1, 10, "1.10", 266),
+    (10, 1, "10.1", 2561),
+    (1, 11, "1.11", 267),
+    (11, 1, "11.1", 2817),
+    (255, 255, "255.255", 65535),
+])
+def test_cles_et_identifiants(row, col, cle, publish):
+    a = CellAddress(row, col)
+    assert (a.key, a.publish) == (cle, publish)
+    assert adresse(cle) == a
+    assert adresse(publish) == a
+    assert adresse(str(publish)) == a
+    assert CellAddress.depuis_publish(publish) == a
+    assert cle_cellule(row, col) == cle
+    assert normaliser_cle(publish) == cle
+    assert publish_id(cle) == publish
+
+
+def test_aller_retour_sur_tout_un_mur():
+    vues = set()
+    for row in range(1, 21):
+        for col in range(1, 21):
+            a = CellAddress(row, col)
+            assert a.publish < 0x10000  # tient dans le u16 des trames binaires
+            assert adresse(a.key) == adresse(a.publish) == a
+            vues.add(a.publish)
+    assert len(vues) == 400
+
+
+def test_plus_d_ambiguite_au_dela_de_9x9():
+    # Ancien schéma f"{ligne}{colonne}" : (1, 11) et (11, 1) donnaient tous deux "111"
+    assert CellAddress(1, 11).key != CellAddress(11, 1).key
+    assert CellAddress(1, 11).publish != CellAddress(11, 1).publish
+
+
+def test_ordre_d_emission():
+    assert trier(["2.10", "11", "1.10", "21", 12, "10.1"]) == ["11", 12, "1.10", "21", "2.10", "10.1"]
+
+
+@pytest.mark.parametrize("valeur", ["10", "0", 20, "a1", "1.", "0.3", "1.256", 0, -1])
+def test_identifiants_invalides(valeur):
+    with pytest.raises(ValueError):
+        adresse(valeur)
+
+
+def test_parse():
+    a = CellAddress(3, 12)
+    assert CellAddress.parse(a) is a
+    assert CellAddress.parse("3.12") == CellAddress.parse(3 * 256 + 12) == a
+    assert str(a) == "3.12"
@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import pytest
+
+from gvm_bus import BusCoordinator, analyser_affectation, repartir_par_lignes, repartir_par_regions
+from gvm_engine import GVMEngine
+from gvm_protocol import FrameEncoder
+
+
+def indice(pourcentage):
+    return -1 if pourcentage == 0 else pourcentage // 5
+
+
+def test_repartir_par_lignes():
+    affectation = repartir_par_lignes(5, 2, ["A", "B"])
+    assert affectation == {"A": ["11", "12", "21", "22", "31", "32"], "B": ["41", "42", "51", "52"]}
+    assert repartir_par_lignes(2, 2, ["A", "B", "C"]) == {"A": ["11", "12"], "B": ["21", "22"], "C": []}
+    with pytest.raises(ValueError):
+        repartir_par_lignes(2, 2, [])
+
+
+def test_repartir_par_regions():
+    affectation = repartir_par_regions({"A": [(1, 1, 2, 2)], "B": [(3, 2, 3, 1), (1, 10, 1, 10)]})
+    assert affectation == {"A": ["11", "12", "21", "22"], "B": ["31", "32", "1.10"]}
+    with pytest.raises(ValueError, match="22"):
+        repartir_par_regions({"A": [(1, 1, 2, 2)], "B": [(2, 2, 3, 3)]})
+
+
+def test_analyser_affectation():
+    assert analyser_affectation("/dev/ttyUSB0=1,1:5,10;6,1") == ("/dev/ttyUSB0", [(1, 1, 5, 10), (6, 1, 6, 1)])
+    for texte in ("/dev/ttyUSB0", "=1,1:2,2", "/dev/ttyUSB0=0,1:2,2"):
+        with pytest.raises(ValueError):
+            analyser_affectation(texte)
+
+
+@pytest.fixture
+def coordinateur():
+    # Transports construits mais jamais démarrés : aucun port n'est ouvert
+    return BusCoordinator(repartir_par_lignes(4, 2, ["A", "B"]))
+
+
+def test_compilation_par_bus(coordinateur):
+    powers = {cell_id: [50] * 9 for cell_id in coordinateur.bus_par_cellule}
+    compiled = coordinateur.compiler(FrameEncoder(indice), powers)
+    assert compiled.cell_ids == sorted(powers)
+    # Trames entrelacées bus par bus, chacune ne portant que les cellules de son bus
+    assert [coordinateur.bus_de(c).port for c, _ in compiled] == ["A", "B"] * 4
+    for cell_id, trame in compiled:
+        cellules = set(json.loads(trame)) - {"Publish"}
+        assert cellules == set(coordinateur.bus_de(cell_id).cell_ids)
+
+    with pytest.raises(ValueError, match="51"):
+        coordinateur.compiler(FrameEncoder(indice), {"51": [50] * 9})
+    with pytest.raises(ValueError):
+        BusCoordinator({"A": ["11", "12"], "B": ["12"]})
+    with pytest.raises(ValueError):
+        BusCoordinator({})
+
+
+def test_statistiques_envoi_par_bus(coordinateur):
+    coordinateur.bus[1].transport.trames_perdues = 3
+    stats = coordinateur.statistiques()
+    assert stats["trames_perdues"] == 3 and stats["attentes_place"] == 0
+    assert stats["bus"]["B"]["transport"]["trames_perdues"] == 3
+    assert "[B] Transport : 0 en file | perdues : 3" in coordinateur.resume()
+
+
+class TransportFactice:
+    def __init__(self, bloque=False):
+        self.connecte = True
+        self.trames = []
+        self.libre = asyncio.Event()
+        if not bloque:
+            self.libre.set()
+
+    async def attendre_place(self):
+        await self.libre.wait()
+
+    def write(self, data):
+        self.trames.append(data)
+
+
+def test_un_bus_sature_ne_retient_pas_les_autres(coordinateur, courbe):
+    engine = GVMEngine(courbe, coordinateur, journal=lambda texte: None)
+    engine.journal_trames = False
+    engine.actif = True
+    powers = {cell_id: [50] * 9 for cell_id in coordinateur.bus_par_cellule}
+    compiled = engine.compiler(powers, "json")
+
+    async def tick():
+        lent, rapide = TransportFactice(bloque=True), TransportFactice()
+        coordinateur.bus[0].transport, coordinateur.bus[1].transport = lent, rapide
+        envoi = asyncio.ensure_future(engine.envoyer_trames(compiled))
+        for _ in range(20):
+            await asyncio.sleep(0)
+        # Le bus A attend de la place ; le bus B a reçu tout son tick
+        assert len(rapide.trames) == 4 and not lent.trames
+        lent.libre.set()
+        await asyncio.wait_for(envoi, 1.0)
+        return lent, rapide
+
+    lent, rapide = asyncio.run(tick())
+    assert len(lent.trames) == 4
+    assert engine.compteurs()[0] == 8
+
+
+# --- Régulation : recompilation partielle ---------------------------------------
+
+class RegulateurFactice:
+    def __init__(self):
+        self.corrections = {}
+
+    def reinitialiser(self):
+        pass
+
+    def indices(self, indices_ouverts, rpms, vus, maintenant=None):
+        return {cell_id: [i + self.corrections.get(cell_id, 0) for i in valeurs]
+                for cell_id, valeurs in indices_ouverts.items()}
+
+
+@pytest.mark.parametrize("protocole", ["json", "binaire"])
+def test_regulation_ne_recompile_que_ce_qui_change(coordinateur, courbe, protocole):
+    engine = GVMEngine(courbe, coordinateur, journal=lambda texte: None)
+    engine.protocole = protocole
+    engine.regulateur = regulateur = RegulateurFactice()
+    encodeur = engine.encodeurs[protocole]
+    powers = {cell_id: [50] * 9 for cell_id in coordinateur.bus_par_cellule}
+    compiled = engine.compiler(powers, protocole)
+    encodeur.frames_delta(compiled)
+
+    # Indices inchangés : les trames de la courbe servent telles quelles
+    assert engine.reguler(compiled) is compiled
+    assert engine.reguler(compiled) is compiled
+
+    # Une cellule du bus B corrigée : le bus A garde ses trames, B est recompilé
+    regulateur.corrections = {"32": 2}
+    regule = engine.reguler(compiled)
+    assert regule.parties[0] is compiled.parties[0]
+    indices = dict(compiled.indices, **{"32": [i + 2 for i in compiled.indices["32"]]})
+    assert regule.indices == indices
+    for bus, partie in zip(coordinateur.bus, regule.parties):
+        assert partie.frames == encodeur.compile_indices(bus.sous_ensemble(indices)).frames
+    assert sorted(regule.frames) == sorted(f for partie in regule.parties for f in partie.frames)
+    assert regule.delta == encodeur.frames_delta(encodeur.compile_indices(indices))
+    if protocole == "binaire":
+        # Trames binaires : seule celle de la cellule modifiée est refaite
+        changees = [c for (c, a), (_, b) in zip(compiled.frames, regule.frames) if a is not b]
+        assert changees == ["32"]
+
+    # Tick suivant sans nouvelle correction : rien n'est recompilé
+    assert engine.reguler(compiled) is regule
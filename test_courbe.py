@@ -0,0 +1,57 @@
+import pytest
+
+from gvm_curve import POURCENTAGES, FanCurve
+
+
+def tables_historiques(courbe):
+    """Ancien calcul (min(...) sur toute la liste, puis list.index) servant de référence."""
+    valeurs = list(courbe.airflow_values)
+    step = (valeurs[-1] - valeurs[0]) / 19
+    reduit = [0.0, valeurs[0]]
+    reduit += [min(valeurs, key=lambda x: abs(x - (valeurs[0] + i * step))) for i in range(1, 19)]
+    reduit.append(valeurs[-1])
+    indices = {p: -1 if reduit[p // 5] == 0 else valeurs.index(reduit[p // 5]) for p in POURCENTAGES}
+    return reduit, indices
+
+
+def test_tables_identiques_a_l_ancien_calcul(courbe):
+    reduit, indices = tables_historiques(courbe)
+    assert list(courbe.airflow_percentage) == reduit
+    assert dict(courbe.table_indices) == indices
+    for pourcentage in POURCENTAGES:
+        idx = indices[pourcentage]
+        assert courbe.indice_pwm(pourcentage) == idx
+        assert courbe.rpm_consigne(pourcentage) == (0 if idx == -1 else courbe.rpm_values[idx])
+        assert courbe.debit(pourcentage) == reduit[pourcentage // 5]
+
+
+def test_egalites_et_valeurs_repetees():
+    # Débits répétés et points équidistants : le premier indice du CSV l'emporte, comme list.index
+    debits = [1.0, 1.0, 2.0, 2.0, 3.0, 5.0, 5.0, 8.0]
+    courbe = FanCurve(range(len(debits)), [100 * i for i in range(len(debits))], debits)
+    reduit, indices = tables_historiques(courbe)
+    assert list(courbe.airflow_percentage) == reduit
+    assert dict(courbe.table_indices) == indices
+
+
+@pytest.mark.parametrize("pourcentage", [-5, 3, 105, None, "50"])
+def test_pourcentage_invalide(courbe, pourcentage):
+    with pytest.raises(ValueError):
+        courbe.indice_pwm(pourcentage)
+
+
+def test_tables_en_lecture_seule(courbe):
+    with pytest.raises(TypeError):
+        courbe.table_indices[50] = 0
+
+
+def test_lecture_csv(tmp_path):
+    chemin = tmp_path / "courbe.csv"
+    chemin.write_bytes("PWM (%);RPM (tr/min);Débit d'air (m3/s)\n0;100;1,5\nligne;invalide\n1;200;x\n"
+                       "2;300;2,5\n".encode("latin-1"))
+    courbe = FanCurve.from_csv(str(chemin))
+    assert courbe.pwm_values == (0, 2)
+    assert courbe.rpm_values == (100, 300)
+    assert courbe.airflow_values == (1.5, 2.5)
+    with pytest.raises(ValueError):
+        FanCurve([0], [100], [1.0])
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from gvm_bus import BusCoordinator, repartir_par_lignes
+from gvm_engine import GVMEngine, Profile
+
+
+class TransportFactice:
+    connecte = True
+
+    def __init__(self):
+        self.trames = []
+
+    def write(self, data):
+        self.trames.append(data)
+
+    def vider_file(self):
+        pass
+
+
+@pytest.fixture
+def engine(courbe):
+    bus = BusCoordinator(repartir_par_lignes(2, 2, ["A"]))  # transports à threads, jamais démarrés
+    bus.bus[0].transport = TransportFactice()
+    engine = GVMEngine(courbe, bus, journal=lambda texte: None)
+    engine.journal_trames = False
+    engine.fins = []
+    engine.on_fin = lambda: engine.fins.append(engine.actif)
+    return engine
+
+
+def trames(engine):
+    return [json.loads(trame) for trame in engine.bus.bus[0].transport.trames]
+
+
+def arrets(engine):
+    return [t for t in trames(engine) if all(v == [-1] * 9 for k, v in t.items() if k != "Publish")]
+
+
+def test_fin_du_profil(engine):
+    powers = {c: [50] * 9 for c in ("11", "12", "21", "22")}
+    engine.jouer(Profile(sequences={"a": {"powers": powers, "duration": 0.05}}), periode=0.02)
+    assert engine.fins == [False]
+    assert not engine.actif and not engine.session_ouverte
+    assert len(trames(engine)) == 12 and not arrets(engine)
+
+
+def test_erreur_pendant_la_lecture(engine):
+    # Cellule affectée à aucun port : la compilation échoue au premier tick
+    profil = Profile(sequences={"a": {"powers": {"11": [50] * 9, "33": [50] * 9}, "duration": 5}})
+    engine.jouer(profil, periode=0.02)
+    assert engine.fins == [False]
+    assert not engine.actif and not engine.session_ouverte
+    assert len(arrets(engine)) == 4  # ventilateurs remis à -1, comme pour un arrêt
+    assert engine.arreter() is False
+
+
+def test_arret_par_l_utilisateur(engine):
+    engine.demarrer(Profile(grid={"11": [50] * 9}), periode=0.02)
+    engine.attendre(0.05)
+    assert engine.arreter() is True
+    engine.attendre(1.0)
+    assert not engine.en_cours()
+    assert engine.fins == []  # arreter() a déjà remis l'état en ordre
+    assert len(arrets(engine)) == 4
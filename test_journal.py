@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from gvm_journal import DebitEnvoi, JournalSerie
+
+
+def test_tampon_borne():
+    journal = JournalSerie(capacite=3)
+    for i in range(5):
+        journal.ecrire(f"ligne {i}")
+    assert journal.extraire() == ["ligne 2", "ligne 3", "ligne 4"]
+    assert journal.perdues == 2
+    assert journal.extraire() == []
+
+
+def test_ecritures_concurrentes():
+    journal = JournalSerie(capacite=100000)
+
+    def ecrire(n):
+        for i in range(1000):
+            journal.ecrire(f"{n}:{i}")
+
+    threads = [threading.Thread(target=ecrire, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    lues = []
+    while any(thread.is_alive() for thread in threads):
+        lues += journal.extraire()
+    lues += journal.extraire()
+    assert len(lues) == 4000 and journal.perdues == 0
+    for n in range(4):
+        assert [ligne for ligne in lues if ligne.startswith(f"{n}:")] == [f"{n}:{i}" for i in range(1000)]
+
+
+def test_lignes_par_trame(tmp_path):
+    journal = JournalSerie()
+    assert not journal.trames_demandees
+    journal.trame("Envoyé → 1")
+    assert journal.extraire() == []
+    journal.afficher_trames = True
+    journal.trame("Envoyé → 2")
+    assert journal.extraire() == ["Envoyé → 2"]
+
+    # Fichier : toutes les lignes, y compris les trames non affichées
+    journal.afficher_trames = False
+    fichier = tmp_path / "journal.log"
+    journal.ouvrir_fichier(str(fichier))
+    assert journal.trames_demandees
+    journal.trame("Envoyé → 3")
+    journal.ecrire("🛑 Arrêt")
+    journal.fermer_fichier()
+    assert not journal.fichier_actif
+    contenu = fichier.read_text(encoding="utf-8").splitlines()
+    assert [ligne.split(" ", 2)[2] for ligne in contenu] == ["Envoyé → 3", "🛑 Arrêt"]
+    assert journal.extraire() == ["🛑 Arrêt"]
+
+
+def test_rotation_du_fichier(tmp_path):
+    fichier = tmp_path / "journal.log"
+    journal = JournalSerie(fichier=str(fichier), taille_fichier=200, nb_fichiers=2)
+    for i in range(50):
+        journal.trame(f"Envoyé → trame {i:03d}")
+    journal.fermer_fichier()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["journal.log", "journal.log.1", "journal.log.2"]
+    assert "trame 049" in fichier.read_text(encoding="utf-8")
+
+
+def test_debit_envoi():
+    debit = DebitEnvoi(intervalle=1.0)
+    debit.mesurer(0, 0, 0, maintenant=10.0)
+    debit.mesurer(5, 500, 0, maintenant=10.5)  # moins d'un intervalle : pas de nouvelle mesure
+    assert debit.trames_par_seconde == 0.0
+    texte = debit.mesurer(20, 2048, 1, maintenant=12.0)
+    assert debit.trames_par_seconde == pytest.approx(10.0)
+    assert debit.octets_par_seconde == pytest.approx(1024.0)
+    assert "20 trames au total" in texte and "erreurs : 1" in texte
+    debit.reinitialiser()
+    assert debit.trames_par_seconde == 0.0
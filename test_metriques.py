@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from gvm_metriques import BORNES, Histogramme, Metriques
+
+
+def test_classes_de_l_histogramme():
+    assert BORNES[0] == pytest.approx(1e-6) and BORNES[-1] == pytest.approx(10.0)
+    h = Histogramme()
+    assert h.quantile(0.5) is None
+    for duree in [1e-3] * 98 + [0.5, 20.0]:
+        h.ajouter(duree)
+    assert h.n == 100 and h.max == 20.0
+    assert h.somme == pytest.approx(0.098 + 20.5)
+    assert h.quantile(0.5) == pytest.approx(1e-3)  # borne supérieure de la classe de 1 ms
+    assert h.quantile(0.99) == pytest.approx(10 ** (-1 / 4))  # 0.5 s : classe ]0.32, 0.56]
+    assert h.quantile(1.0) == 20.0                # classe de débordement : maximum observé
+    assert h.comptes[-1] == 1
+
+
+def test_quantile_plafonne_au_maximum():
+    h = Histogramme()
+    h.ajouter(0.0012)
+    assert h.quantile(0.5) == 0.0012
+
+
+def test_instrumentation_coupee():
+    metriques = Metriques()
+    assert metriques.debut() == 0.0
+    metriques.compter("trames")
+    metriques.observer("envoi", 0.1)
+    metriques.fin("envoi", metriques.debut())
+    assert metriques.instantane()["compteurs"] == {}
+    assert metriques.instantane()["histogrammes"] == {}
+    assert metriques.resume() == "Aucune mesure."
+
+
+def test_mesures_et_chronometre():
+    metriques = Metriques()
+    metriques.activer()
+    metriques.compter("trames", 3)
+    metriques.compter("trames")
+    metriques.fin("envoi", metriques.debut())
+
+    @metriques.chronometre("calcul")
+    def calcul(x):
+        return 2 * x
+
+    assert calcul(21) == 42
+    instantane = metriques.instantane()
+    assert instantane["compteurs"] == {"trames": 4}
+    assert {nom: h["n"] for nom, h in instantane["histogrammes"].items()} == {"envoi": 1, "calcul": 1}
+    assert "trames" in metriques.resume()
+    metriques.reinitialiser()
+    assert metriques.instantane()["compteurs"] == {}
+
+
+def test_export_prometheus(tmp_path):
+    metriques = Metriques()
+    metriques.activer()
+    metriques.compter("trames", 7)
+    for duree in (1e-3, 2e-3, 0.5):
+        metriques.observer("envoi", duree)
+    texte = metriques.texte_prometheus()
+    lignes = texte.splitlines()
+    assert "# TYPE gvm_trames_total counter" in lignes
+    assert "gvm_trames_total 7" in lignes
+    assert "# TYPE gvm_envoi_secondes histogram" in lignes
+    seaux = [ligne for ligne in lignes if ligne.startswith("gvm_envoi_secondes_bucket")]
+    assert len(seaux) == len(BORNES) + 1
+    cumuls = [int(ligne.rsplit(" ", 1)[1]) for ligne in seaux]
+    assert cumuls == sorted(cumuls) and cumuls[-1] == 3  # comptes cumulés, +Inf = total
+    assert seaux[-1] == 'gvm_envoi_secondes_bucket{le="+Inf"} 3'
+    assert "gvm_envoi_secondes_count 3" in lignes
+
+    chemin = tmp_path / "gvm.prom"
+    metriques.exporter(str(chemin))
+    assert chemin.read_text() == texte
+    chemin = tmp_path / "gvm.json"
+    metriques.exporter(str(chemin))
+    assert json.loads(chemin.read_text())["compteurs"] == {"trames": 7}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["gvm.json", "gvm.prom"]  # pas de fichier provisoire
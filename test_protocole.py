@@ -0,0 +1,154 @@
+import json
+
+import pytest
+
+from gvm_protocol import (SYNC, TAILLES_TRAMES, TYPE_CONSIGNE, TYPE_RPM, BinaryFrameEncoder, DeltaTracker,
+                          FrameEncoder, StreamSplitter, crc16_ccitt, creer_encodeur, decoder_trame_binaire,
+                          encoder_trame_consigne, encoder_trame_rpm)
+
+POWERS = {"12": [10] * 9, "11": [0, 5, 10, 15, 20, 25, 30, 35, 40], "21": [100] * 9}
+
+
+def indice(pourcentage):
+    return -1 if pourcentage == 0 else pourcentage // 5
+
+
+def test_crc16_ccitt_false():
+    assert crc16_ccitt(b"123456789") == 0x29B1  # valeur de contrôle de CRC-16/CCITT-FALSE
+    assert crc16_ccitt(b"") == 0xFFFF
+
+
+def test_trames_json_compilees():
+    compiled = FrameEncoder(indice).compile(POWERS)
+    assert compiled.cell_ids == ["11", "12", "21"]
+    assert [cell_id for cell_id, _ in compiled.frames] == compiled.cell_ids
+    for cell_id, trame in compiled.frames:
+        assert trame.endswith(b"\n")
+        contenu = json.loads(trame)
+        assert contenu.pop("Publish") == int(cell_id)
+        assert contenu == {c: [indice(p) for p in POWERS[c]] for c in POWERS}
+    assert compiled.nb_octets == sum(len(trame) for _, trame in compiled)
+
+
+def test_trames_binaires_aller_retour():
+    trame = encoder_trame_consigne("23", [-1, 0, 1, 2, 3, 4, 5, 6, 127])
+    assert trame.startswith(SYNC) and len(trame) == TAILLES_TRAMES[TYPE_CONSIGNE]
+    assert decoder_trame_binaire(trame) == (TYPE_CONSIGNE, 23, [-1, 0, 1, 2, 3, 4, 5, 6, 127])
+
+    trame = encoder_trame_rpm("1.10", [0, 9000, 65535] * 3)
+    assert len(trame) == TAILLES_TRAMES[TYPE_RPM]
+    assert decoder_trame_binaire(trame) == (TYPE_RPM, 256 + 10, [0, 9000, 65535] * 3)
+
+    compiled = BinaryFrameEncoder(indice).compile(POWERS)
+    assert [decoder_trame_binaire(t)[1] for _, t in compiled] == [11, 12, 21]
+
+
+@pytest.mark.parametrize("alterer", [
+    lambda t: t[:-1] + bytes([t[-1] ^ 1]),      # CRC
+    lambda t: t[:5] + bytes([t[5] ^ 1]) + t[6:],  # charge utile
+    lambda t: t[:-1],                            # tronquée
+    lambda t: b"\x00" + t[1:],                   # sans synchronisation
+])
+def test_trames_binaires_invalides(alterer):
+    with pytest.raises(ValueError):
+        decoder_trame_binaire(alterer(encoder_trame_consigne("11", [1] * 9)))
+
+
+def test_decoupage_flux_mixte_octet_par_octet():
+    consigne = encoder_trame_consigne("11", [1] * 9)
+    rpm = encoder_trame_rpm("12", [1000] * 9)
+    ligne = b'{"cell": 11, "RPM": [1, 2, 3, 4, 5, 6, 7, 8, 9]}'
+    flux = consigne + ligne + b"\n" + rpm + b"\r\n" + ligne + b"\n"
+
+    decoupe = StreamSplitter()
+    messages = []
+    for i in range(len(flux)):
+        messages += decoupe.feed(flux[i:i + 1])
+    assert messages == [consigne, ligne, rpm, ligne]
+    assert decoupe.erreurs == 0
+    assert not decoupe.buffer
+
+
+def test_decoupage_resynchronisation():
+    rpm = encoder_trame_rpm("12", [1000] * 9)
+    corrompue = bytearray(rpm)
+    corrompue[8] ^= 0xFF
+    ligne = b'{"cell": 12}'
+    decoupe = StreamSplitter()
+    # Trame au CRC faux, ligne coupée par une trame binaire, ligne sans fin trop longue
+    assert decoupe.feed(bytes(corrompue) + rpm) == [rpm]
+    assert decoupe.feed(b'{"cell": 1' + rpm + ligne + b"\n") == [rpm, ligne]
+    assert decoupe.feed(b"x" * (StreamSplitter.TAILLE_LIGNE_MAX + 1)) == []
+    assert not decoupe.buffer
+    assert decoupe.feed(ligne + b"\n") == [ligne]
+    assert decoupe.erreurs >= 3
+
+
+def test_creer_encodeur():
+    assert type(creer_encodeur("json", indice)) is FrameEncoder
+    assert type(creer_encodeur("binaire", indice)) is BinaryFrameEncoder
+    with pytest.raises(ValueError):
+        creer_encodeur("morse", indice)
+
+
+# --- Envoi différentiel ------------------------------------------------------
+
+def mur_compile(pourcentage=50, cellules=10):
+    powers = {f"1{c}" if c < 10 else f"1.{c}": [pourcentage] * 9 for c in range(1, cellules + 1)}
+    return BinaryFrameEncoder(indice).compile(powers)
+
+
+def envoyer(suivi, compiled, maintenant):
+    selection = suivi.selectionner(compiled, maintenant)
+    for cell_id in selection:
+        suivi.marquer_envoye(cell_id, compiled.indices[cell_id], maintenant)
+    return selection
+
+
+def test_differentiel_acquittement_et_changements():
+    suivi = DeltaTracker(periode=1.0, rafraichissement=10.0, delai_acquittement=1.0)
+    compiled = mur_compile()
+    assert envoyer(suivi, compiled, 0.0) == compiled.cell_ids
+    suivi.acquitter(dict.fromkeys(compiled.cell_ids, 0.5))
+    assert set(suivi.acquittes) == set(compiled.cell_ids)
+
+    # Rien n'a changé : seul le rafraîchissement tournant part (10 cellules / 10 s = 1 par tick)
+    assert len(envoyer(suivi, compiled, 1.0)) == 1
+
+    powers = {cell_id: [50] * 9 for cell_id in compiled.cell_ids}
+    powers["13"] = [80] * 9
+    change = BinaryFrameEncoder(indice).compile(powers)
+    assert "13" in envoyer(suivi, change, 2.0)
+    assert suivi.trames_envoyees + suivi.trames_evitees == 30
+    assert "évitées" in suivi.resume()
+
+
+def test_differentiel_reponse_anterieure_a_l_envoi():
+    suivi = DeltaTracker(periode=1.0, rafraichissement=1e9, delai_acquittement=1.0)
+    compiled = mur_compile()
+    envoyer(suivi, compiled, 10.0)
+    autres = dict.fromkeys(compiled.cell_ids[1:], 10.2)
+    # Réponse périodique partie au même instant que la mise en file, ou avant : pas un acquittement
+    for vu in (10.0, 9.5):
+        suivi.acquitter({**autres, "11": vu})
+        assert list(suivi.en_attente) == ["11"]
+    # Non acquittée : réémise une fois delai_acquittement écoulé, pas avant
+    # (une cellule par tick part au titre du rafraîchissement tournant)
+    assert envoyer(suivi, compiled, 10.5) == ["12"]
+    assert envoyer(suivi, compiled, 11.0) == ["11", "13"]
+    suivi.acquitter({"11": 11.01})
+    assert suivi.acquittes["11"] == compiled.indices["11"]
+
+
+def test_differentiel_rafraichissement_tournant():
+    suivi = DeltaTracker(periode=1.0, rafraichissement=5.0)
+    compiled = mur_compile()
+    envoyer(suivi, compiled, 0.0)
+    suivi.acquitter(dict.fromkeys(compiled.cell_ids, 0.5))
+    revues = set()
+    for tick in range(1, 6):
+        revues.update(envoyer(suivi, compiled, float(tick)))
+    assert revues == set(compiled.cell_ids)
+
+    suivi.reinitialiser()
+    assert envoyer(suivi, compiled, 6.0) == compiled.cell_ids
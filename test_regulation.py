@@ -0,0 +1,82 @@
+import numpy as np
+
+from gvm_regulation import ETEINT, FanPlant, FanRegulator, PIController, simuler
+
+CELLULES = ("11", "12", "21", "22")
+
+
+def test_convergence_sur_ventilateurs_uses(courbe):
+    powers = {cell_id: [60] * 9 for cell_id in CELLULES}
+    ouvert = simuler(courbe, powers, None)
+    regule = simuler(courbe, powers, FanRegulator(courbe))
+    # Boucle ouverte : l'usure (facteurs 0.8..1.0) laisse un écart permanent
+    assert ouvert[-1] > 300
+    # Régulé : l'écart résiduel se limite au pas de la courbe (quelques dizaines de tr/min)
+    assert max(regule[-10:]) < 0.05 * ouvert[-1]
+
+
+def test_anti_emballement_integrale_gelee_en_saturation():
+    pi = PIController((1, 9), kp=0.01, ki=0.05, indice_max=50, pente_max=1000.0)
+    ouvert = np.full((1, 9), 40.0)
+    valide = np.ones((1, 9), dtype=bool)
+    # Ventilateur calé : l'écart ne se résorbe jamais, la commande reste plafonnée
+    for _ in range(50):
+        indices = pi.calculer(ouvert, np.full((1, 9), 5000.0), np.zeros((1, 9)), valide, 0.5)
+    assert (indices == 50).all()
+    assert (pi.integrale == 0).all()
+    # Mesure revenue à la consigne : la commande repart aussitôt de l'indice de la courbe
+    indices = pi.calculer(ouvert, np.full((1, 9), 5000.0), np.full((1, 9), 5000.0), valide, 0.5)
+    assert (indices == 40).all()
+
+
+def test_limite_de_pente():
+    pi = PIController((1, 9), kp=1.0, ki=0.0, indice_max=100, pente_max=10.0)
+    ouvert = np.full((1, 9), 20.0)
+    valide = np.ones((1, 9), dtype=bool)
+    precedent = 20
+    for _ in range(6):
+        indices = pi.calculer(ouvert, np.full((1, 9), 1000.0), np.zeros((1, 9)), valide, 0.5)
+        assert (np.abs(indices - precedent) <= 5).all()
+        precedent = indices
+    assert (indices == 50).all()
+
+
+def test_ventilateurs_eteints_restent_eteints(courbe):
+    pi = PIController((1, 9), kp=0.01, ki=0.05, indice_max=60, pente_max=20.0)
+    ouvert = np.array([[ETEINT] + [40] * 8], dtype=float)
+    valide = np.ones((1, 9), dtype=bool)
+    for _ in range(10):
+        indices = pi.calculer(ouvert, np.full((1, 9), 5000.0), np.zeros((1, 9)), valide, 0.5)
+        assert indices[0, 0] == ETEINT
+        assert pi.integrale[0, 0] == 0
+    # Au rallumage, la pente repart de l'indice de la courbe et non d'une commande passée
+    ouvert[0, 0] = 30
+    indices = pi.calculer(ouvert, np.full((1, 9), 5000.0), np.full((1, 9), 5000.0), valide, 0.5)
+    assert indices[0, 0] == 30
+
+    # Même chose de bout en bout : 0 % donne -1, et la plante ne tourne jamais
+    plante = FanPlant((2, 9), courbe)
+    powers = {cell_id: [60, 0] + [60] * 7 for cell_id in ("11", "12")}
+    simuler(courbe, powers, FanRegulator(courbe), plante=plante)
+    assert (plante.rpm[:, 1] == 0).all()
+    assert (plante.rpm[:, 0] > 0).all()
+
+
+def test_pleine_puissance_non_bridee(courbe):
+    # Au-delà du maximum de RPM de la courbe, l'indice 100 doit partir tel quel (débit maximal)
+    regulateur = FanRegulator(courbe)
+    ouverts = {"11": [courbe.indice_pwm(100)] * 9, "12": [courbe.indice_pwm(60)] * 9}
+    assert ouverts["11"][0] > regulateur.indice_max
+    rpms = {"11": [9000] * 9, "12": [5000] * 9}
+    for n in range(10):
+        vus = dict.fromkeys(ouverts, n * 0.5)
+        indices = regulateur.indices(ouverts, rpms, vus, n * 0.5)
+        assert indices["11"] == ouverts["11"]
+    assert indices["12"][0] > ouverts["12"][0]  # la cellule à 60 % reste régulée
+
+    # De bout en bout, sur des ventilateurs sains : même régime qu'en boucle ouverte
+    plante = FanPlant((len(CELLULES), 9), courbe)
+    powers = {cell_id: [100] * 9 for cell_id in CELLULES}
+    ecarts = simuler(courbe, powers, FanRegulator(courbe), plante=plante)
+    assert ecarts[-1] < 1
+    assert (plante.rpm.round() == courbe.rpm_consigne(100)).all()
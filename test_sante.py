@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from gvm_model import FanWall
+from gvm_sante import CALE, ECART, ETEINT, OK, PERIME, HealthMonitor
+
+
+@pytest.fixture
+def mur():
+    mur = FanWall(1, 1)
+    mur.set_all(60, couche="lecture")
+    return mur
+
+
+def mesurer(mur, rpm, t):
+    mur.rpm[...] = rpm
+    mur.vu[...] = t
+
+
+def test_grace_apres_changement_de_consigne(mur, courbe):
+    sante = HealthMonitor(mur, courbe, grace=3.0)
+    mesurer(mur, 0, 0.0)
+    sante.evaluer(0.0)
+    assert (sante.etat == OK).all()
+    mesurer(mur, 0, 2.5)
+    sante.evaluer(2.5)
+    assert (sante.etat == OK).all()
+    mesurer(mur, 0, 3.5)
+    change = sante.evaluer(3.5)
+    assert (sante.etat == CALE).all() and change.all()
+    assert not mur.fonctionnel.any()
+    assert len(sante.defauts()) == 9
+
+    # Nouvelle consigne : nouvelle période de grâce
+    mur.set_fan("11", 0, 80, couche="lecture")
+    sante.evaluer(4.0)
+    assert sante.etat[0, 0, 0] == OK
+    assert (sante.etat[0, 0, 1:] == CALE).all()
+
+
+def test_hysteresis_ecart(mur, courbe):
+    sante = HealthMonitor(mur, courbe, tolerance=500, hysteresis=150, grace=0.0)
+    attendu = courbe.table_rpm[60]
+    for t, rpm, etat in ((1.0, attendu + 400, OK),      # sous le seuil de levée
+                         (2.0, attendu + 600, ECART),
+                         (3.0, attendu + 400, ECART),   # au-dessus du seuil de retombée
+                         (4.0, attendu + 300, OK)):
+        mesurer(mur, rpm, t)
+        sante.evaluer(t)
+        assert (sante.etat == etat).all(), (t, rpm)
+
+
+def test_hysteresis_calage(mur, courbe):
+    sante = HealthMonitor(mur, courbe, tolerance=10000, seuil_calage=300, hysteresis=150, grace=0.0)
+    for t, rpm, etat in ((1.0, 200, CALE), (2.0, 400, CALE), (3.0, 500, OK), (4.0, 400, OK)):
+        mesurer(mur, rpm, t)
+        sante.evaluer(t)
+        assert (sante.etat == etat).all(), (t, rpm)
+
+
+def test_perime_et_eteint(mur, courbe):
+    sante = HealthMonitor(mur, courbe, age_max=3.0, grace=0.0)
+    mur.set_fan("11", 8, 0, couche="lecture")
+    sante.evaluer(1.0)  # jamais mesuré
+    assert (sante.etat[0, 0, :8] == PERIME).all()
+    assert sante.etat[0, 0, 8] == ETEINT
+    mesurer(mur, courbe.table_rpm[60], 1.0)
+    sante.evaluer(2.0)
+    assert (sante.etat[0, 0, :8] == OK).all()
+    sante.evaluer(5.0)
+    assert (sante.etat[0, 0, :8] == PERIME).all()
+    assert sante.compter() == {"périmé": 8}
+    assert np.count_nonzero(mur.fonctionnel) == 1
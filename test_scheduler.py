@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from gvm_scheduler import AsyncSequenceScheduler, SequenceScheduler
+
+
+class HorlogeFactice:
+    def __init__(self, t=100.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class OrdonnanceurFactice(SequenceScheduler):
+    """Attendre une échéance fait avancer l'horloge factice jusqu'à elle (plus un retard de réveil)."""
+
+    def __init__(self, periode, retard=0.0):
+        super().__init__(periode, horloge=HorlogeFactice())
+        self.retard = retard
+
+    def attendre_jusqu_a(self, echeance):
+        if self.arrete:
+            return False
+        self.horloge.t = max(self.horloge.t, echeance + self.retard)
+        return True
+
+
+def derouler(ordonnanceur, plan, travail=None, **kwargs):
+    ticks = []
+    for tick in ordonnanceur.ticks(plan, **kwargs):
+        ticks.append((tick.nom, round(tick.echeance - 100.0, 6), tick.nouvelle_sequence))
+        if travail:
+            travail(ordonnanceur, tick)
+    return ticks
+
+
+def test_echeances_absolues_et_frontieres():
+    ordonnanceur = OrdonnanceurFactice(1.0)
+    ticks = derouler(ordonnanceur, [("a", 2.5), ("b", 1.0), ("c", 2.0)])
+    assert ticks == [("a", 0.0, True), ("a", 1.0, False), ("a", 2.0, False),
+                     ("b", 2.5, True),
+                     ("c", 3.5, True), ("c", 4.5, False)]
+    # La fin du profil tombe elle aussi sur son échéance
+    assert ordonnanceur.horloge() == pytest.approx(105.5)
+
+
+def test_pas_de_derive_avec_retards_de_reveil():
+    ordonnanceur = OrdonnanceurFactice(0.5, retard=0.2)
+    ticks = derouler(ordonnanceur, [("a", 5.0)])
+    assert [echeance for _, echeance, _ in ticks] == [0.5 * i for i in range(10)]
+    assert ordonnanceur.stats.gigue_max == pytest.approx(0.2)
+    assert ordonnanceur.stats.depassements == 0
+
+
+def test_depassement_saute_aux_echeances_futures():
+    def travail(ordonnanceur, tick):
+        if tick.numero == 1:
+            ordonnanceur.horloge.t += 2.5  # le travail de ce tick déborde sur deux échéances et demie
+
+    ordonnanceur = OrdonnanceurFactice(1.0)
+    ticks = derouler(ordonnanceur, [("a", 8.0)], travail)
+    assert [echeance for _, echeance, _ in ticks] == [0.0, 1.0, 4.0, 5.0, 6.0, 7.0]
+    assert ordonnanceur.stats.depassements == 1
+    assert ordonnanceur.stats.ticks_sautes == 2
+
+
+def test_arret_interrompt_l_attente():
+    ordonnanceur = SequenceScheduler(60.0)
+    ticks = []
+
+    def lire():
+        ticks.extend(ordonnanceur.ticks([("a", None)]))
+
+    lecture = threading.Thread(target=lire)
+    lecture.start()
+    while not ticks:
+        time.sleep(0.001)
+    ordonnanceur.arreter()
+    lecture.join(1.0)
+    assert not lecture.is_alive()
+    assert len(ticks) == 1
+
+
+def test_periode_invalide():
+    with pytest.raises(ValueError):
+        SequenceScheduler(0)
+
+
+def test_version_asyncio():
+    ordonnanceur = AsyncSequenceScheduler(0.01)
+
+    async def lire():
+        return [tick async for tick in ordonnanceur.ticks_async([("a", 0.045), ("b", 0.025)])]
+
+    ticks = asyncio.run(lire())
+    assert [(t.nom, t.numero) for t in ticks] == [("a", n) for n in range(5)] + [("b", n) for n in range(3)]
+    assert ticks[5].echeance - ticks[0].echeance == pytest.approx(0.045)
+
+
+# --- Lecture en boucle ---------------------------------------------------------
+
+def test_boucle_sur_la_meme_base_de_temps():
+    iterations = []
+
+    def travail(ordonnanceur, tick):
+        iterations.append(tick.iteration)
+        if tick.iteration == 3:
+            ordonnanceur.arreter()
+
+    ordonnanceur = OrdonnanceurFactice(1.0)
+    ticks = derouler(ordonnanceur, [("a", 1.5), ("b", 1.0)], travail, boucle=True)
+    # Pas de trou au rebouclage : l'itération 2 commence à 2.5 s, la 3 à 5 s
+    assert ticks == [("a", 0.0, True), ("a", 1.0, False), ("b", 1.5, True),
+                     ("a", 2.5, True), ("a", 3.5, False), ("b", 4.0, True),
+                     ("a", 5.0, True)]
+    assert iterations == [1, 1, 1, 2, 2, 2, 3]
+    assert ordonnanceur.iteration == 3
+
+
+def test_boucle_sans_duree():
+    with pytest.raises(ValueError):
+        list(OrdonnanceurFactice(1.0).ticks([("a", 0)], boucle=True))
+
+
+def test_arret_apres_fermeture_de_la_boucle():
+    ordonnanceur = AsyncSequenceScheduler(0.01)
+
+    async def lire():
+        return [tick async for tick in ordonnanceur.ticks_async([("a", 0.02)])]
+
+    asyncio.run(lire())  # la boucle est fermée en sortie, comme la boucle privée du moteur
+    ordonnanceur.arreter()
+    assert ordonnanceur.arrete
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from gvm_async import AsyncIOCore, AsyncSerialPort
+from gvm_serial import SerialTransport
+
+# Plus que le tampon d'un pty : l'écriture reste en suspens tant que personne ne lit le maître
+GROSSE_TRAME = b"x" * (1 << 18)
+
+
+@pytest.fixture
+def pty():
+    maitre, esclave = os.openpty()
+    yield maitre, os.ttyname(esclave)
+    os.close(esclave)
+    os.close(maitre)
+
+
+def vider(maitre, arret):
+    """Lit le côté maître jusqu'à `arret` : débloque l'écriture du transport."""
+    os.set_blocking(maitre, False)
+    while not arret.is_set():
+        try:
+            os.read(maitre, 1 << 16)
+        except BlockingIOError:
+            time.sleep(0.005)
+
+
+def attendre(condition, timeout=2.0):
+    limite = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < limite
+        time.sleep(0.01)
+
+
+def test_transport_threads_compte_les_trames_perdues(pty):
+    maitre, chemin = pty
+    transport = SerialTransport(chemin, taille_file=2)
+    transport.start()
+    arret = threading.Event()
+    try:
+        attendre(lambda: transport.connecte)
+        transport.write(GROSSE_TRAME)
+        attendre(lambda: transport.file_envoi.qsize() == 0)
+        time.sleep(0.1)  # l'écrivain est bloqué dans l'écriture de la grosse trame
+        transport.write(b"a")
+        transport.write(b"b")
+        with pytest.raises(BufferError):
+            transport.write(b"c")
+        stats = transport.statistiques()
+        assert stats["trames_perdues"] == 1 and stats["en_file"] == 2
+        assert stats["attentes_place"] == 0 and stats["duree_attente_place"] == 0.0
+
+        threading.Thread(target=vider, args=(maitre, arret), daemon=True).start()
+        assert transport.attendre_vidange(2.0)
+        assert transport.statistiques()["octets_envoyes"] == len(GROSSE_TRAME) + 2
+    finally:
+        arret.set()
+        transport.stop()
+
+
+def test_port_asyncio_memes_compteurs(pty):
+    maitre, chemin = pty
+    core = AsyncIOCore()
+    core.start()
+    port = AsyncSerialPort(core, chemin, taille_file=2)
+    port.start()
+    arret = threading.Event()
+    try:
+        attendre(lambda: port.connecte)
+
+        async def remplir():
+            port.write(GROSSE_TRAME)
+            await asyncio.sleep(0.05)  # l'écrivain attend que le pty accepte la suite
+            port.write(b"a")
+            port.write(b"b")
+            with pytest.raises(BufferError):
+                port.write(b"c")
+            await port.attendre_place()  # file pleine : attend l'écrivain
+
+        attente = core.appeler(remplir())
+        time.sleep(0.1)
+        assert not attente.done()
+        threading.Thread(target=vider, args=(maitre, arret), daemon=True).start()
+        attente.result(2.0)
+        assert port.attendre_vidange(2.0)
+
+        stats = port.statistiques()
+        assert set(stats) == set(SerialTransport("x").statistiques())
+        assert stats["trames_perdues"] == 1 and stats["en_file"] == 0
+        assert stats["attentes_place"] == 1 and stats["duree_attente_place"] >= 0.1
+        assert stats["octets_envoyes"] == len(GROSSE_TRAME) + 2
+    finally:
+        arret.set()
+        port.stop()
+        core.stop()
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from gvm_address import CellAddress
+from gvm_protocol import (PROTOCOLE_BINAIRE, PROTOCOLE_JSON, TYPE_RPM, BinaryFrameEncoder, FrameEncoder,
+                          StreamSplitter, decoder_trame_binaire)
+from gvm_simulateur import WallSimulator
+
+
+@pytest.fixture
+def simulateur(courbe):
+    return WallSimulator(2, 2, courbe, baud=0, graine=1)
+
+
+def consignes():
+    return {"11": [60] * 9, "12": [0] * 9, "21": [100] * 9, "22": [5 * k for k in range(9)]}
+
+
+@pytest.mark.parametrize("encodeur, protocole", [(FrameEncoder, PROTOCOLE_JSON),
+                                                 (BinaryFrameEncoder, PROTOCOLE_BINAIRE)])
+def test_trames_appliquees_a_la_cellule_publiee(simulateur, courbe, encodeur, protocole):
+    compiled = encodeur(courbe.indice_pwm).compile(consignes())
+    decoupe = StreamSplitter()
+    # Premier envoi : seule "11" est publiée, les autres cellules ignorent la trame
+    for message in decoupe.feed(compiled.frames[0][1]):
+        simulateur._appliquer(message)
+    assert simulateur.indices[0].tolist() == compiled.indices["11"]
+    assert (simulateur.indices[1:] == -1).all()
+
+    for message in decoupe.feed(b"".join(frame for _, frame in compiled.frames[1:])):
+        simulateur._appliquer(message)
+    for cell_id in compiled.cell_ids:
+        assert simulateur.indices[simulateur.positions[cell_id]].tolist() == compiled.indices[cell_id]
+    assert simulateur.trames_appliquees == 4
+    assert simulateur.erreurs == 0
+    assert simulateur.format_reponse == protocole
+
+
+def test_trames_invalides_comptees(simulateur, courbe):
+    binaire = bytearray(BinaryFrameEncoder(courbe.indice_pwm).compile(consignes()).frames[0][1])
+    binaire[6] ^= 0x5A  # CRC faux
+    for message in (bytes(binaire), b'{"Publish": 11}', b'{"11": [1, 2], "Publish": 11}',
+                    b'{"33": [0, 0, 0, 0, 0, 0, 0, 0, 0], "Publish": 33}', b'pas du json'):
+        simulateur._appliquer(message)
+    assert simulateur.erreurs == 5
+    assert simulateur.trames_appliquees == 0
+    assert (simulateur.indices == -1).all()
+
+
+def test_reponses_au_format_de_la_derniere_trame(simulateur, courbe):
+    simulateur.rendre_muette("22")
+    rpm = simulateur.plante.avancer(simulateur.indices, 1.0) + 7
+    lignes = [json.loads(ligne) for ligne in simulateur._reponses(rpm).splitlines()]
+    assert [ligne["cell"] for ligne in lignes] == [11, 12, 21]
+    assert all(ligne["RPM"] == [7] * 9 for ligne in lignes)
+
+    simulateur._appliquer(BinaryFrameEncoder(courbe.indice_pwm).compile(consignes()).frames[0][1])
+    trames = StreamSplitter().feed(bytes(simulateur._reponses(rpm)))
+    decodees = [decoder_trame_binaire(trame) for trame in trames]
+    assert [(t, CellAddress.depuis_publish(c).key) for t, c, _ in decodees] == \
+        [(TYPE_RPM, "11"), (TYPE_RPM, "12"), (TYPE_RPM, "21")]
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+
+import gvm_telemetrie
+from gvm_telemetrie import SANS_CONSIGNE, TelemetryReader, TelemetryRecorder
+
+
+def test_aller_retour(tmp_path):
+    enregistreur = TelemetryRecorder(str(tmp_path), periode_flush=0.05)
+    enregistreur.start()
+    debut = time.time()
+    enregistreur.definir_consignes({"11": [60] * 9})
+    enregistreur.enregistrer([("11", [1000 + i for i in range(9)]), ("1.10", [2000] * 9)])
+    enregistreur.definir_consignes({})
+    enregistreur.enregistrer([("11", [1100] * 9)])
+    enregistreur.stop()
+    fin = time.time()
+
+    assert enregistreur.enregistrees == 3
+    assert enregistreur.erreurs == 0
+    lecteur = TelemetryReader(str(tmp_path))
+    assert lecteur.cellules() == {"11", "1.10"}
+    cellule = lecteur.fenetre("11", debut, fin)
+    assert cellule["rpm"].tolist() == [[1000 + i for i in range(9)], [1100] * 9]
+    assert cellule["consigne"].tolist() == [[60] * 9, SANS_CONSIGNE]
+    assert (np.diff(cellule["t"]) >= 0).all()
+    assert len(lecteur.fenetre(None, fin + 1, fin + 2)) == 0
+
+
+class Horloge:
+    """Remplace le module time de gvm_telemetrie : horloge murale réglable, monotonic réelle."""
+
+    monotonic = staticmethod(time.monotonic)
+
+    def __init__(self, t):
+        self.t = t
+
+    def time(self):
+        return self.t
+
+
+def attendre(condition, timeout=2.0):
+    limite = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < limite, "délai dépassé"
+        time.sleep(0.01)
+
+
+def test_horloge_qui_recule(tmp_path, monkeypatch):
+    t0 = time.time()
+    horloge = Horloge(t0)
+    monkeypatch.setattr(gvm_telemetrie, "time", horloge)
+
+    enregistreur = TelemetryRecorder(str(tmp_path), periode_flush=0.02)
+    enregistreur.start()
+    enregistreur.enregistrer([("11", [1] * 9)])
+    attendre(lambda: enregistreur.enregistrees == 1)
+    horloge.t = t0 - 30
+    enregistreur.enregistrer([("11", [2] * 9)])
+    enregistreur.stop()
+    assert enregistreur.retours_horloge == 1
+
+    # La dernière date de l'archive sert de plancher après un redémarrage
+    horloge.t = t0 - 60
+    suivant = TelemetryRecorder(str(tmp_path), periode_flush=0.02)
+    suivant.start()
+    suivant.enregistrer([("11", [3] * 9)])
+    suivant.stop()
+    assert suivant.retours_horloge == 1
+
+    lecteur = TelemetryReader(str(tmp_path))
+    assert lecteur.fenetre("11")["t"].tolist() == [t0] * 3
+    assert lecteur.fenetre("11")["rpm"][:, 0].tolist() == [1, 2, 3]
+    assert len(lecteur.fenetre("11", t0, t0)) == 3